@@ -2,10 +2,9 @@ from typing import List
 from langchain.agents import AgentExecutor
 from langchain_core.tools import BaseTool
 
-from core.model_provider import llm
-from tools.calculator_tool import calculator_tool
-from tools.rag_tool import rag_tool
-from tools.search_tool import search_tool
+from core import registry
+from core.metrics import AGENT_METADATA_KEY, metrics_callbacks
+from core.model_provider import get_role_llm
 from .base_agent import create_intelli_agent
 
 def get_agent_executor() -> AgentExecutor:
@@ -17,10 +16,10 @@ def get_agent_executor() -> AgentExecutor:
     responsible for running the agent's "thought-action" loop.
     """
     # 1. Gather all the tools into a list
-    tools: List[BaseTool] = [calculator_tool, rag_tool, search_tool]
+    tools: List[BaseTool] = [registry.get(name) for name in ("calculator_tool", "rag_tool", "search_tool")]
     
     # 2. Create the agent's core logic
-    agent = create_intelli_agent(llm=llm, tools=tools)
+    agent = create_intelli_agent(llm=get_role_llm("researcher"), tools=tools)
     
     # 3. Create the agent executor
     executor = AgentExecutor(
@@ -28,15 +27,22 @@ def get_agent_executor() -> AgentExecutor:
         tools=tools,
         verbose=True,  # Set to True to see the agent's thought process
         handle_parsing_errors=True, # Handle cases where the LLM output is not perfect
+        name="agent_executor",
+        metadata={AGENT_METADATA_KEY: "agent_executor"},
+        callbacks=metrics_callbacks(),
     )
     
     return executor
 
-# Instantiate the main executor
-agent_executor = get_agent_executor()
+def __getattr__(name: str):
+    # The executor is built on first use; see core.registry
+    if name == "agent_executor":
+        return registry.get("agent_executor")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
     # --- Example Usage ---
+    agent_executor = registry.get("agent_executor")
     print("Agent Executor is ready. You can now ask questions.")
 
     # Example 1: A question that should use the calculator
@@ -20,6 +20,121 @@ OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 DEFAULT_LLM_MODEL = "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B"
 DEFAULT_EMBEDDING_MODEL = "Qwen/Qwen3-Embedding-4B"
 
+# 嵌入向量的持久化缓存 (SQLite)，避免重复计算相同文本的向量
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# 所有聊天/嵌入模型共享的 HTTP 连接池: 最大连接数、保持活动的空闲连接数及其过期时间 (秒)，
+# 以及请求超时和建立连接的超时 (秒)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+
+# 按角色路由模型: 简单的步骤 (主题提取、计算) 使用小而快的非推理模型，其余角色使用 DEFAULT_LLM_MODEL。
+# 每个角色的模型名、最大输出 token 数 (0 表示不限制) 和请求超时 (秒) 可以用环境变量覆盖，
+# 例如 LLM_DECOMPOSER_MODEL、LLM_DECOMPOSER_MAX_TOKENS、LLM_DECOMPOSER_TIMEOUT
+SMALL_LLM_MODEL = os.getenv("SMALL_LLM_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+_LLM_ROLE_DEFAULTS = {
+    # 角色: (模型, 最大输出 token 数, 超时)
+    "decomposer": (SMALL_LLM_MODEL, 64, 15),
+    "calculator": (SMALL_LLM_MODEL, 256, 30),
+    "researcher": (DEFAULT_LLM_MODEL, 0, HTTP_TIMEOUT),
+    "writer": (DEFAULT_LLM_MODEL, 0, HTTP_TIMEOUT),
+    "rag": (DEFAULT_LLM_MODEL, 0, HTTP_TIMEOUT),
+}
+LLM_ROLES = {
+    role: {
+        "model": os.getenv(f"LLM_{role.upper()}_MODEL", model),
+        "max_tokens": int(os.getenv(f"LLM_{role.upper()}_MAX_TOKENS", str(max_tokens))),
+        "timeout": float(os.getenv(f"LLM_{role.upper()}_TIMEOUT", str(timeout))),
+    }
+    for role, (model, max_tokens, timeout) in _LLM_ROLE_DEFAULTS.items()
+}
+
+# LLM 响应缓存 (SQLite，默认关闭): 以模型、参数和提示词哈希为键缓存 temperature=0 的确定性回答，
+# 超过条目上限时淘汰最久未使用的条目。LLM_CACHE_TTL 是默认有效期 (秒，0 表示不过期)，
+# LLM_CACHE_TTLS 按链名 (运行元数据中的 "chain") 覆盖有效期，例如 "task_decomposer=604800,rag=3600"
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "0"))
+LLM_CACHE_TTLS = {
+    name.strip(): float(ttl)
+    for name, _, ttl in (item.partition("=") for item in os.getenv("LLM_CACHE_TTLS", "").split(","))
+    if name.strip()
+}
+
+# 调用指标: 记录每次模型、工具、嵌入调用以及每个图节点和智能体步骤的耗时、首 token 时间、token 用量和重试次数，
+# 在进程内按节点/角色/工具聚合为直方图。每次编排运行结束后写入 METRICS_DIR/runs/<thread_id>.json，
+# 并刷新 Prometheus 文本文件 METRICS_DIR/intelli_core.prom；METRICS_PORT 不为 0 时还在 /metrics 提供 Prometheus 端点，
+# 默认只监听本机 (METRICS_HOST=127.0.0.1)，需要从其他主机采集时设为 0.0.0.0
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# 模型价格 (每百万 token 的输入价格:输出价格，只写一个价格时两者相同)，用于计算调用成本，例如 "Qwen/Qwen2.5-7B-Instruct=0.35:0.35,gpt-4o=2.5:10"
+LLM_PRICES = {
+    name.strip(): tuple(float(price) for price in (prices.split(":") * 2)[:2])
+    for name, _, prices in (item.rpartition("=") for item in os.getenv("LLM_PRICES", "").split(","))
+    if name.strip()
+}
+
+# 嵌入向量的批处理：每批的 token 预算、每批最多的文本数、并发批次数和失败重试次数
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+
+# 按 token 分块: 分词器 (tiktoken 编码名，为空或无法加载时按字符估算)、每块的 token 预算和相邻块重叠的 token 数
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# 近似重复块去重 (MinHash-LSH): 在嵌入之前检测近似重复的文本块，并将其记录为规范块的别名
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+
+# 智能体私有知识库所在的 ChromaDB 集合名称
+DEFAULT_COLLECTION_NAME = "intelli-core-kb"
+
+# 检索后端: "chroma" 直接查询 ChromaDB；"numpy" 使用从集合导出的内存映射 .npy 索引 (精确搜索)；
+# "ivf" 在 numpy 索引之上构建 IVF 近似最近邻索引；"int8"/"pq" 在内存中只保留量化编码，
+# 先用编码做近似打分，再用磁盘上的全精度向量对候选重新打分
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", "vector_index")
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")
+
+# IVF 索引: 倒排列表数量 (0 表示自动取 4 * sqrt(n)) 和每次查询默认扫描的列表数
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+# 量化索引: PQ 子向量数量 (0 表示自动取 dim / 4)，以及每个结果用全精度向量重新打分的候选数倍数 (0 表示不重新打分)
+PQ_SUBVECTORS = int(os.getenv("PQ_SUBVECTORS", "0"))
+QUANTIZATION_RESCORE_FACTOR = int(os.getenv("QUANTIZATION_RESCORE_FACTOR", "8"))
+
+# 检索模式: "vector" 仅向量检索；"hybrid" 融合 BM25 与向量检索 (RRF)；"lexical" 仅 BM25，无需调用嵌入模型；
+# "mmr" 多取 MMR_FETCH_K 个候选后用最大边际相关性 (MMR) 重排，返回彼此不重复的块
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+# MMR 权重: 1 只看相关性，0 只看多样性
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+BM25_INDEX_ENABLED = os.getenv("BM25_INDEX_ENABLED", "true").lower() == "true"
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# RAG 语义答案缓存: 与已缓存问题的余弦相似度达到阈值时直接返回缓存的答案 ("lexical" 模式不调用嵌入模型，只缓存相同的问题)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+
+# RAG 上下文组装: 合并同一来源的相邻/重叠块并去掉重复的重叠文本，上下文的 token 预算 (0 表示不限制)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+
 class settings:
     # 从环境变量中获取 API Key
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+class CachedEmbeddings(Embeddings):
+    """
+    A persistent, size-bounded cache in front of an embedding model.
+
+    Vectors are stored in a SQLite database keyed by (model name, SHA-256 of the text).
+    Batch lookups only send the texts that are not cached yet to the provider, and the
+    least recently used entries are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str = "embedding_cache.db", max_entries: int = 500_000):
+        """
+        Args:
+            embeddings (Embeddings): The embedding model to cache.
+            model_name (str): The model name, part of the cache key.
+            path (str): The path of the SQLite database file.
+            max_entries (int): The maximum number of cached vectors.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def model(self) -> str:
+        return self.model_name
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _count(self, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(hashes), _LOOKUP_BATCH_SIZE):
+                batch = hashes[i:i + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            # Refresh the LRU timestamp of every hit
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, entries: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model_name, text_hash, array("f", vector).tobytes(), now)
+                    for text_hash, vector in entries.items()
+                ],
+            )
+            # The row count of INSERT OR REPLACE includes replaced rows (e.g. a text that
+            # another process cached meanwhile), so the size is counted, not added up
+            self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+            # Evict the least recently used entries
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds a list of texts, only sending the cache misses to the provider.
+        """
+        hashes = [self._hash(text) for text in texts]
+        cached = self._lookup(list(set(hashes)))
+
+        # Each distinct missing text is embedded once
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        hits = sum(1 for text_hash in hashes if text_hash in cached)
+        self._count(hits=hits, misses=len(texts) - hits)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), vectors))
+            self._store(new_entries)
+            cached.update(new_entries)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a single query, using the cached vector if there is one.
+        """
+        text_hash = self._hash(text)
+        cached = self._lookup([text_hash])
+        if text_hash in cached:
+            self._count(hits=1)
+            return cached[text_hash]
+
+        self._count(misses=1)
+        vector = self.embeddings.embed_query(text)
+        self._store({text_hash: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async `embed_documents`. The SQLite lookups run in a worker thread and the
+        misses are sent with the provider's async API.
+        """
+        hashes = [self._hash(text) for text in texts]
+        cached = await asyncio.to_thread(self._lookup, list(set(hashes)))
+
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        hits = sum(1 for text_hash in hashes if text_hash in cached)
+        self._count(hits=hits, misses=len(texts) - hits)
+
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, new_entries)
+            cached.update(new_entries)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Async `embed_query`, using the cached vector if there is one.
+        """
+        text_hash = self._hash(text)
+        cached = await asyncio.to_thread(self._lookup, [text_hash])
+        if text_hash in cached:
+            self._count(hits=1)
+            return cached[text_hash]
+
+        self._count(misses=1)
+        vector = await self.embeddings.aembed_query(text)
+        await asyncio.to_thread(self._store, {text_hash: vector})
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters and the current size of the cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": self._size,
+            "max_entries": self.max_entries,
+        }
+
+    def clear(self, model_name: Optional[str] = None) -> None:
+        """
+        Removes the cached vectors of `model_name` (or of this cache's model).
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model_name or self.model_name,))
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    from langchain_core.embeddings import FakeEmbeddings
+
+    cache = CachedEmbeddings(FakeEmbeddings(size=8), model_name="fake", path=":memory:", max_entries=3)
+    cache.embed_documents(["a", "b", "c"])
+    cache.embed_documents(["a", "b", "d"])
+    cache.embed_query("a")
+    print(f"Cache stats: {cache.stats()}")
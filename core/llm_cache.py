@@ -0,0 +1,230 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.load import dumps, loads
+from langchain_core.runnables import Runnable
+
+from .config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_TTLS
+from .logger import log
+
+# Chains name themselves with this run metadata key, e.g.
+# `chain.with_config(metadata={"chain": "task_decomposer"})`, to get their own TTL
+CHAIN_METADATA_KEY = "chain"
+
+# The chain of the model call that is currently running in this thread or task
+_current_chain: ContextVar[Optional[str]] = ContextVar("llm_cache_chain", default=None)
+
+class ChainLabelHandler(BaseCallbackHandler):
+    """
+    Records the "chain" run metadata of every model call for LLMResponseCache.
+
+    LangChain passes the run metadata to callbacks but not to the cache, so this
+    handler is attached to the cached model and stores it in a context variable
+    right before the model looks up its cache.
+    """
+
+    # Runs in the caller's thread/task, so the cache lookup sees the value it sets
+    run_inline = True
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        _current_chain.set((metadata or {}).get(CHAIN_METADATA_KEY))
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        _current_chain.set((metadata or {}).get(CHAIN_METADATA_KEY))
+
+
+class LLMResponseCache(BaseCache):
+    """
+    A persistent, size-bounded LangChain cache for deterministic model responses.
+
+    Responses are stored in a SQLite database keyed by the SHA-256 of the model
+    string (model name and every invocation parameter, e.g. temperature and stop
+    words) and the SHA-256 of the serialized prompt. Each entry expires after the TTL
+    of the chain that wrote it, and the least recently used entries are evicted once
+    `max_entries` is exceeded.
+
+    Pass it as `cache=` to a chat model (see `core.model_provider.get_llm`); every
+    `invoke`, `ainvoke` and `batch` of that model, directly or inside a chain, then
+    checks the cache first. Streaming calls are not cached.
+    """
+
+    def __init__(
+        self,
+        path: str = "llm_cache.db",
+        max_entries: int = 10_000,
+        ttl: float = 0,
+        ttls: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Args:
+            path (str): The path of the SQLite database file.
+            max_entries (int): The maximum number of cached responses.
+            ttl (float): The lifetime of an entry in seconds. 0 keeps entries until evicted.
+            ttls (Optional[Dict[str, float]]): Lifetimes by chain name, overriding `ttl`.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                llm_hash TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                chain TEXT,
+                response TEXT NOT NULL,
+                expires_at REAL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (llm_hash, prompt_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, chain: Optional[str]) -> float:
+        """
+        Returns the lifetime in seconds of the entries written by `chain` (0: no expiry).
+        """
+        return self.ttls.get(chain, self.ttl) if chain else self.ttl
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """
+        Returns the cached generations for a prompt and model string, or None.
+        """
+        key = (self._hash(llm_string), self._hash(prompt))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM responses WHERE llm_hash = ? AND prompt_hash = ?", key
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM responses WHERE llm_hash = ? AND prompt_hash = ?", key)
+                self._conn.commit()
+                self._size -= 1
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE llm_hash = ? AND prompt_hash = ?", (now, *key))
+            self._conn.commit()
+            self.hits += 1
+
+        log.debug("LLM cache hit (chain=%s)", _current_chain.get())
+        return loads(row[0], allowed_objects="core")
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """
+        Stores the generations for a prompt and model string, evicting the least
+        recently used entries if the cache is full.
+        """
+        chain = _current_chain.get()
+        ttl = self.ttl_for(chain)
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM responses WHERE llm_hash = ? AND prompt_hash = ?",
+                (self._hash(llm_string), self._hash(prompt)),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (llm_hash, prompt_hash, chain, response, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (self._hash(llm_string), self._hash(prompt), chain, dumps(list(return_val)), now + ttl if ttl > 0 else None, now),
+            )
+            if not exists:
+                self._size += 1
+
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                # Expired entries go first, then the least recently used ones
+                cursor = self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self.expired += max(cursor.rowcount, 0)
+                self._size -= max(cursor.rowcount, 0)
+                overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+                self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._conn.commit()
+
+    def clear(self, chain: Optional[str] = None, **kwargs: Any) -> None:
+        """
+        Removes the cached responses written by `chain`, or all of them.
+        """
+        with self._lock:
+            if chain is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE chain = ?", (chain,))
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss/expiry/eviction counters and the current size of the cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "size": self._size,
+            "max_entries": self.max_entries,
+        }
+
+def create_default_cache() -> LLMResponseCache:
+    """
+    Opens the shared response cache configured by the LLM_CACHE_* settings.
+
+    Use `registry.get("llm_cache")` rather than calling this directly, so every model
+    shares one connection.
+    """
+    return LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_TTLS)
+
+def label_chain(runnable: Runnable, chain: str) -> Runnable:
+    """
+    Names a chain for the response cache, so its entries use the TTL of `chain`.
+    """
+    return runnable.with_config(metadata={CHAIN_METADATA_KEY: chain})
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.prompts import PromptTemplate
+
+    cache = LLMResponseCache(path=":memory:", max_entries=2, ttls={"short": 0.1})
+    model = FakeListChatModel(responses=["first", "second", "third", "fourth"], cache=cache, callbacks=[ChainLabelHandler()])
+    chain = PromptTemplate.from_template("Topic of: {request}") | model
+
+    print([chain.invoke({"request": "AI agents"}).content for _ in range(3)])
+    short = label_chain(chain, "short")
+    print(short.invoke({"request": "expires"}).content)
+    time.sleep(0.2)
+    print(short.invoke({"request": "expires"}).content)
+    print(f"Cache stats: {cache.stats()}")
@@ -0,0 +1,531 @@
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+
+from .config import LLM_PRICES, METRICS_DIR, METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+from . import registry
+from .logger import log
+
+# Prometheus metric names start with this prefix
+PREFIX = "intelli_core"
+
+# Agents name themselves with this run metadata key and the same run name (see
+# `label_agent`), so their runs are recorded as agent steps
+AGENT_METADATA_KEY = "agent"
+
+# Bucket upper bounds in seconds: model calls and agent steps take seconds to
+# minutes, tools and embedding requests milliseconds to seconds
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# name: (type, help, label names, buckets)
+_METRICS = {
+    "llm_latency_seconds": ("histogram", "Wall time of a model call.", ("node", "role", "model"), SLOW_BUCKETS),
+    "llm_time_to_first_token_seconds": ("histogram", "Time from the start of a streamed model call to its first token.", ("node", "role", "model"), SLOW_BUCKETS),
+    "llm_tokens_total": ("counter", "Prompt and completion tokens reported by the provider.", ("node", "role", "model", "type"), None),
+    "llm_cost_total": ("counter", "Cost of the model calls, from LLM_PRICES.", ("node", "role", "model"), None),
+    "tool_latency_seconds": ("histogram", "Wall time of a tool call.", ("node", "tool", "status"), FAST_BUCKETS + (60, 120)),
+    "step_latency_seconds": ("histogram", "Wall time of a graph node or agent run.", ("node", "step", "kind", "status"), SLOW_BUCKETS),
+    "embedding_latency_seconds": ("histogram", "Wall time of an embedding request.", ("node", "model"), FAST_BUCKETS),
+    "embedding_texts_total": ("counter", "Texts sent to the embedding model.", ("node", "model"), None),
+    "errors_total": ("counter", "Failed model, tool and step runs.", ("node", "kind", "name"), None),
+    "retries_total": ("counter", "Retried requests, by where the retry happened.", ("source",), None),
+}
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metrics:
+    """
+    In-process counters and histograms with fixed label names, e.g. the latency of
+    every model call by graph node, role and model.
+
+    Histograms keep a count per bucket rather than the samples, so memory stays
+    constant however many calls are recorded. `render_prometheus()` returns the
+    Prometheus text format, `summary()` a JSON-serializable dict.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Dict[Tuple[str, ...], Any]] = {name: {} for name in _METRICS}
+        self._lock = threading.Lock()
+
+    def _labels(self, name: str, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label) or "") for label in _METRICS[name][2])
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """
+        Adds `value` to a counter.
+        """
+        key = self._labels(name, labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """
+        Records one sample (in seconds) of a histogram.
+        """
+        buckets = _METRICS[name][3]
+        key = self._labels(name, labels)
+        with self._lock:
+            series = self._values[name]
+            if key not in series:
+                series[key] = {"buckets": [0] * (len(buckets) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+            histogram = series[key]
+            histogram["buckets"][bisect.bisect_left(buckets, value)] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["max"] = max(histogram["max"], value)
+
+    def render_prometheus(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, (kind, help_text, label_names, buckets) in _METRICS.items():
+                full_name = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for key, value in sorted(self._values[name].items()):
+                    if kind == "counter":
+                        lines.append(f"{full_name}{_format_labels(label_names, key)} {value:g}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(buckets) + ["+Inf"], value["buckets"]):
+                        cumulative += count
+                        le = f'le="{bound}"' if bound == "+Inf" else f'le="{bound:g}"'
+                        lines.append(f"{full_name}_bucket{_format_labels(label_names, key, le)} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(label_names, key)} {value['sum']:.6f}")
+                    lines.append(f"{full_name}_count{_format_labels(label_names, key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _quantile(buckets: Sequence[float], histogram: Dict[str, Any], q: float) -> float:
+        # The upper bound of the bucket that holds the q-quantile, or the largest
+        # sample if that is above the last bucket
+        rank, cumulative = q * histogram["count"], 0
+        for bound, count in zip(buckets, histogram["buckets"]):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return round(histogram["max"], 6)
+
+    def summary(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Returns every recorded series as {metric: [{"labels": {...}, ...}]}.
+
+        Counters have a "value"; histograms have "count", "sum", "mean", "max" and
+        "p50"/"p95", the upper bound of the bucket that holds that quantile.
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for name, (kind, _, label_names, buckets) in _METRICS.items():
+                series = []
+                for key, value in sorted(self._values[name].items()):
+                    labels = dict(zip(label_names, key))
+                    if kind == "counter":
+                        series.append({"labels": labels, "value": value})
+                        continue
+                    series.append({"labels": labels, **self._histogram_stats(buckets, value)})
+                if series:
+                    result[name] = series
+        return result
+
+    def aggregate(self, name: str, label: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Merges the series of a histogram that share a value of `label`, e.g. the
+        model latency per role across graph nodes and models.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: {label value: {"count", "sum", "mean", "max", "p50", "p95"}},
+            like the histograms of `summary()`.
+        """
+        _, _, label_names, buckets = _METRICS[name]
+        index = label_names.index(label)
+        merged: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for key, value in self._values[name].items():
+                histogram = merged.setdefault(key[index], {"buckets": [0] * (len(buckets) + 1), "count": 0, "sum": 0.0, "max": 0.0})
+                histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], value["buckets"])]
+                histogram["count"] += value["count"]
+                histogram["sum"] += value["sum"]
+                histogram["max"] = max(histogram["max"], value["max"])
+        return {key: self._histogram_stats(buckets, histogram) for key, histogram in merged.items()}
+
+    @classmethod
+    def _histogram_stats(cls, buckets: Sequence[float], histogram: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "count": histogram["count"],
+            "sum": round(histogram["sum"], 6),
+            "mean": round(histogram["sum"] / histogram["count"], 6),
+            "max": round(histogram["max"], 6),
+            "p50": cls._quantile(buckets, histogram, 0.5),
+            "p95": cls._quantile(buckets, histogram, 0.95),
+        }
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Writes the Prometheus text format to `path` atomically, e.g. for the textfile
+        collector of node_exporter.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """
+    Returns the cost of one model call from LLM_PRICES, or None if the model has no price.
+    """
+    prices = LLM_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+def _token_usage(response: Any) -> Tuple[int, int]:
+    """
+    The (prompt, completion) tokens of an LLMResult: the usage metadata of the
+    messages, or the provider's "token_usage" if the messages have none.
+    """
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if prompt or completion:
+        return prompt, completion
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records the wall time, time to first token, token usage, cost, errors and
+    retries of every model call, tool call, graph node and agent run it sees.
+
+    Runs are labelled with the graph node (the "langgraph_node" metadata LangGraph
+    gives every run inside a node), the role of the model (the "role" metadata set
+    by `get_llm`) and the tool name. Agent runs are the chains named by `label_agent`.
+
+    The process-wide handler (`registry.get("metrics_handler")`) is attached to every
+    model, tool and agent, and each orchestrator run adds a handler of its own for
+    the run's JSON summary (see `run_callbacks`). LangChain adds a handler only once
+    per run, so nothing is counted twice.
+    """
+
+    # Timings are taken in the caller's thread/task, not after a hop to an executor
+    run_inline = True
+
+    def __init__(self, metrics: Optional[Metrics] = None):
+        self.metrics = metrics or Metrics()
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+
+    def _start(self, run_id: Any, **labels: Any) -> None:
+        self._runs[run_id] = {"start": time.perf_counter(), "first_token": None, **labels}
+
+    def _start_llm(self, run_id: Any, metadata: Optional[Dict[str, Any]]) -> None:
+        metadata = metadata or {}
+        self._start(
+            run_id,
+            node=metadata.get("langgraph_node"),
+            role=metadata.get("role"),
+            model=metadata.get("ls_model_name"),
+        )
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: Any, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, run_id: Any, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_new_token(self, token: str, *, run_id: Any, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and run["first_token"] is None:
+            run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response: Any, *, run_id: Any, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        labels = {"node": run["node"], "role": run["role"], "model": run["model"]}
+        self.metrics.observe("llm_latency_seconds", time.perf_counter() - run["start"], **labels)
+        if run["first_token"] is not None:
+            self.metrics.observe("llm_time_to_first_token_seconds", run["first_token"] - run["start"], **labels)
+
+        prompt_tokens, completion_tokens = _token_usage(response)
+        self.metrics.inc("llm_tokens_total", prompt_tokens, type="prompt", **labels)
+        self.metrics.inc("llm_tokens_total", completion_tokens, type="completion", **labels)
+        cost = llm_cost(run["model"] or "", prompt_tokens, completion_tokens)
+        if cost is not None:
+            self.metrics.inc("llm_cost_total", cost, **labels)
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self.metrics.inc("errors_total", node=run["node"], kind="llm", name=run["role"])
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: Any, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        self._start(run_id, node=(metadata or {}).get("langgraph_node"), tool=name)
+
+    def _end_tool(self, run_id: Any, status: str) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        self.metrics.observe("tool_latency_seconds", time.perf_counter() - run["start"], node=run["node"], tool=run["tool"], status=status)
+        if status == "error":
+            self.metrics.inc("errors_total", node=run["node"], kind="tool", name=run["tool"])
+
+    def on_tool_end(self, output: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._end_tool(run_id, "error")
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: Any, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        # Only the graph nodes themselves and the agents are steps; the prompts,
+        # parsers and sequences inside them are not
+        metadata = metadata or {}
+        name = kwargs.get("name")
+        node = metadata.get("langgraph_node")
+        if name is not None and name == metadata.get(AGENT_METADATA_KEY):
+            self._start(run_id, node=node, step=name, kind="agent")
+        elif node is not None and name == node:
+            self._start(run_id, node=node, step=node, kind="node")
+
+    def _end_step(self, run_id: Any, status: str) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        self.metrics.observe("step_latency_seconds", time.perf_counter() - run["start"], node=run["node"], step=run["step"], kind=run["kind"], status=status)
+        if status == "error":
+            self.metrics.inc("errors_total", node=run["node"], kind=run["kind"], name=run["step"])
+
+    def on_chain_end(self, outputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._end_step(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._end_step(run_id, "error")
+
+    def on_retry(self, retry_state: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self.metrics.inc("retries_total", source="runnable")
+
+    def on_embedding(self, seconds: float, texts: int, model: str, node: Optional[str] = None) -> None:
+        """
+        Records one embedding request; embedding models have no callbacks of their own.
+        """
+        self.metrics.observe("embedding_latency_seconds", seconds, node=node, model=model)
+        self.metrics.inc("embedding_texts_total", texts, node=node, model=model)
+
+def _serve(metrics: Metrics, host: str, port: int) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    log.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+
+def create_metrics_handler() -> MetricsCallbackHandler:
+    """
+    Builds the process-wide metrics handler, and serves its metrics on
+    http://METRICS_HOST:METRICS_PORT/metrics if METRICS_PORT is set. The endpoint
+    binds to 127.0.0.1 unless METRICS_HOST says otherwise.
+
+    Use `registry.get("metrics_handler")` rather than calling this directly.
+    """
+    handler = MetricsCallbackHandler()
+    if METRICS_PORT:
+        try:
+            _serve(handler.metrics, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            log.warning(f"Could not serve metrics on {METRICS_HOST}:{METRICS_PORT}: {e}")
+    return handler
+
+def metrics_callbacks() -> List[BaseCallbackHandler]:
+    """
+    The callbacks to attach to a model, tool or agent: the process-wide metrics
+    handler, or none if METRICS_ENABLED is off.
+    """
+    if not METRICS_ENABLED:
+        return []
+    return [registry.get("metrics_handler")]
+
+def label_agent(runnable: Runnable, agent: str) -> Runnable:
+    """
+    Names an agent chain, so its runs are recorded as steps of `agent`.
+
+    An AgentExecutor takes the same settings directly:
+    `AgentExecutor(..., name=agent, metadata={AGENT_METADATA_KEY: agent})`.
+    """
+    # Callbacks are not bound here: a bound callback list replaces the callbacks
+    # of the graph node that invokes the chain, instead of adding to them
+    return runnable.with_config(run_name=agent, metadata={AGENT_METADATA_KEY: agent})
+
+def _active_handlers() -> List[MetricsCallbackHandler]:
+    """
+    The metrics handlers of the run that is currently executing in this thread or
+    task (e.g. the tool that called an embedding model), plus the process-wide one.
+    """
+    from langchain_core.runnables.config import var_child_runnable_config
+
+    handlers = list(metrics_callbacks())
+    callbacks = (var_child_runnable_config.get() or {}).get("callbacks")
+    # A list of handlers, or the callback manager of the parent run
+    for handler in getattr(callbacks, "handlers", callbacks) or []:
+        if isinstance(handler, MetricsCallbackHandler) and handler not in handlers:
+            handlers.append(handler)
+    return handlers
+
+def _current_node() -> Optional[str]:
+    from langchain_core.runnables.config import var_child_runnable_config
+
+    return ((var_child_runnable_config.get() or {}).get("metadata") or {}).get("langgraph_node")
+
+class MeteredEmbeddings(Embeddings):
+    """
+    Records the wall time and number of texts of every request to an embedding
+    model, labelled with the graph node that made it.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str):
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything else (e.g. `model`) comes from the wrapped model
+        return getattr(self.__dict__["embeddings"], name)
+
+    def _record(self, start: float, texts: int) -> None:
+        elapsed = time.perf_counter() - start
+        node = _current_node()
+        for handler in _active_handlers():
+            handler.on_embedding(elapsed, texts, self.model_name, node)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        self._record(start, len(texts))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        self._record(start, 1)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        vectors = await self.embeddings.aembed_documents(texts)
+        self._record(start, len(texts))
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        vector = await self.embeddings.aembed_query(text)
+        self._record(start, 1)
+        return vector
+
+def count_retry(source: str) -> None:
+    """
+    Counts one retried request outside LangChain, e.g. an embedding batch.
+    """
+    for handler in _active_handlers():
+        handler.metrics.inc("retries_total", source=source)
+
+def run_callbacks() -> Tuple[List[BaseCallbackHandler], MetricsCallbackHandler]:
+    """
+    Returns the callbacks for one orchestrator run and the handler that collects
+    the run's own metrics, for `write_run_summary`.
+
+    Pass the callbacks in the run config, e.g.
+    `orchestrator.stream(state, config={**config, "callbacks": callbacks})`; every
+    node, agent, tool and model call of the run inherits them.
+    """
+    run_handler = MetricsCallbackHandler()
+    return metrics_callbacks() + [run_handler], run_handler
+
+def write_run_summary(run_handler: MetricsCallbackHandler, run_id: str, started_at: float, status: str = "ok") -> Optional[str]:
+    """
+    Writes the JSON summary of one orchestrator run to METRICS_DIR/runs/<run_id>.json
+    and refreshes METRICS_DIR/intelli_core.prom with the process-wide metrics.
+
+    Args:
+        run_handler (MetricsCallbackHandler): The handler returned by `run_callbacks`.
+        run_id (str): The ID of the run, e.g. its thread_id.
+        started_at (float): The `time.time()` at which the run started.
+        status (str): "ok", or "error" if the run failed.
+
+    Returns:
+        Optional[str]: The path of the summary, or None if METRICS_ENABLED is off.
+    """
+    if not METRICS_ENABLED:
+        return None
+    summary = {
+        "run_id": run_id,
+        "status": status,
+        "started_at": datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+        "wall_seconds": round(time.time() - started_at, 3),
+        "metrics": run_handler.metrics.summary(),
+    }
+    path = os.path.join(METRICS_DIR, "runs", f"{run_id}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    for handler in metrics_callbacks():
+        handler.metrics.write_prometheus(os.path.join(METRICS_DIR, f"{PREFIX}.prom"))
+    log.info(f"Run metrics written to {path}")
+    return path
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.tools import tool
+
+    @tool
+    def word_count(text: str) -> int:
+        """Counts the words of a text."""
+        return len(text.split())
+
+    handler = MetricsCallbackHandler()
+    model = FakeListChatModel(responses=["a short answer"] * 3, callbacks=[handler], metadata={"role": "writer"})
+    for _ in range(3):
+        model.invoke("Say something")
+    word_count.invoke("one two three", config={"callbacks": [handler]})
+    for chunk in model.stream("Stream something", config={"callbacks": [handler]}):
+        pass
+
+    print(handler.metrics.render_prometheus())
+    print(json.dumps(handler.metrics.summary(), indent=2))
@@ -1,63 +1,337 @@
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from .config import OPENAI_API_KEY, DEFAULT_LLM_MODEL, DEFAULT_EMBEDDING_MODEL
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
 
-def get_llm(model_name: str = DEFAULT_LLM_MODEL):
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    DEFAULT_LLM_MODEL,
+    DEFAULT_EMBEDDING_MODEL,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    LLM_CACHE_ENABLED,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    LLM_ROLES,
+    METRICS_ENABLED,
+)
+from .embedding_cache import CachedEmbeddings
+from .llm_cache import ChainLabelHandler
+from .metrics import MeteredEmbeddings, count_retry, metrics_callbacks
+from . import registry
+from .logger import log
+
+class PoolStats:
+    """
+    Request and connection counters of one pooled HTTP client.
+
+    A connection is counted when it first serves a response, so
+    `1 - connections_opened / requests` is the share of requests that reused a
+    kept-alive connection instead of paying a new TCP/TLS handshake.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self._seen = weakref.WeakSet()
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def record(self, pool: Any) -> None:
+        with self._lock:
+            self.requests += 1
+            if pool is None:
+                return
+            self._pool = pool
+            for connection in getattr(pool, "connections", ()):
+                if connection not in self._seen:
+                    self._seen.add(connection)
+                    self.connections_opened += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            connections = list(getattr(self._pool, "connections", ()))
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "reuse_rate": 1 - self.connections_opened / self.requests if self.requests else 0.0,
+                "open_connections": len(connections),
+                "idle_connections": sum(1 for connection in connections if getattr(connection, "is_idle", lambda: False)()),
+            }
+
+def _connection_pool(transport: Any) -> Any:
+    # The httpcore pool is private to httpx; if a release moves it, only the
+    # connection counters are lost, and the response hooks keep working
+    return getattr(transport, "_pool", None)
+
+class PerLoopTransport(httpx.AsyncBaseTransport):
+    """
+    An async transport with one connection pool per event loop.
+
+    Async connections belong to the loop that opened them, so a single pool breaks
+    as soon as a second `asyncio.run()` (a script, a worker, a Streamlit rerun) reuses
+    the shared client. Each running loop gets its own pool instead; the pool of a loop
+    is dropped with the loop.
+    """
+
+    def __init__(self, **transport_options: Any):
+        self._options = transport_options
+        self._transports = weakref.WeakKeyDictionary()
+
+    def current(self) -> httpx.AsyncHTTPTransport:
+        """
+        Returns the transport (and pool) of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._options)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+_pool_stats: Dict[str, PoolStats] = {}
+
+# The OpenAI SDK retries requests that get one of these responses
+_RETRYABLE_STATUS = (408, 409, 429)
+
+def _count_retryable(response: httpx.Response) -> None:
+    if response.status_code in _RETRYABLE_STATUS or response.status_code >= 500:
+        count_retry("http")
+
+def _pool_options() -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    }
+
+def create_http_client() -> httpx.Client:
+    """
+    Builds the pooled sync HTTP client that every chat and embedding model shares.
+
+    Use `registry.get("http_client")` rather than calling this directly.
+    """
+    stats = _pool_stats["sync"] = PoolStats()
+    client = httpx.Client(
+        **_pool_options(),
+        event_hooks={"response": [lambda response: stats.record(_connection_pool(getattr(client, "_transport", None))), _count_retryable]},
+    )
+    return client
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """
+    Builds the pooled async HTTP client that every chat and embedding model shares.
+
+    Use `registry.get("http_async_client")` rather than calling this directly.
+    """
+    stats = _pool_stats["async"] = PoolStats()
+    options = _pool_options()
+    transport = PerLoopTransport(limits=options.pop("limits"))
+
+    async def record(response: httpx.Response) -> None:
+        stats.record(_connection_pool(transport.current()))
+        _count_retryable(response)
+
+    return httpx.AsyncClient(**options, transport=transport, event_hooks={"response": [record]})
+
+def http_pool_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Returns the counters of the shared "sync" and "async" HTTP clients built so far.
+    """
+    return {name: stats.snapshot() for name, stats in _pool_stats.items()}
+
+def _client_options() -> Dict[str, Any]:
+    """
+    The connection settings shared by every ChatOpenAI and OpenAIEmbeddings instance.
+    """
+    return {
+        "base_url": OPENAI_BASE_URL,
+        # The OpenAI SDK sends its own per-request timeout, which would override the pool's
+        "timeout": _pool_options()["timeout"],
+        "http_client": registry.get("http_client"),
+        "http_async_client": registry.get("http_async_client"),
+    }
+
+def llm_latency_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Returns the number of calls and the mean/p50/p95 latency in milliseconds of the
+    model calls of every role since the process started.
+
+    Read from the process-wide metrics (see `core.metrics`), so the percentiles are
+    the upper bounds of the histogram buckets that hold them. Empty if
+    METRICS_ENABLED is off.
+    """
+    if not METRICS_ENABLED:
+        return {}
+    histograms = registry.get("metrics_handler").metrics.aggregate("llm_latency_seconds", "role")
+    return {
+        role: {
+            "calls": histogram["count"],
+            "mean_ms": 1000 * histogram["mean"],
+            "p50_ms": 1000 * histogram["p50"],
+            "p95_ms": 1000 * histogram["p95"],
+        }
+        for role, histogram in histograms.items()
+    }
+
+def get_llm(model_name: Optional[str] = None, use_cache: bool = LLM_CACHE_ENABLED, role: Optional[str] = None):
     """
     Initializes and returns a ChatOpenAI instance.
 
+    Every instance sends its requests to OPENAI_BASE_URL through the shared HTTP
+    connection pool (see `http_pool_stats`). With a `role`, the model, max_tokens
+    and timeout come from LLM_ROLES. Every call is reported to the metrics handler
+    (see `core.metrics`), labelled with the role; `llm_latency_stats` reads the
+    latency per role from there.
+
     Args:
-        model_name (str): The name of the OpenAI model to use.
+        model_name (Optional[str]): The name of the OpenAI model to use. Defaults to
+            the model of the role, or DEFAULT_LLM_MODEL.
+        use_cache (bool): Whether to answer repeated prompts from the persistent
+            response cache (`registry.get("llm_cache")`).
+        role (Optional[str]): One of LLM_ROLES, e.g. "decomposer" or "writer".
 
     Returns:
         A configured ChatOpenAI instance.
     
     Raises:
-        ValueError: If OPENAI_API_KEY is not set.
+        ValueError: If OPENAI_API_KEY is not set or the role is unknown.
     """
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY not found in .env file. Please set it.")
-    
+    if role is not None and role not in LLM_ROLES:
+        raise ValueError(f"Unknown LLM role: {role}. Expected one of {sorted(LLM_ROLES)}")
+    # Imported here because langchain_openai is slow to import and most imports of
+    # this module never build a model
+    from langchain_openai import ChatOpenAI
+
+    options = _client_options()
+    callbacks: List[BaseCallbackHandler] = metrics_callbacks()
+    if role is not None:
+        settings = LLM_ROLES[role]
+        model_name = model_name or settings["model"]
+        options["max_tokens"] = settings["max_tokens"] or None
+        options["timeout"] = httpx.Timeout(settings["timeout"], connect=HTTP_CONNECT_TIMEOUT)
+    if use_cache:
+        # With temperature=0 the same prompt gets the same answer, so it can be cached.
+        # The handler tells the cache which chain is calling, for per-chain TTLs.
+        options["cache"] = registry.get("llm_cache")
+        callbacks.append(ChainLabelHandler())
+
     model = ChatOpenAI(
-        model_name=model_name,
+        model_name=model_name or DEFAULT_LLM_MODEL,
         openai_api_key=OPENAI_API_KEY,
         temperature=0, # Set for predictable outputs
+        callbacks=callbacks,
+        metadata={"role": role or "default"},
+        **options,
     )
     return model
 
-def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL):
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL, use_cache: bool = EMBEDDING_CACHE_ENABLED):
     """
-    Initializes and returns an OpenAIEmbeddings instance.
+    Initializes and returns an OpenAIEmbeddings instance, using the same HTTP
+    connection pool as the chat models.
 
     Args:
         model_name (str): The name of the OpenAI embedding model to use.
+        use_cache (bool): Whether to wrap the model in a persistent embedding cache.
 
     Returns:
-        A configured OpenAIEmbeddings instance.
+        A configured OpenAIEmbeddings instance, wrapped in a CachedEmbeddings if `use_cache` is set.
+        The requests that reach the provider are metered (see `core.metrics.MeteredEmbeddings`).
 
     Raises:
         ValueError: If OPENAI_API_KEY is not set.
     """
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY not found in .env file. Please set it.")
-        
+    from langchain_openai import OpenAIEmbeddings
+
     embedding_model = OpenAIEmbeddings(
         model=model_name,
-        openai_api_key=OPENAI_API_KEY
+        openai_api_key=OPENAI_API_KEY,
+        **_client_options(),
     )
+    if METRICS_ENABLED:
+        embedding_model = MeteredEmbeddings(embedding_model, model_name)
+    if use_cache:
+        embedding_model = CachedEmbeddings(
+            embedding_model,
+            model_name=model_name,
+            path=EMBEDDING_CACHE_PATH,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        )
     return embedding_model
 
-# Instantiate the models for easy import elsewhere
-try:
-    llm = get_llm()
-    embedding_model = get_embedding_model()
-except ValueError as e:
-    print(f"Could not initialize models: {e}")
-    llm = None
-    embedding_model = None
+def create_default_llm(role: Optional[str] = None):
+    """
+    Builds the shared LLM of the application (or of a role), or returns None if it
+    cannot be initialized.
+
+    Use `registry.get("llm")` or `get_role_llm(role)` rather than calling this
+    directly, so the model is created once, on first use.
+    """
+    try:
+        return get_llm(role=role)
+    except ValueError as e:
+        print(f"Could not initialize models: {e}")
+        return None
+
+def get_role_llm(role: str):
+    """
+    Returns the shared model of a role (see LLM_ROLES), built on first use, or None
+    if it cannot be initialized.
+
+    Raises:
+        ValueError: If the role is unknown.
+    """
+    if role not in LLM_ROLES:
+        raise ValueError(f"Unknown LLM role: {role}. Expected one of {sorted(LLM_ROLES)}")
+    return registry.get(f"llm.{role}", lambda: create_default_llm(role))
+
+def create_default_embedding_model():
+    """
+    Builds the shared embedding model, or returns None if it cannot be initialized.
+
+    Use `registry.get("embedding_model")` rather than calling this directly.
+    """
+    try:
+        return get_embedding_model()
+    except ValueError as e:
+        print(f"Could not initialize models: {e}")
+        return None
+
+def __getattr__(name: str):
+    # `from core.model_provider import llm` still works, but builds the model at that
+    # point; code on the import path of the app should call registry.get() when needed.
+    if name in ("llm", "embedding_model"):
+        return registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Example Usage ---
 if __name__ == '__main__':
+    llm = registry.get("llm")
+    embedding_model = registry.get("embedding_model")
     if not llm or not embedding_model:
         print("Skipping example because models could not be initialized.")
     else:
@@ -0,0 +1,141 @@
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .logger import log
+
+# The shared resources of the application. Factories are given as "module:function"
+# paths, so neither the resource nor the module that builds it is imported before
+# the first `get()`.
+_DEFAULT_FACTORIES: Dict[str, str] = {
+    "llm": "core.model_provider:create_default_llm",
+    "embedding_model": "core.model_provider:create_default_embedding_model",
+    "llm_cache": "core.llm_cache:create_default_cache",
+    "metrics_handler": "core.metrics:create_metrics_handler",
+    "http_client": "core.model_provider:create_http_client",
+    "http_async_client": "core.model_provider:create_async_http_client",
+    "chroma_client": "rag.vector_store:create_client",
+    "calculator_tool": "tools.calculator_tool:get_calculator_tool",
+    "rag_tool": "tools.rag_tool:get_rag_tool",
+    "search_tool": "tools.search_tool:create_search_tool",
+    "task_decomposer": "mcp.task_decomposer:get_task_decomposer",
+    "researcher_agent": "mcp.agent_manager:create_researcher_agent",
+    "writer_agent": "mcp.agent_manager:create_writer_agent",
+    "agent_executor": "agent.agent_executor:get_agent_executor",
+    "orchestrator": "mcp.orchestrator:get_orchestrator",
+}
+
+_factories: Dict[str, Union[str, Callable[[], Any]]] = dict(_DEFAULT_FACTORIES)
+_instances: Dict[str, Any] = {}
+_building: List[str] = []
+# Reentrant, because building one resource usually gets others (the orchestrator needs the LLM)
+_lock = threading.RLock()
+
+def _load(factory: Union[str, Callable[[], Any]]) -> Callable[[], Any]:
+    if callable(factory):
+        return factory
+    module_name, _, attribute = factory.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+def register(name: str, factory: Union[str, Callable[[], Any]]) -> None:
+    """
+    Registers (or replaces) the factory of a resource.
+
+    An instance that was already built is discarded, so the next `get()` uses the
+    new factory.
+
+    Args:
+        name (str): The name of the resource.
+        factory (Union[str, Callable[[], Any]]): A callable without arguments, or a
+            "module:function" path that is imported on first use.
+    """
+    with _lock:
+        _factories[name] = factory
+        _instances.pop(name, None)
+
+def get(name: str, factory: Optional[Callable[[], Any]] = None) -> Any:
+    """
+    Returns a shared resource, building it on first use.
+
+    Every resource is built at most once per process, also when several threads ask
+    for it at the same time; later calls return the same instance.
+
+    Args:
+        name (str): The name of the resource, e.g. "llm" or "rag_tool".
+        factory (Optional[Callable[[], Any]]): Registered under `name` if nothing is
+            registered yet, for resources that only exist on demand (e.g. one model per role).
+
+    Raises:
+        KeyError: If no factory is registered under `name` and none is given.
+        RuntimeError: If the factory of `name` (indirectly) needs `name` itself.
+    """
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+
+    with _lock:
+        if name in _instances:
+            return _instances[name]
+        if name not in _factories and factory is not None:
+            _factories[name] = factory
+        if name not in _factories:
+            raise KeyError(f"No resource registered under '{name}'")
+        if name in _building:
+            raise RuntimeError(f"Circular dependency: {' -> '.join(_building + [name])}")
+
+        _building.append(name)
+        try:
+            start = time.perf_counter()
+            instance = _load(_factories[name])()
+        finally:
+            _building.pop()
+        log.debug("Initialized %s in %.1f ms", name, (time.perf_counter() - start) * 1000)
+        _instances[name] = instance
+        return instance
+
+def provide(name: str, instance: Any) -> None:
+    """
+    Uses `instance` for a resource instead of building it, e.g. a fake model in a script.
+    """
+    with _lock:
+        _factories.setdefault(name, lambda: instance)
+        _instances[name] = instance
+
+def reset(name: Optional[str] = None) -> None:
+    """
+    Discards a built resource (or all of them), so the next `get()` builds it again.
+    """
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+def initialized() -> List[str]:
+    """
+    Returns the names of the resources that have been built so far.
+    """
+    return list(_instances)
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    calls = []
+
+    def slow_resource():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    register("example", slow_resource)
+    print(f"Initialized before first use: {initialized()}")
+
+    threads = [threading.Thread(target=get, args=("example",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"Built {len(calls)} time(s) for 8 concurrent callers; same instance: {get('example') is get('example')}")
+    print(f"Initialized after first use: {initialized()}")
@@ -4,9 +4,10 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.tools import BaseTool
 
 from agent.base_agent import create_intelli_agent
-from core.model_provider import llm
-from tools.rag_tool import rag_tool
-from tools.search_tool import search_tool
+from core import registry
+from core.llm_cache import label_chain
+from core.metrics import AGENT_METADATA_KEY, label_agent, metrics_callbacks
+from core.model_provider import get_role_llm
 
 # --- Agent Prompts ---
 
@@ -56,16 +57,20 @@ def create_researcher_agent() -> AgentExecutor:
     Creates an agent specialized in research tasks.
     It is equipped with search and knowledge base tools.
     """
-    tools: List[BaseTool] = [search_tool, rag_tool]
+    tools: List[BaseTool] = [registry.get("search_tool"), registry.get("rag_tool")]
     prompt = PromptTemplate.from_template(RESEARCHER_PROMPT_TEMPLATE)
     
-    agent = create_intelli_agent(llm, tools, prompt)
+    agent = create_intelli_agent(get_role_llm("researcher"), tools, prompt)
     
     executor = AgentExecutor(
         agent=agent,
         tools=tools,
         verbose=True,
         handle_parsing_errors=True,
+        # Recorded as the "researcher" agent step by the metrics handler
+        name="researcher",
+        metadata={AGENT_METADATA_KEY: "researcher"},
+        callbacks=metrics_callbacks(),
     )
     return executor
 
@@ -78,9 +83,9 @@ def create_writer_agent() -> "Runnable":
     prompt = PromptTemplate.from_template(WRITER_PROMPT_TEMPLATE)
     
     # This "agent" is a simple chain, not an executor, as it has no tools.
-    writer_chain = prompt | llm
+    writer_chain = prompt | get_role_llm("writer")
     
-    return writer_chain
+    return label_agent(label_chain(writer_chain, "writer"), "writer")
 
 if __name__ == '__main__':
     # --- Example Usage ---
@@ -1,9 +1,7 @@
-from typing import TypedDict, Annotated
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+import time
+from typing import Any, Dict, Iterator, TypedDict, Annotated
 
-from mcp.agent_manager import create_researcher_agent, create_writer_agent
-from mcp.task_decomposer import task_decomposer
+from core import registry
 from core.logger import log
 
 from core.logger import log
@@ -30,7 +28,7 @@ def decompose_task_node(state: GraphState):
     request = state['user_request']
     
     log.info(f"Decomposing request: '{request}'")
-    topic = task_decomposer.invoke({"user_request": request})
+    topic = registry.get("task_decomposer").invoke({"user_request": request})
     log.info(f"Extracted Topic: '{topic}'")
     
     return {"topic": topic}
@@ -43,7 +41,8 @@ def research_node(state: GraphState):
     topic = state['topic']
     
     log.info(f"Invoking researcher for topic: '{topic}'")
-    researcher = create_researcher_agent()
+    # The agents are built on the first run and shared by every later one
+    researcher = registry.get("researcher_agent")
     findings = researcher.invoke({"input": topic})
     log.info(f"Research complete. Findings length: {len(findings['output'])}")
     
@@ -58,7 +57,7 @@ def write_node(state: GraphState):
     topic = state['topic']
     
     log.info(f"Invoking writer for topic: '{topic}'")
-    writer = create_writer_agent()
+    writer = registry.get("writer_agent")
     report = writer.invoke({"research_findings": findings, "topic": topic})
     log.info("Writing complete.")
     
@@ -69,7 +68,14 @@ def write_node(state: GraphState):
 def get_orchestrator():
     """
     Builds and compiles the LangGraph orchestrator.
+
+    Use `registry.get("orchestrator")` rather than calling this directly, so the
+    graph is compiled once, on first use.
     """
+    # langgraph is only imported when a graph is built
+    from langgraph.graph import StateGraph, END
+    from langgraph.checkpoint.memory import MemorySaver
+
     workflow = StateGraph(GraphState)
 
     # Add the nodes
@@ -91,18 +97,51 @@ def get_orchestrator():
     
     return orchestrator
 
-# Instantiate the orchestrator
-main_orchestrator = get_orchestrator()
+def stream_run(user_request: str, config: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Runs the orchestrator on a request and yields the update of every node, like
+    `orchestrator.stream()`.
+
+    Every node, agent, tool and model call of the run is instrumented (see
+    core.metrics); when the run ends, its JSON summary is written to
+    METRICS_DIR/runs/<thread_id>.json and the Prometheus file is refreshed.
+
+    Args:
+        user_request (str): The request of the user.
+        config (Dict[str, Any]): The run config, with a unique thread_id in "configurable".
+    """
+    # Imported here, like langgraph, because it pulls in langchain_core
+    from core.metrics import run_callbacks, write_run_summary
+
+    callbacks, run_handler = run_callbacks()
+    run_config = {**config, "callbacks": list(config.get("callbacks") or []) + callbacks}
+    run_id = config["configurable"]["thread_id"]
+    started_at = time.time()
+    status = "error"
+    try:
+        yield from registry.get("orchestrator").stream({"user_request": user_request}, config=run_config)
+        status = "ok"
+    finally:
+        write_run_summary(run_handler, run_id, started_at, status)
+
+def __getattr__(name: str):
+    # Keeps `from mcp.orchestrator import main_orchestrator` working; the graph is
+    # compiled on first use
+    if name == "main_orchestrator":
+        return registry.get("orchestrator")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
     # --- Example Usage ---
+    main_orchestrator = registry.get("orchestrator")
     print("Orchestrator is ready.")
     
     user_request = "Write a short report on the main challenges and opportunities in the field of AI Agents."
     config = {"configurable": {"thread_id": "user-123"}} # Unique ID for the run
     
-    # The .stream() method returns an iterator of the state at each step
-    for step in main_orchestrator.stream({"user_request": user_request}, config=config):
+    # stream_run() returns an iterator of the state at each step, and writes the
+    # metrics of the run when it ends
+    for step in stream_run(user_request, config):
         # The key is the name of the node that just ran
         node_name = list(step.keys())[0]
         print(f"\n--- Finished Step: {node_name} ---")
@@ -112,3 +151,8 @@ if __name__ == '__main__':
     final_state = main_orchestrator.get_state(config)
     print("\n--- Final Report ---")
     print(final_state.values['final_report'])
+
+    from core.model_provider import llm_latency_stats
+    print("\n--- LLM Latency by Role ---")
+    for role, stats in llm_latency_stats().items():
+        print(f"{role}: {stats['calls']} calls, p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms")
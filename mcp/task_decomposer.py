@@ -1,6 +1,8 @@
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from core.model_provider import llm
+from core import registry
+from core.llm_cache import label_chain
+from core.model_provider import get_role_llm
 
 # --- Task Decomposition Prompt ---
 
@@ -35,15 +37,19 @@ def get_task_decomposer() -> "Runnable":
     prompt = PromptTemplate.from_template(DECOMPOSER_PROMPT_TEMPLATE)
     
     # The chain consists of the prompt, the LLM, and a string output parser.
-    decomposer_chain = prompt | llm | StrOutputParser()
+    decomposer_chain = prompt | get_role_llm("decomposer") | StrOutputParser()
     
-    return decomposer_chain
+    return label_chain(decomposer_chain, "task_decomposer")
 
-# Instantiate the decomposer
-task_decomposer = get_task_decomposer()
+def __getattr__(name: str):
+    # The decomposer is built on first use; see core.registry
+    if name == "task_decomposer":
+        return registry.get("task_decomposer")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
     # --- Example Usage ---
+    task_decomposer = registry.get("task_decomposer")
     print("--- Testing Task Decomposer ---")
     
     request1 = "Please research the benefits of a four-day work week and then write a report for management."
@@ -0,0 +1,289 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.config import IVF_NLIST, IVF_NPROBE
+from .numpy_store import NumpyVectorIndex, ids_digest, new_embeddings_file, write_sidecar
+
+IVF_FILE = "ivf.npz"
+
+# Maximum number of vectors used to train the k-means centroids
+_TRAIN_SAMPLE_SIZE = 100_000
+# Number of rows assigned to centroids per matmul block
+_ASSIGN_BLOCK_ROWS = 65_536
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Assigns every row to the centroid with the highest cosine similarity.
+    """
+    assignments = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), _ASSIGN_BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + _ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def train_kmeans(vectors: np.ndarray, n_lists: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Trains spherical k-means centroids on L2-normalised vectors.
+
+    Args:
+        vectors (np.ndarray): The training vectors, shape (n, dim).
+        n_lists (int): The number of centroids.
+        n_iter (int): The number of Lloyd iterations.
+        seed (int): The random seed.
+
+    Returns:
+        np.ndarray: The normalised centroids, shape (n_lists, dim).
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        counts = np.bincount(assignments, minlength=n_lists)
+
+        # Sum the members of every list with one sort + reduceat instead of a Python loop
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        non_empty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(vectors[order], starts[non_empty], axis=0)
+
+        # Re-seed empty lists with random training vectors
+        n_empty = int((~non_empty).sum())
+        if n_empty:
+            sums[~non_empty] = vectors[rng.choice(len(vectors), n_empty, replace=False)]
+        centroids = _normalize(sums)
+
+    return centroids
+
+def build_ivf_index(path: Union[str, Path], n_lists: Optional[int] = None, n_iter: int = 20, seed: int = 0) -> Path:
+    """
+    Builds an IVF-flat index on top of a NumPy index created by `build_numpy_index`.
+
+    The rows of the embedding matrix and its sidecar are reordered so that the members
+    of every inverted list are contiguous, and published as a new build. The centroids
+    plus list offsets are stored in `ivf.npz` next to them, with a digest of the
+    reordered sidecar so that an index whose rows were re-exported since is detected
+    as stale. The reordered matrix still serves exact search.
+
+    Args:
+        path (Union[str, Path]): The NumPy index directory.
+        n_lists (Optional[int]): The number of inverted lists. Defaults to IVF_NLIST, or
+            4 * sqrt(n) if that is 0.
+        n_iter (int): The number of k-means iterations.
+        seed (int): The random seed.
+
+    Returns:
+        Path: The index directory.
+    """
+    path = Path(path)
+    index = NumpyVectorIndex(path)
+    embeddings = index.embeddings
+
+    n_rows = len(embeddings)
+    n_lists = n_lists or IVF_NLIST or int(4 * np.sqrt(n_rows))
+    n_lists = max(1, min(n_lists, n_rows))
+
+    if n_rows:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(n_rows, min(n_rows, _TRAIN_SAMPLE_SIZE), replace=False)
+        centroids = train_kmeans(embeddings[np.sort(sample)], n_lists, n_iter=n_iter, seed=seed)
+        assignments = _assign(embeddings, centroids)
+    else:
+        centroids = np.zeros((0, embeddings.shape[1] if embeddings.ndim == 2 else 0), dtype=np.float32)
+        assignments = np.empty(0, dtype=np.int64)
+
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+
+    # Rewrite the matrix and the sidecar in list order
+    embeddings_file = new_embeddings_file(path)
+    reordered = np.lib.format.open_memmap(embeddings_file, mode="w+", dtype=embeddings.dtype, shape=embeddings.shape)
+    for start in range(0, n_rows, _ASSIGN_BLOCK_ROWS):
+        rows = order[start:start + _ASSIGN_BLOCK_ROWS]
+        reordered[start:start + len(rows)] = embeddings[rows]
+    reordered.flush()
+    del reordered, embeddings
+
+    digest = write_sidecar(path, embeddings_file, {
+        "name": index.name,
+        "ids": [index.ids[i] for i in order],
+        "documents": [index.documents[i] for i in order],
+        "metadatas": [index.metadatas[i] for i in order],
+    })
+    del index
+
+    # Until ivf.npz is replaced too, readers see a digest mismatch and treat the IVF index as stale
+    tmp_ivf = path / (IVF_FILE + ".tmp.npz")
+    np.savez(tmp_ivf, centroids=centroids.astype(np.float32), offsets=offsets, digest=np.array(digest))
+    os.replace(tmp_ivf, path / IVF_FILE)
+    return path
+
+
+class IVFVectorIndex(NumpyVectorIndex):
+    """
+    An approximate IVF-flat index over a memory-mapped NumPy index.
+
+    A query is compared against the k-means centroids first, and only the `nprobe`
+    closest inverted lists are scanned exactly. `nprobe` trades recall for latency:
+    `nprobe == n_lists` is an exact search, small values scan a fraction of the corpus.
+    """
+
+    def __init__(self, path: Union[str, Path], nprobe: int = IVF_NPROBE):
+        """
+        Args:
+            path (Union[str, Path]): The index directory created by `build_ivf_index`.
+            nprobe (int): The default number of lists scanned per query.
+
+        Raises:
+            ValueError: If there is no IVF index at `path`, or it does not match the embeddings.
+        """
+        super().__init__(path)
+        if not (self.path / IVF_FILE).is_file():
+            raise ValueError(f"IVF index not found at: {self.path}")
+
+        with np.load(self.path / IVF_FILE) as ivf:
+            self.centroids = ivf["centroids"]
+            self.offsets = ivf["offsets"]
+            digest = str(ivf["digest"]) if "digest" in ivf.files else None
+        # The row count alone misses a re-export with as many rows in another order
+        if self.offsets[-1] != self.count() or digest != ids_digest(self.path):
+            raise ValueError(f"IVF index at {self.path} is stale. Rebuild it with build_ivf_index().")
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def exact_search(self, query_embeddings: Sequence[Sequence[float]], k: int, where: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force search over every row, used as the ground truth for recall.
+        """
+        return NumpyVectorIndex.search(self, query_embeddings, k, where=where)
+
+    def search(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        k: int,
+        nprobe: Optional[int] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the approximate top-k rows for a batch of queries.
+
+        Args:
+            query_embeddings (Sequence[Sequence[float]]): One or more query vectors.
+            k (int): The number of results per query.
+            nprobe (Optional[int]): The number of lists to scan. Defaults to `self.nprobe`.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter. If fewer
+                rows match than the probed lists would hold, the matching rows are
+                searched exactly instead.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row indices and similarities of shape
+            (n_queries, k), best match first. Rows are padded with -1 / -inf if the
+            probed lists hold fewer than k (matching) vectors.
+        """
+        queries = _normalize(np.atleast_2d(np.array(query_embeddings, dtype=np.float32)))
+        nprobe = max(1, min(nprobe or self.nprobe, self.n_lists))
+
+        mask = None
+        if where:
+            mask = self.metadata_index.mask(where)
+            n_matching = int(mask.sum())
+            if n_matching <= nprobe * self.count() / max(self.n_lists, 1):
+                return self.exact_search(queries, k, where=where)
+        k = min(k, self.count())
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if k == 0:
+            return indices, scores
+
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        for q, lists in enumerate(probes):
+            rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in np.sort(lists)])
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows) == 0:
+                continue
+            candidates = np.asarray(self.embeddings[rows], dtype=np.float32) @ queries[q]
+            n = min(k, len(rows))
+            top = np.argpartition(-candidates, n - 1)[:n] if len(rows) > n else np.arange(n)
+            top = top[np.argsort(-candidates[top])]
+            indices[q, :n] = rows[top]
+            scores[q, :n] = candidates[top]
+        return indices, scores
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        nprobe: Optional[int] = None,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Chroma-compatible query with an optional per-query `nprobe`.
+        """
+        indices, scores = self.search(query_embeddings, n_results, nprobe=nprobe, where=where)
+        found = indices >= 0
+        return self._format_results(
+            [row[mask] for row, mask in zip(indices, found)],
+            [row[mask] for row, mask in zip(scores, found)],
+            include,
+        )
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from .numpy_store import build_numpy_index
+
+    class _InMemoryCollection:
+        """A minimal stand-in for a chromadb.Collection."""
+        def __init__(self, name, embeddings):
+            self.name = name
+            self._embeddings = embeddings
+
+        def count(self):
+            return len(self._embeddings)
+
+        def get(self, limit, offset, include):
+            rows = range(offset, min(offset + limit, len(self._embeddings)))
+            return {
+                "ids": [f"id_{i}" for i in rows],
+                "embeddings": self._embeddings[offset:offset + limit],
+                "documents": [f"document {i}" for i in rows],
+                "metadatas": [{"source": "random", "chunk_number": i} for i in rows],
+            }
+
+    rng = np.random.default_rng(0)
+    clusters = rng.standard_normal((200, 128)).astype(np.float32)
+    vectors = clusters[rng.integers(0, 200, 50_000)] + 0.3 * rng.standard_normal((50_000, 128)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_numpy_index(_InMemoryCollection("random", vectors), path=tmp)
+        build_ivf_index(tmp, n_lists=256)
+        index = IVFVectorIndex(tmp)
+
+        queries = vectors[rng.integers(0, len(vectors), 100)] + 0.1 * rng.standard_normal((100, 128)).astype(np.float32)
+        exact, _ = index.exact_search(queries, k=10)
+        for nprobe in (1, 4, 16, 64):
+            start = time.perf_counter()
+            approx, _ = index.search(queries, k=10, nprobe=nprobe)
+            elapsed = time.perf_counter() - start
+            recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approx, exact)])
+            print(f"nprobe={nprobe:3d}  recall@10={recall:.3f}  {elapsed / len(queries) * 1000:.2f} ms/query")
+        del index
@@ -0,0 +1,219 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_THRESHOLD
+
+class SemanticAnswerCache:
+    """
+    An in-memory cache of RAG answers keyed on the query embedding.
+
+    A query whose embedding is within `threshold` cosine similarity of a cached
+    query returns the cached answer. All entries belong to one collection version;
+    when the version changes the whole cache is invalidated. Once `max_entries` is
+    reached, the least recently used entry is replaced.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            threshold (float): The minimum cosine similarity for a hit.
+            max_entries (int): The maximum number of cached answers.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        self._embeddings: Optional[np.ndarray] = None
+        self._answers: List[str] = []
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._clock = 0
+        self._version: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._answers:
+                self.invalidations += 1
+            self._answers = []
+            self._version = version
+
+    def lookup(self, query_embedding: Sequence[float], version: str) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar query, or None on a miss.
+
+        Args:
+            query_embedding (Sequence[float]): The embedding of the query.
+            version (str): The current version of the collection.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self._lock:
+            self._check_version(version)
+            if self._answers:
+                similarities = self._embeddings[:len(self._answers)] @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    self._clock += 1
+                    self._last_used[best] = self._clock
+                    return self._answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding: Sequence[float], answer: str, version: str) -> None:
+        """
+        Caches the answer to a query for the given collection version.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self._lock:
+            self._check_version(version)
+            if self._embeddings is None or self._embeddings.shape[1] != len(query):
+                self._embeddings = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+                self._answers = []
+
+            if len(self._answers) < self.max_entries:
+                slot = len(self._answers)
+                self._answers.append(answer)
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._answers[slot] = answer
+                self.evictions += 1
+
+            self._embeddings[slot] = query
+            self._clock += 1
+            self._last_used[slot] = self._clock
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss/eviction counters and the current size of the cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._answers),
+            "max_entries": self.max_entries,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercases a query and collapses its whitespace, the key of ExactAnswerCache.
+    """
+    return " ".join(query.lower().split())
+
+class ExactAnswerCache:
+    """
+    An in-memory cache of RAG answers keyed on the normalised query text.
+
+    Used in "lexical" mode, which retrieves without embedding the query, so the
+    cache does not make the embedding model a dependency of BM25-only retrieval.
+    Only the same question (up to case and whitespace) is a hit. Like
+    SemanticAnswerCache, all entries belong to one collection version and the least
+    recently used entry is replaced once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            max_entries (int): The maximum number of cached answers.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        self._answers: "OrderedDict[str, str]" = OrderedDict()
+        self._version: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._answers:
+                self.invalidations += 1
+            self._answers.clear()
+            self._version = version
+
+    def lookup(self, query: str, version: str) -> Optional[str]:
+        """
+        Returns the cached answer to the same query, or None on a miss.
+
+        Args:
+            query (str): The query text.
+            version (str): The current version of the collection.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            answer = self._answers.get(key)
+            if answer is None:
+                self.misses += 1
+                return None
+            self._answers.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def store(self, query: str, answer: str, version: str) -> None:
+        """
+        Caches the answer to a query for the given collection version.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            if len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss/eviction counters and the current size of the cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._answers),
+            "max_entries": self.max_entries,
+        }
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=2)
+
+    question = rng.standard_normal(64)
+    paraphrase = question + 0.05 * rng.standard_normal(64)
+    unrelated = rng.standard_normal(64)
+
+    cache.store(question, "Gustave Eiffel's company.", version="v1")
+    print(f"Paraphrase: {cache.lookup(paraphrase, version='v1')}")
+    print(f"Unrelated: {cache.lookup(unrelated, version='v1')}")
+    print(f"After the collection changed: {cache.lookup(paraphrase, version='v2')}")
+    print(f"Cache stats: {cache.stats()}")
+
+    exact = ExactAnswerCache()
+    exact.store("Who built the Eiffel Tower?", "Gustave Eiffel's company.", version="v1")
+    print(f"Same question: {exact.lookup('who built the  Eiffel Tower?', version='v1')}")
@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.config import BM25_K1, BM25_B
+
+BM25_POSTINGS_FILE = "bm25.npz"
+BM25_VOCAB_FILE = "bm25.json"
+
+# Number of rows fetched from ChromaDB per request when building an index
+_EXPORT_PAGE_SIZE = 5_000
+
+# Latin words, numbers and identifiers such as "E-1042", "v2.1" or "snake_case" stay one token
+_WORD_PATTERN = re.compile(r"[a-z0-9_]+(?:[-.][a-z0-9_]+)*")
+_CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lexical terms for BM25.
+
+    Latin text is lower-cased and split into words and identifiers. Runs of CJK
+    characters, which have no spaces between words, are indexed as overlapping
+    character bigrams (or a single character for one-character runs).
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The terms, in order of appearance.
+    """
+    lowered = text.lower()
+    terms = _WORD_PATTERN.findall(lowered)
+    for run in _CJK_PATTERN.findall(lowered):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Fuses several ranked ID lists with reciprocal rank fusion (RRF).
+
+    Every ID scores sum(1 / (k + rank)) over the rankings it appears in.
+
+    Args:
+        rankings (Sequence[Sequence[str]]): The ranked ID lists, best first.
+        k (int): The RRF smoothing constant.
+
+    Returns:
+        List[str]: All IDs, ordered by fused score.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def build_bm25_index(collection, path: Union[str, Path]) -> Path:
+    """
+    Builds a BM25 inverted index over the documents of a collection.
+
+    Postings are stored in a compact CSR layout: for every term (in sorted vocabulary
+    order) `term_offsets` points into one `doc_indices` (int32) array and a parallel
+    `term_freqs` (uint16) array. The vocabulary and the chunk IDs go to a JSON sidecar.
+
+    Args:
+        collection (chromadb.Collection): The collection to index.
+        path (Union[str, Path]): The directory to write the index to.
+
+    Returns:
+        Path: The index directory.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    ids: List[str] = []
+    doc_lengths: List[int] = []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    total = collection.count()
+    for offset in range(0, total, _EXPORT_PAGE_SIZE):
+        page = collection.get(limit=_EXPORT_PAGE_SIZE, offset=offset, include=["documents"])
+        for chunk_id, text in zip(page["ids"], page["documents"]):
+            doc_index = len(ids)
+            ids.append(chunk_id)
+            terms = tokenize(text or "")
+            doc_lengths.append(len(terms))
+            for term, freq in Counter(terms).items():
+                postings.setdefault(term, []).append((doc_index, freq))
+
+    vocabulary = sorted(postings)
+    term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    term_offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+    doc_indices = np.empty(term_offsets[-1], dtype=np.int32)
+    term_freqs = np.empty(term_offsets[-1], dtype=np.uint16)
+    for i, term in enumerate(vocabulary):
+        entries = np.asarray(postings[term], dtype=np.int64)
+        doc_indices[term_offsets[i]:term_offsets[i + 1]] = entries[:, 0]
+        term_freqs[term_offsets[i]:term_offsets[i + 1]] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+
+    tmp_postings = path / (BM25_POSTINGS_FILE + ".tmp.npz")
+    np.savez(
+        tmp_postings,
+        term_offsets=term_offsets,
+        doc_indices=doc_indices,
+        term_freqs=term_freqs,
+        doc_lengths=np.asarray(doc_lengths, dtype=np.int32),
+    )
+    tmp_vocab = path / (BM25_VOCAB_FILE + ".tmp")
+    with open(tmp_vocab, "w", encoding="utf-8") as f:
+        json.dump({"vocabulary": vocabulary, "ids": ids}, f, ensure_ascii=False)
+
+    os.replace(tmp_postings, path / BM25_POSTINGS_FILE)
+    os.replace(tmp_vocab, path / BM25_VOCAB_FILE)
+    return path
+
+
+class BM25Index:
+    """
+    A read-only BM25 index over the chunks of one collection.
+
+    Scoring touches only the postings of the query terms, so a lexical lookup needs
+    neither an embedding call nor a scan of the whole corpus.
+    """
+
+    def __init__(self, path: Union[str, Path], k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Args:
+            path (Union[str, Path]): The index directory created by `build_bm25_index`.
+            k1 (float): The BM25 term-frequency saturation parameter.
+            b (float): The BM25 length-normalisation parameter.
+
+        Raises:
+            ValueError: If there is no BM25 index at `path`.
+        """
+        path = Path(path)
+        if not (path / BM25_POSTINGS_FILE).is_file() or not (path / BM25_VOCAB_FILE).is_file():
+            raise ValueError(f"BM25 index not found at: {path}")
+
+        with np.load(path / BM25_POSTINGS_FILE) as postings:
+            self.term_offsets = postings["term_offsets"]
+            self.doc_indices = postings["doc_indices"]
+            self.term_freqs = postings["term_freqs"]
+            self.doc_lengths = postings["doc_lengths"]
+        with open(path / BM25_VOCAB_FILE, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.ids: List[str] = sidecar["ids"]
+        self.term_index = {term: i for i, term in enumerate(sidecar["vocabulary"])}
+
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        # Length normalisation only depends on the document, so it is computed once
+        self._length_norm = k1 * (1 - b + b * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int, allowed_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns the top-k chunk IDs for `query` by BM25 score.
+
+        Args:
+            query (str): The query text.
+            k (int): The maximum number of results.
+            allowed_ids (Optional[Iterable[str]]): Restricts the results to these chunk
+                IDs, e.g. the chunks that pass a metadata filter.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, score) pairs, best first. Chunks that
+            share no term with the query are never returned.
+        """
+        n_docs = self.count()
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term, query_freq in Counter(tokenize(query)).items():
+            term_id = self.term_index.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_indices[start:end]
+            freqs = self.term_freqs[start:end].astype(np.float32)
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Every document occurs at most once per term, so plain fancy-index addition is safe
+            scores[docs] += query_freq * idf * freqs * (self.k1 + 1) / (freqs + self._length_norm[docs])
+
+        if allowed_ids is not None:
+            if not hasattr(self, "_row_by_id"):
+                self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+            allowed = np.zeros(n_docs, dtype=bool)
+            allowed[[self._row_by_id[i] for i in allowed_ids if i in self._row_by_id]] = True
+            scores[~allowed] = 0.0
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.argsort(-scores[matches])]
+        return [(self.ids[i], float(scores[i])) for i in matches]
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    import tempfile
+
+    class _InMemoryCollection:
+        """A minimal stand-in for a chromadb.Collection."""
+        def __init__(self, documents):
+            self._documents = documents
+
+        def count(self):
+            return len(self._documents)
+
+        def get(self, limit, offset, include):
+            return {
+                "ids": [f"id_{i}" for i in range(offset, min(offset + limit, len(self._documents)))],
+                "documents": self._documents[offset:offset + limit],
+            }
+
+    documents = [
+        "Error E-1042 means the vector store could not be opened.",
+        "The vector store keeps one embedding per chunk.",
+        "向量数据库用于存储文本块的嵌入向量。",
+        "错误代码 E-2001 表示嵌入模型不可用。",
+    ]
+    print(f"Tokens: {tokenize(documents[3])}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_bm25_index(_InMemoryCollection(documents), tmp)
+        index = BM25Index(tmp)
+        for query in ["E-1042", "vector store", "嵌入向量", "E-2001 是什么错误?"]:
+            print(f"{query!r}: {index.search(query, k=2)}")
+
+    print(f"RRF: {reciprocal_rank_fusion([['a', 'b', 'c'], ['c', 'a', 'd']])}")
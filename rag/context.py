@@ -0,0 +1,156 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import CONTEXT_MAX_TOKENS, TOKENIZER_ENCODING
+from .schema import Chunk, Document, as_document
+from .text_splitter import count_tokens, truncate_to_tokens
+
+# Metadata fields that describe a chunk's position rather than the text it belongs to
+_POSITION_FIELDS = Chunk._FIELDS
+# Shorter suffix/prefix matches between chunks without offsets are treated as coincidence
+_MIN_TEXT_OVERLAP = 16
+
+def _group_key(metadata: Dict[str, Any]) -> Tuple:
+    """
+    Chunks with the same non-positional metadata (source, page, ...) come from one text.
+    """
+    return tuple(sorted((key, str(value)) for key, value in metadata.items() if key not in _POSITION_FIELDS))
+
+def _text_overlap(previous: str, current: str) -> int:
+    """
+    Returns the length of the longest suffix of `previous` that is a prefix of `current`,
+    or 0 if it is shorter than _MIN_TEXT_OVERLAP.
+    """
+    tail = previous[-len(current):] if current else ""
+    start = 0
+    while True:
+        i = tail.find(current[:1], start)
+        if i < 0:
+            return 0
+        # The leftmost match is the longest overlap
+        if current.startswith(tail[i:]):
+            overlap = len(tail) - i
+            return overlap if overlap >= _MIN_TEXT_OVERLAP else 0
+        start = i + 1
+
+def _position(doc: Document) -> Tuple[int, int]:
+    start = doc.get_metadata("start_index")
+    number = doc.get_metadata("chunk_number")
+    return (start if start is not None else -1, number if number is not None else -1)
+
+def _merge(previous: Dict[str, Any], doc: Document) -> bool:
+    """
+    Appends `doc` to the passage `previous` if the two are adjacent or overlap.
+
+    Character offsets are used when both chunks have them; otherwise chunks with
+    consecutive numbers are merged and the overlap is found by comparing the texts.
+    """
+    start, end = doc.get_metadata("start_index"), doc.get_metadata("end_index")
+    number = doc.get_metadata("chunk_number")
+    text = doc.page_content
+
+    if start is not None and previous["end_index"] is not None:
+        if start > previous["end_index"]:
+            return False
+        text = text[previous["end_index"] - start:]
+    elif number is not None and previous["chunk_number"] is not None and number - previous["chunk_number"] <= 1:
+        text = text[_text_overlap(previous["text"], text):]
+    else:
+        return False
+
+    previous["text"] += text
+    previous["chunk_number"] = number
+    if end is not None and (previous["end_index"] is None or end > previous["end_index"]):
+        previous["end_index"] = end
+    previous["chunks"] += 1
+    return True
+
+def compact_context(
+    context_docs: List[Document],
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    encoding_name: str = TOKENIZER_ENCODING,
+) -> List[Document]:
+    """
+    Assembles retrieved chunks into the passages that are sent to the LLM.
+
+    - Adjacent or overlapping chunks of the same source are merged by `chunk_number`
+      (or character offsets), and the duplicated overlap text is dropped.
+    - Passages are ordered by source position, sources by their best-ranked chunk.
+    - Passages are kept in relevance order until `max_tokens` is reached; the passage
+      that crosses the budget is truncated at a sentence boundary.
+
+    Args:
+        context_docs (List[Document]): The retrieved chunks, most relevant first.
+        max_tokens (int): The token budget of the context. 0 disables the budget.
+        encoding_name (str): The tiktoken encoding used to count tokens.
+
+    Returns:
+        List[Document]: The passages. Their metadata is the metadata of the first
+        chunk plus "chunk_count", the number of chunks merged into the passage.
+    """
+    groups: Dict[Tuple, List[Tuple[int, Document]]] = {}
+    seen = set()
+    for rank, doc in enumerate(context_docs):
+        doc = as_document(doc)
+        key = _group_key(doc.metadata)
+        if (key, doc.page_content) in seen:
+            continue
+        seen.add((key, doc.page_content))
+        groups.setdefault(key, []).append((rank, doc))
+
+    # Merge the chunks of every source in position order
+    passages: List[Dict[str, Any]] = []
+    for group_rank, members in enumerate(groups.values()):
+        previous: Optional[Dict[str, Any]] = None
+        for rank, doc in sorted(members, key=lambda member: _position(member[1])):
+            if previous is not None and _merge(previous, doc):
+                previous["rank"] = min(previous["rank"], rank)
+                continue
+            previous = {
+                "text": doc.page_content,
+                "metadata": doc.metadata,
+                "chunk_number": doc.get_metadata("chunk_number"),
+                "end_index": doc.get_metadata("end_index"),
+                "chunks": 1,
+                "rank": rank,
+                "order": (group_rank, len(passages)),
+            }
+            passages.append(previous)
+
+    # Apply the budget in relevance order, so the best passages survive truncation
+    if max_tokens > 0:
+        remaining = max_tokens
+        kept = []
+        for passage in sorted(passages, key=lambda p: p["rank"]):
+            tokens = count_tokens(passage["text"], encoding_name)
+            if tokens > remaining:
+                passage["text"] = truncate_to_tokens(passage["text"], remaining, encoding_name)
+                if passage["text"]:
+                    kept.append(passage)
+                break
+            kept.append(passage)
+            remaining -= tokens
+        passages = kept
+
+    passages.sort(key=lambda p: p["order"])
+    return [Document(p["text"], {**p["metadata"], "chunk_count": p["chunks"]}) for p in passages]
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    from .text_splitter import split_text_by_character
+
+    text = " ".join(f"Sentence {i} of the handbook explains one more detail." for i in range(60))
+    chunks = split_text_by_character({"page_content": text, "metadata": {"source": "handbook.txt"}}, chunk_size=400, chunk_overlap=100)
+    # Retrieval returns a few neighbouring chunks in relevance order, plus one from another source
+    retrieved = [chunks[3], chunks[2], chunks[4], chunks[0], Document("Paris is the capital of France.", {"source": "wiki/paris"})]
+
+    raw_tokens = sum(count_tokens(doc.page_content) for doc in retrieved)
+    passages = compact_context(retrieved, max_tokens=0)
+    compact_tokens = sum(count_tokens(doc.page_content) for doc in passages)
+    print(f"{len(retrieved)} chunks ({raw_tokens} tokens) -> {len(passages)} passages ({compact_tokens} tokens)")
+    for doc in passages:
+        print(f"  {doc.metadata['source']}: {doc.metadata['chunk_count']} chunks, starts with {doc.page_content[:40]!r}")
+    print(f"Merged passage equals the source text: {passages[1].page_content == text[2 * 300:4 * 300 + 400]}")
+
+    budgeted = compact_context(retrieved, max_tokens=60)
+    print(f"With a 60-token budget: {[count_tokens(doc.page_content) for doc in budgeted]} tokens per passage")
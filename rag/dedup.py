@@ -0,0 +1,320 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from core.config import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+from .schema import Document
+from .text_splitter import estimate_tokens
+
+DEDUP_SIGNATURES_FILE = "dedup.npz"
+DEDUP_ALIASES_FILE = "dedup.json"
+
+# Number of rows fetched from ChromaDB per request when signing an existing collection
+_EXPORT_PAGE_SIZE = 5_000
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHINGLE_BASE = np.uint64(1_000_003)
+_WHITESPACE = re.compile(r"\s+")
+
+def _lsh_bands(num_perm: int, threshold: float, recall: float = 0.99) -> Tuple[int, int]:
+    """
+    Picks (bands, rows) for LSH banding: the most rows per band (fewest candidates)
+    for which a pair at exactly `threshold` similarity still becomes a candidate with
+    probability `recall`. Candidates are verified against the full signature.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+class ChunkDeduplicator:
+    """
+    Detects near-duplicate chunks with MinHash-LSH before they are embedded.
+
+    Every chunk stored in the collection is a "canonical" chunk with a MinHash
+    signature over the character shingles of its normalised text. A new chunk whose
+    estimated Jaccard similarity to a canonical chunk reaches `threshold` is not
+    embedded; it is recorded as an alias of that chunk instead. Aliases keep their
+    text and metadata, so one can be promoted to a canonical chunk if its canonical
+    chunk is deleted.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = DEDUP_NUM_PERM,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold (float): The minimum estimated Jaccard similarity of a duplicate.
+            num_perm (int): The number of MinHash permutations.
+            shingle_size (int): The number of characters per shingle.
+            seed (int): The seed of the permutations. Signatures are only comparable
+                between deduplicators with the same seed and `num_perm`.
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _lsh_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+        self._ids: List[str] = []
+        self._signatures: List[np.ndarray] = []
+        self._positions: Dict[str, int] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self.aliases: Dict[str, Dict[str, Any]] = {}
+        self._aliases_by_source: Dict[str, set] = {}
+
+        self.checked = 0
+        self.duplicates = 0
+        self.tokens_saved = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Computes the MinHash signature of a text. All empty texts share one signature.
+
+        Shingles are hashed with a vectorised polynomial rolling hash over the code
+        points of the lower-cased, whitespace-collapsed text.
+        """
+        normalized = _WHITESPACE.sub(" ", text.lower()).strip()
+        if not normalized:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        width = min(self.shingle_size, len(codes))
+        shingles = np.zeros(len(codes) - width + 1, dtype=np.uint64)
+        for i in range(width):
+            # Wraps modulo 2^64 on purpose, the result is truncated to 32 bits below
+            shingles = shingles * _SHINGLE_BASE + codes[i:len(codes) - width + 1 + i]
+        shingles = np.unique(shingles & _MAX_HASH)
+
+        # (a * x + b) mod p stays below 2^64 because a, b and x are all below 2^32
+        hashes = (shingles[:, None] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashes.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[bytes]:
+        for band in range(self.bands):
+            yield signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, chunk_id: str, signature: np.ndarray) -> None:
+        """
+        Registers a canonical chunk.
+        """
+        if chunk_id in self._positions:
+            return
+        position = len(self._ids)
+        self._ids.append(chunk_id)
+        self._signatures.append(signature)
+        self._positions[chunk_id] = position
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(position)
+
+    def find(self, signature: np.ndarray) -> Optional[str]:
+        """
+        Returns the ID of the most similar canonical chunk at or above the threshold.
+        """
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates = [position for position in candidates if self._ids[position] is not None]
+        if not candidates:
+            return None
+
+        similarities = (np.stack([self._signatures[p] for p in candidates]) == signature).mean(axis=1)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._ids[candidates[best]]
+
+    def check(self, chunk_id: str, document: Document) -> Optional[str]:
+        """
+        Checks a chunk that is about to be embedded.
+
+        A duplicate is recorded as an alias and the ID of its canonical chunk is
+        returned. Otherwise the chunk is registered as canonical and None is returned,
+        and the caller must store it.
+        """
+        self.checked += 1
+        signature = self.signature(document.page_content)
+        canonical_id = self.find(signature)
+        if canonical_id is None:
+            self.add(chunk_id, signature)
+            return None
+
+        self.duplicates += 1
+        self.tokens_saved += estimate_tokens(document.page_content)
+        self._add_alias(chunk_id, {
+            "canonical_id": canonical_id,
+            "page_content": document.page_content,
+            "metadata": document.metadata,
+        })
+        return canonical_id
+
+    def _add_alias(self, alias_id: str, alias: Dict[str, Any]) -> None:
+        self.aliases[alias_id] = alias
+        self._aliases_by_source.setdefault(alias["metadata"].get("source", ""), set()).add(alias_id)
+
+    def _remove_alias(self, alias_id: str) -> None:
+        alias = self.aliases.pop(alias_id, None)
+        if alias is not None:
+            self._aliases_by_source.get(alias["metadata"].get("source", ""), set()).discard(alias_id)
+
+    def aliases_of(self, canonical_id: str) -> List[str]:
+        """
+        Returns the IDs of the chunks recorded as duplicates of a canonical chunk.
+        """
+        return [alias_id for alias_id, alias in self.aliases.items() if alias["canonical_id"] == canonical_id]
+
+    def aliases_from(self, source: str) -> List[str]:
+        """
+        Returns the IDs of the aliases that belong to a source document.
+        """
+        return list(self._aliases_by_source.get(source, ()))
+
+    def remove(self, chunk_ids: Iterable[str]) -> List[Tuple[str, Document]]:
+        """
+        Forgets deleted chunks, canonical or alias.
+
+        Returns:
+            List[Tuple[str, Document]]: The (ID, document) pairs of the aliases
+            whose canonical chunk was deleted. They are no longer aliases, and the
+            caller should store them again so that their text stays searchable.
+        """
+        removed = set()
+        for chunk_id in chunk_ids:
+            self._remove_alias(chunk_id)
+            position = self._positions.pop(chunk_id, None)
+            if position is not None:
+                # Bucket entries of removed chunks are skipped in `find`
+                self._ids[position] = None
+                removed.add(chunk_id)
+
+        orphans = [
+            (alias_id, Document(alias["page_content"], alias["metadata"]))
+            for alias_id, alias in self.aliases.items()
+            if alias["canonical_id"] in removed
+        ]
+        for alias_id, _ in orphans:
+            self._remove_alias(alias_id)
+        return orphans
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the dedup counters of this run and the size of the alias table.
+        """
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "duplicate_rate": self.duplicates / self.checked if self.checked else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "canonical": len(self),
+            "aliases": len(self.aliases),
+        }
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """
+        Writes the signatures of the canonical chunks and the alias table to `path`.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        live = [position for position, chunk_id in enumerate(self._ids) if chunk_id is not None]
+
+        tmp_signatures = path / (DEDUP_SIGNATURES_FILE + ".tmp.npz")
+        signatures = np.stack([self._signatures[p] for p in live]) if live else np.zeros((0, self.num_perm), dtype=np.uint32)
+        np.savez(tmp_signatures, signatures=signatures)
+        tmp_aliases = path / (DEDUP_ALIASES_FILE + ".tmp")
+        with open(tmp_aliases, "w", encoding="utf-8") as f:
+            json.dump({
+                "threshold": self.threshold,
+                "num_perm": self.num_perm,
+                "shingle_size": self.shingle_size,
+                "seed": self.seed,
+                "ids": [self._ids[p] for p in live],
+                "aliases": self.aliases,
+            }, f, ensure_ascii=False)
+
+        os.replace(tmp_signatures, path / DEDUP_SIGNATURES_FILE)
+        os.replace(tmp_aliases, path / DEDUP_ALIASES_FILE)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "ChunkDeduplicator":
+        """
+        Loads a deduplicator written by `save`.
+
+        Raises:
+            ValueError: If there is no dedup index at `path`.
+        """
+        path = Path(path)
+        if not (path / DEDUP_SIGNATURES_FILE).is_file() or not (path / DEDUP_ALIASES_FILE).is_file():
+            raise ValueError(f"Dedup index not found at: {path}")
+
+        with open(path / DEDUP_ALIASES_FILE, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        deduplicator = cls(sidecar["threshold"], sidecar["num_perm"], sidecar["shingle_size"], sidecar["seed"])
+        with np.load(path / DEDUP_SIGNATURES_FILE) as data:
+            for chunk_id, signature in zip(sidecar["ids"], data["signatures"]):
+                deduplicator.add(chunk_id, signature)
+        for alias_id, alias in sidecar["aliases"].items():
+            deduplicator._add_alias(alias_id, alias)
+        return deduplicator
+
+    @classmethod
+    def from_collection(cls, collection, aliases: Optional[Dict[str, Dict[str, Any]]] = None, **kwargs) -> "ChunkDeduplicator":
+        """
+        Signs every chunk of an existing collection as canonical.
+
+        Args:
+            collection (chromadb.Collection): The collection to sign.
+            aliases (Optional[Dict[str, Dict[str, Any]]]): A previous alias table. Only
+                aliases whose canonical chunk is still in the collection are kept.
+            **kwargs: Passed to the constructor.
+        """
+        deduplicator = cls(**kwargs)
+        total = collection.count()
+        for offset in range(0, total, _EXPORT_PAGE_SIZE):
+            page = collection.get(limit=_EXPORT_PAGE_SIZE, offset=offset, include=["documents"])
+            for chunk_id, text in zip(page["ids"], page["documents"]):
+                deduplicator.add(chunk_id, deduplicator.signature(text or ""))
+        for alias_id, alias in (aliases or {}).items():
+            if alias["canonical_id"] in deduplicator._positions:
+                deduplicator._add_alias(alias_id, alias)
+        return deduplicator
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    disclaimer = (
+        "This document is provided for internal use only. The information it contains is "
+        "confidential and must not be shared outside the company without written approval."
+    )
+    chunks = [
+        ("handbook::1", disclaimer),
+        ("policy::1", disclaimer.replace("company", "company,")),
+        ("policy::2", "Expense reports are due on the fifth working day of every month."),
+        ("faq::1", disclaimer.replace("internal use only", "internal use")),
+    ]
+
+    deduplicator = ChunkDeduplicator()
+    print(f"{deduplicator.bands} bands x {deduplicator.rows} rows")
+    for chunk_id, text in chunks:
+        canonical_id = deduplicator.check(chunk_id, Document(text))
+        print(f"{chunk_id}: {'duplicate of ' + canonical_id if canonical_id else 'canonical'}")
+    print(f"Aliases of handbook::1: {deduplicator.aliases_of('handbook::1')}")
+    print(f"Promoted after deleting handbook::1: {[alias_id for alias_id, _ in deduplicator.remove(['handbook::1'])]}")
+    print(f"Dedup stats: {deduplicator.stats()}")
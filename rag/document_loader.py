@@ -1,9 +1,13 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import List, Dict, Union
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple, Union
 
-# 为了简单起见，我们先定义一个 Document 类型
-# 在 LangChain 中，这通常是一个具有 page_content 和 metadata 的对象
-Document = Dict[str, Union[str, Dict]]
+# Document 是 rag 包共享的文档类型 (使用 __slots__)，同时支持 doc["page_content"] 这样的字典式访问，
+# 并可以通过 to_langchain() 转换为 LangChain 的 Document
+from .schema import Document
 
 def load_text_document(file_path: Union[str, Path]) -> Document:
     """
@@ -13,47 +17,327 @@ def load_text_document(file_path: Union[str, Path]) -> Document:
         file_path (Union[str, Path]): 文本文件的路径。
 
     Returns:
-        Document: 一个包含文件内容和元数据的字典。
+        Document: 一个包含文件内容和元数据的文档。
+
+    Raises:
+        FileNotFoundError: 如果文件不存在。读取或解码失败时的异常也会直接抛出，
+            由调用方 (例如 load_directory 的 on_error) 处理。
     """
     path = Path(file_path)
     if not path.is_file():
         raise FileNotFoundError(f"File not found at: {path}")
 
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
-        # metadata 包含了关于文档来源的信息，这在 RAG 中非常重要
-        metadata = {"source": str(path)}
-        
-        return {"page_content": text, "metadata": metadata}
-    except Exception as e:
-        print(f"Error loading file {path}: {e}")
-        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    # metadata 包含了关于文档来源的信息，这在 RAG 中非常重要
+    metadata = {"source": str(path)}
 
-def load_directory(directory_path: Union[str, Path], glob_pattern: str = "*.txt") -> List[Document]:
+    return Document(text, metadata)
+
+_MARKDOWN_TITLE = re.compile(r"^#\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_FRONT_MATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+
+def load_markdown_document(file_path: Union[str, Path]) -> Document:
     """
-    加载目录下所有匹配 glob 模式的文本文件。
+    加载单个 Markdown 文件。保留 Markdown 正文 (去掉 YAML front matter)，并将第一个一级标题记入元数据。
+
+    Args:
+        file_path (Union[str, Path]): Markdown 文件的路径。
+
+    Returns:
+        Document: 一个包含文件内容和元数据的文档。
+    """
+    doc = load_text_document(file_path)
+    text = _FRONT_MATTER.sub("", doc.page_content)
+    doc.page_content = text
+    title = _MARKDOWN_TITLE.search(text)
+    if title:
+        doc.metadata["title"] = title.group(1)
+    return doc
+
+class _HTMLTextExtractor(HTMLParser):
+    """
+    提取 HTML 中的可见文本和 <title>，跳过脚本和样式。
+    """
+    _SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+    _BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre", "blockquote", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title = ""
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self.parts.append(data)
+
+def load_html_document(file_path: Union[str, Path]) -> Document:
+    """
+    加载单个 HTML 文件，提取可见文本 (按块级元素换行)，并将 <title> 记入元数据。
+
+    Args:
+        file_path (Union[str, Path]): HTML 文件的路径。
+
+    Returns:
+        Document: 一个包含文件文本和元数据的文档。
+    """
+    doc = load_text_document(file_path)
+    parser = _HTMLTextExtractor()
+    parser.feed(doc.page_content)
+    parser.close()
+    # 合并行内多余的空白和连续的空行
+    lines = (" ".join(line.split()) for line in "".join(parser.parts).splitlines())
+    doc.page_content = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+    if parser.title.strip():
+        doc.metadata["title"] = " ".join(parser.title.split())
+    return doc
+
+def count_pdf_pages(file_path: Union[str, Path]) -> int:
+    """
+    返回 PDF 文件的页数 (只解析页面树，不提取文本)。
+    """
+    from pypdf import PdfReader
+    return len(PdfReader(str(file_path)).pages)
+
+def load_pdf_pages(file_path: Union[str, Path], start_page: int = 0, end_page: Optional[int] = None) -> List[Document]:
+    """
+    提取 PDF 文件中 [start_page, end_page) 范围内每一页的文本，每页一个文档。
+
+    没有可提取文本的页面 (例如扫描件) 会被跳过。
+
+    Args:
+        file_path (Union[str, Path]): PDF 文件的路径。
+        start_page (int): 起始页 (从 0 开始)。
+        end_page (Optional[int]): 结束页 (不包含)，默认为最后一页。
+
+    Returns:
+        List[Document]: 页面文档列表。元数据包含 source、page (从 1 开始) 和 total_pages。
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(str(file_path))
+    total_pages = len(reader.pages)
+    documents = []
+    for page_number in range(start_page, min(end_page if end_page is not None else total_pages, total_pages)):
+        text = reader.pages[page_number].extract_text() or ""
+        if text.strip():
+            documents.append(Document(text, {"source": str(file_path), "page": page_number + 1, "total_pages": total_pages}))
+    return documents
+
+# 加载器注册表，按小写的文件扩展名索引。
+# DOCUMENT_LOADERS 中的加载器一次加载整个文件；PAGED_LOADERS 中的格式可以按页拆分，
+# 由 (页数统计函数, 页范围加载函数) 组成，不同页范围可以在不同进程中并行提取。
+DOCUMENT_LOADERS: Dict[str, Callable[[Union[str, Path]], Document]] = {}
+PAGED_LOADERS: Dict[str, Tuple[Callable[[Union[str, Path]], int], Callable[..., List[Document]]]] = {}
+
+# 每个进程池任务提取的 PDF 页数
+PDF_PAGES_PER_TASK = 8
+
+def register_loader(suffix: str, loader: Callable[[Union[str, Path]], Document]) -> None:
+    """
+    为一种文件扩展名注册整文件加载器，例如 register_loader(".csv", load_csv_document)。
+    加载器需要定义在模块顶层，以便在工作进程中使用。
+    """
+    DOCUMENT_LOADERS[suffix.lower()] = loader
+
+def register_paged_loader(
+    suffix: str,
+    count_pages: Callable[[Union[str, Path]], int],
+    load_pages: Callable[..., List[Document]],
+) -> None:
+    """
+    为一种文件扩展名注册按页加载器。`load_pages(path, start_page, end_page)` 返回该范围内的页面文档。
+    """
+    PAGED_LOADERS[suffix.lower()] = (count_pages, load_pages)
+
+register_loader(".txt", load_text_document)
+register_loader(".md", load_markdown_document)
+register_loader(".markdown", load_markdown_document)
+register_loader(".html", load_html_document)
+register_loader(".htm", load_html_document)
+register_paged_loader(".pdf", count_pdf_pages, load_pdf_pages)
+
+def is_supported(file_path: Union[str, Path]) -> bool:
+    """
+    判断是否有可以处理该文件的加载器。
+    """
+    suffix = Path(file_path).suffix.lower()
+    return suffix in DOCUMENT_LOADERS or suffix in PAGED_LOADERS
+
+def load_document(file_path: Union[str, Path]) -> Iterator[Document]:
+    """
+    在当前进程中按文件类型加载单个文件，逐个产出文档 (PDF 每页一个文档)。
+
+    Args:
+        file_path (Union[str, Path]): 文件路径。
+
+    Yields:
+        Document: 加载得到的文档。
+
+    Raises:
+        ValueError: 如果没有该文件类型的加载器。
+    """
+    path = Path(file_path)
+    suffix = path.suffix.lower()
+    if suffix in PAGED_LOADERS:
+        count_pages, load_pages = PAGED_LOADERS[suffix]
+        for start_page in range(0, count_pages(path), PDF_PAGES_PER_TASK):
+            yield from load_pages(path, start_page, start_page + PDF_PAGES_PER_TASK)
+    elif suffix in DOCUMENT_LOADERS:
+        doc = DOCUMENT_LOADERS[suffix](path)
+        if doc:
+            yield doc
+    else:
+        raise ValueError(f"No loader registered for '{suffix}' files: {path}")
+
+def _plan_tasks(file_path: Path) -> Iterator[Tuple[str, int, int]]:
+    """
+    将一个文件拆分为进程池任务 (路径, 起始页, 结束页)。整文件加载的格式只有一个任务。
+    """
+    suffix = file_path.suffix.lower()
+    if suffix in PAGED_LOADERS:
+        total_pages = PAGED_LOADERS[suffix][0](file_path)
+        for start_page in range(0, total_pages, PDF_PAGES_PER_TASK):
+            yield str(file_path), start_page, start_page + PDF_PAGES_PER_TASK
+    else:
+        yield str(file_path), 0, 0
+
+def _run_task(
+    file_path: str,
+    start_page: int,
+    end_page: int,
+    process: Optional[Callable[[List[Document]], Any]] = None,
+) -> Any:
+    """
+    在工作进程中执行一个加载任务，并对加载出的文档调用 process (如果有)。
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix in PAGED_LOADERS:
+        documents = PAGED_LOADERS[suffix][1](file_path, start_page, end_page)
+    else:
+        doc = DOCUMENT_LOADERS[suffix](file_path)
+        documents = [doc] if doc else []
+    return process(documents) if process is not None else documents
+
+def load_directory(
+    directory_path: Union[str, Path],
+    glob_pattern: str = "*.txt",
+    workers: Optional[int] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> Iterator[Document]:
+    """
+    惰性加载目录下所有匹配 glob 模式且有对应加载器的文件，边解析边产出文档。
+
+    文件 (以及 PDF 的每 PDF_PAGES_PER_TASK 页) 被拆成任务在进程池中并行提取，同一时间
+    最多有 2 * workers 个任务在执行或等待被取走，因此不会一次性持有所有提取出的文本。
+    文档按文件顺序、页码顺序产出，同一文件的页面总是连续的。
 
     Args:
         directory_path (Union[str, Path]): 目标目录的路径。
         glob_pattern (str): 用于匹配文件的 glob 模式，默认为 "*.txt"。
+        workers (Optional[int]): 工作进程数，默认为 CPU 核数。为 1 时在当前进程中串行加载。
+        on_error (Optional[Callable[[str, Exception], None]]): 文件加载失败时的回调 (文件路径, 异常)，
+            默认打印错误。出错的文件 (或页范围) 会被跳过。
 
-    Returns:
-        List[Document]: 一个包含所有已加载文档的列表。
+    Yields:
+        Document: 加载得到的文档 (PDF 每页一个，元数据包含页码)。
+    """
+    results = map_directory(directory_path, glob_pattern=glob_pattern, workers=workers, on_error=on_error)
+    return (doc for _, documents in results for doc in documents)
+
+def map_directory(
+    directory_path: Union[str, Path],
+    process: Optional[Callable[[List[Document]], Any]] = None,
+    glob_pattern: str = "*.txt",
+    workers: Optional[int] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    与 load_directory 一样在进程池中加载目录下的文件，但在工作进程中对每个任务加载出的文档列表
+    调用 `process(documents)`，只把结果传回当前进程。分块等 CPU 密集的处理因此也在工作进程中并行执行。
+
+    Args:
+        directory_path (Union[str, Path]): 目标目录的路径。
+        process (Optional[Callable[[List[Document]], Any]]): 在工作进程中对每个任务的文档调用的函数，
+            需要定义在模块顶层 (可以用 functools.partial 绑定参数)，结果需要可以被 pickle。默认原样返回文档列表。
+        glob_pattern (str): 用于匹配文件的 glob 模式，默认为 "*.txt"。
+        workers (Optional[int]): 工作进程数，默认为 CPU 核数。为 1 时在当前进程中串行执行。
+        on_error (Optional[Callable[[str, Exception], None]]): 任务失败 (加载或 process 抛出异常) 时的回调
+            (文件路径, 异常)，默认打印错误。出错的文件 (或页范围) 会被跳过。
+
+    Yields:
+        Tuple[str, Any]: (文件路径, 该任务的结果)，按文件顺序、页码顺序产出，同一文件的任务总是连续的。
     """
     path = Path(directory_path)
     if not path.is_dir():
         raise NotADirectoryError(f"Directory not found at: {path}")
+    return _iter_directory(path, glob_pattern, workers or os.cpu_count() or 1, on_error or _print_error, process)
 
-    documents = []
-    for file_path in path.glob(glob_pattern):
-        if file_path.is_file():
-            doc = load_text_document(file_path)
-            if doc:
-                documents.append(doc)
-    
-    return documents
+def _print_error(file_path: str, error: Exception) -> None:
+    print(f"Error loading file {file_path}: {error}")
+
+def _iter_directory(
+    path: Path,
+    glob_pattern: str,
+    workers: int,
+    on_error: Callable[[str, Exception], None],
+    process: Optional[Callable[[List[Document]], Any]],
+) -> Iterator[Tuple[str, Any]]:
+    files = (file_path for file_path in path.glob(glob_pattern) if file_path.is_file() and is_supported(file_path))
+
+    def tasks() -> Iterator[Tuple[str, int, int]]:
+        for file_path in files:
+            try:
+                yield from _plan_tasks(file_path)
+            except Exception as e:
+                on_error(str(file_path), e)
+
+    if workers == 1:
+        for task in tasks():
+            try:
+                yield task[0], _run_task(*task, process)
+            except Exception as e:
+                on_error(task[0], e)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 按提交顺序取结果，窗口大小限制了在途任务数和缓存的文本量
+        pending = []
+        for task in tasks():
+            pending.append((task, pool.submit(_run_task, *task, process)))
+            if len(pending) >= 2 * workers:
+                task, future = pending.pop(0)
+                yield from _task_result(task, future, on_error)
+        for task, future in pending:
+            yield from _task_result(task, future, on_error)
+
+def _task_result(task: Tuple[str, int, int], future, on_error: Callable[[str, Exception], None]) -> Iterator[Tuple[str, Any]]:
+    try:
+        result = future.result()
+    except Exception as e:
+        on_error(task[0], e)
+        return
+    yield task[0], result
 
 # --- 使用示例 ---
 if __name__ == '__main__':
@@ -64,6 +348,7 @@ if __name__ == '__main__':
     (temp_dir / "doc1.txt").write_text("This is the first document about AI.")
     (temp_dir / "doc2.txt").write_text("The second document discusses machine learning.")
     (temp_dir / "notes.md").write_text("# Notes\nThis is a markdown file.")
+    (temp_dir / "page.html").write_text("<html><head><title>Page</title><script>var x;</script></head><body><p>This is an HTML page.</p></body></html>")
 
     print(f"Created temporary directory: {temp_dir.resolve()}")
 
@@ -78,7 +363,7 @@ if __name__ == '__main__':
     # 2. 测试加载整个目录
     print("\n--- Loading all .txt documents from a directory ---")
     try:
-        all_docs = load_directory(temp_dir)
+        all_docs = list(load_directory(temp_dir, workers=1))
         for doc in all_docs:
             print(doc)
     except NotADirectoryError as e:
@@ -87,11 +372,16 @@ if __name__ == '__main__':
     # 3. 测试加载不同类型的文件
     print("\n--- Loading all .md documents from a directory ---")
     try:
-        md_docs = load_directory(temp_dir, glob_pattern="*.md")
+        md_docs = list(load_directory(temp_dir, glob_pattern="*.md"))
         print(md_docs[0])
     except Exception as e:
         print(e)
 
+    # 4. 按文件类型加载目录下所有支持的文件 (PDF 会按页在进程池中并行提取)
+    print("\n--- Loading all supported documents from a directory ---")
+    for doc in load_directory(temp_dir, glob_pattern="*"):
+        print(doc)
+
     # 清理临时文件
     import shutil
     shutil.rmtree(temp_dir)
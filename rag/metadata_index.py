@@ -0,0 +1,196 @@
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Chroma-compatible `where` operators
+_COMPARISONS = ("$gt", "$gte", "$lt", "$lte")
+_OPERATORS = ("$eq", "$ne", "$in", "$nin") + _COMPARISONS
+
+def _key(value: Any) -> Any:
+    # Keeps True/False apart from 1/0, which are equal as dict keys
+    return ("bool", value) if isinstance(value, bool) else value
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _conditions(where: Mapping[str, Any]):
+    """
+    Yields (field, operator, operand) for a `where` clause without "$and"/"$or".
+    """
+    for field, condition in where.items():
+        if isinstance(condition, Mapping):
+            if len(condition) != 1:
+                raise ValueError(f"Expected exactly one operator for '{field}', got {list(condition)}")
+            operator, operand = next(iter(condition.items()))
+            if operator not in _OPERATORS:
+                raise ValueError(f"Unknown where operator: {operator}")
+            if operator in _COMPARISONS and not _is_number(operand):
+                raise ValueError(f"Operator {operator} needs a number, got {operand!r}")
+            if operator in ("$in", "$nin") and not isinstance(operand, (list, tuple, set)):
+                raise ValueError(f"Operator {operator} needs a list, got {operand!r}")
+            yield field, operator, operand
+        else:
+            yield field, "$eq", condition
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    if operator == "$eq":
+        return _key(value) == _key(operand)
+    if operator == "$ne":
+        return _key(value) != _key(operand)
+    if operator == "$in":
+        return _key(value) in {_key(v) for v in operand}
+    if operator == "$nin":
+        return _key(value) not in {_key(v) for v in operand}
+    if not _is_number(value):
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    return value <= operand
+
+def matches(metadata: Mapping[str, Any], where: Optional[Mapping[str, Any]]) -> bool:
+    """
+    Evaluates a Chroma-style `where` clause against one metadata dict.
+
+    Supports field equality (`{"source": "a.pdf"}`), the operators $eq, $ne, $in,
+    $nin, $gt, $gte, $lt, $lte, and nesting with $and / $or. A field that is missing
+    from the metadata matches no condition.
+
+    Raises:
+        ValueError: If the clause uses an unknown operator.
+    """
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches(metadata, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches(metadata, clause) for clause in where["$or"])
+    return all(
+        field in metadata and _compare(metadata[field], operator, operand)
+        for field, operator, operand in _conditions(where)
+    )
+
+
+class MetadataIndex:
+    """
+    An inverted index over the metadata of the rows of an in-process vector index.
+
+    Every (field, value) pair maps to the sorted array of rows that have it, so
+    equality and $in filters are answered from postings without looking at the other
+    rows. Range operators use a numeric column per field that is built on first use.
+    Filters evaluate to a boolean row mask.
+    """
+
+    def __init__(self, metadatas: Sequence[Optional[Mapping[str, Any]]]):
+        """
+        Args:
+            metadatas (Sequence[Optional[Mapping[str, Any]]]): The metadata of every row.
+        """
+        self.n_rows = len(metadatas)
+        postings: Dict[str, Dict[Any, List[int]]] = {}
+        for row, metadata in enumerate(metadatas):
+            for field, value in (metadata or {}).items():
+                postings.setdefault(field, {}).setdefault(_key(value), []).append(row)
+
+        self.fields: Dict[str, Dict[Any, np.ndarray]] = {
+            field: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+            for field, values in postings.items()
+        }
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def _rows_with(self, field: str) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for rows in self.fields.get(field, {}).values():
+            mask[rows] = True
+        return mask
+
+    def _column(self, field: str) -> np.ndarray:
+        """
+        The numeric values of a field as floats; NaN where it is missing or not a number.
+        """
+        if field not in self._columns:
+            column = np.full(self.n_rows, np.nan)
+            for value, rows in self.fields.get(field, {}).items():
+                if _is_number(value):
+                    column[rows] = value
+            self._columns[field] = column
+        return self._columns[field]
+
+    def _condition_mask(self, field: str, operator: str, operand: Any) -> np.ndarray:
+        values = self.fields.get(field, {})
+        mask = np.zeros(self.n_rows, dtype=bool)
+        if operator in ("$eq", "$in"):
+            for value in ([operand] if operator == "$eq" else operand):
+                rows = values.get(_key(value))
+                if rows is not None:
+                    mask[rows] = True
+            return mask
+        if operator in ("$ne", "$nin"):
+            excluded = self._condition_mask(field, "$eq" if operator == "$ne" else "$in", operand)
+            return self._rows_with(field) & ~excluded
+
+        column = self._column(field)
+        with np.errstate(invalid="ignore"):
+            if operator == "$gt":
+                return column > operand
+            if operator == "$gte":
+                return column >= operand
+            if operator == "$lt":
+                return column < operand
+            return column <= operand
+
+    def mask(self, where: Optional[Mapping[str, Any]]) -> np.ndarray:
+        """
+        Returns the boolean mask of the rows that match a Chroma-style `where` clause.
+
+        Raises:
+            ValueError: If the clause uses an unknown operator.
+        """
+        if not where:
+            return np.ones(self.n_rows, dtype=bool)
+        if "$and" in where:
+            mask = np.ones(self.n_rows, dtype=bool)
+            for clause in where["$and"]:
+                mask &= self.mask(clause)
+            return mask
+        if "$or" in where:
+            mask = np.zeros(self.n_rows, dtype=bool)
+            for clause in where["$or"]:
+                mask |= self.mask(clause)
+            return mask
+
+        mask = np.ones(self.n_rows, dtype=bool)
+        for field, operator, operand in _conditions(where):
+            mask &= self._condition_mask(field, operator, operand)
+        return mask
+
+    def rows(self, where: Optional[Mapping[str, Any]]) -> np.ndarray:
+        """
+        Returns the sorted row numbers that match a `where` clause.
+        """
+        return np.flatnonzero(self.mask(where))
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    import time
+
+    rng = np.random.default_rng(0)
+    metadatas = [
+        {"source": f"tenant_{rng.integers(0, 50)}/doc_{i % 1000}.pdf", "tenant": int(rng.integers(0, 50)), "chunk_number": i % 40 + 1}
+        for i in range(200_000)
+    ]
+
+    start = time.perf_counter()
+    index = MetadataIndex(metadatas)
+    print(f"Indexed {index.n_rows} rows in {time.perf_counter() - start:.2f}s")
+
+    where = {"$and": [{"tenant": {"$in": [3, 7]}}, {"chunk_number": {"$lte": 5}}]}
+    start = time.perf_counter()
+    rows = index.rows(where)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{where} -> {len(rows)} rows in {elapsed:.2f} ms")
+    print(f"Agrees with matches(): {all(matches(metadatas[r], where) for r in rows[:1000])}")
@@ -0,0 +1,70 @@
+from typing import List, Sequence
+
+import numpy as np
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int = 3,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Selects `k` candidates that are relevant to the query and different from each other.
+
+    Every step picks the candidate maximising
+    `lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))`.
+    All pairwise cosine similarities come from one (n, n) matrix product, and each step only
+    updates a vector of "max similarity to the selection" instead of looping over pairs.
+
+    Args:
+        query_embedding (Sequence[float]): The query vector.
+        embeddings (Sequence[Sequence[float]]): The candidate vectors, shape (n, dim).
+        k (int): The number of candidates to select.
+        lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+
+    Returns:
+        List[int]: The indices of the selected candidates, in selection order.
+    """
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32)
+
+    # Normalising the (n, n) Gram matrix is cheaper than normalising the (n, dim) inputs
+    gram = candidates @ candidates.T
+    norms = np.sqrt(np.maximum(np.diagonal(gram), 1e-24))
+    similarity = gram / np.outer(norms, norms)
+    relevance = (candidates @ query) / (norms * max(float(np.linalg.norm(query)), 1e-12))
+    k = min(k, len(candidates))
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    for _ in range(k - 1):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    passage = rng.standard_normal(64)
+    # Three near-identical windows of one passage, and two other relevant chunks
+    windows = [passage + 0.05 * rng.standard_normal(64) for _ in range(3)]
+    others = [passage * 0.6 + rng.standard_normal(64) * 0.8 for _ in range(2)]
+    embeddings = np.array(windows + others)
+    query = passage + 0.3 * rng.standard_normal(64)
+
+    relevance = _normalize(embeddings) @ _normalize(query)
+    print(f"Top-3 by relevance: {np.argsort(-relevance)[:3].tolist()}")
+    print(f"Top-3 by MMR (lambda=0.5): {maximal_marginal_relevance(query, embeddings, k=3, lambda_mult=0.5)}")
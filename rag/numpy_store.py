@@ -0,0 +1,343 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.config import NUMPY_INDEX_DIR, NUMPY_INDEX_DTYPE
+from .metadata_index import MetadataIndex
+
+# Number of rows scored per matmul block, bounds the size of the score matrix
+_SEARCH_BLOCK_ROWS = 262_144
+# Number of rows fetched from ChromaDB per request when building an index
+_EXPORT_PAGE_SIZE = 5_000
+
+# Every build writes its matrix to a new embeddings-<build>.npy; metadata.json names the
+# matrix its rows belong to, so swapping it in is the single step that publishes a build.
+# Indexes built before builds were versioned use EMBEDDINGS_FILE.
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+def index_path(collection_name: str, root: Union[str, Path] = NUMPY_INDEX_DIR) -> Path:
+    """
+    Returns the directory in which the NumPy index of a collection is stored.
+    """
+    return Path(root) / collection_name
+
+def build_numpy_index(collection, path: Optional[Union[str, Path]] = None, dtype: str = NUMPY_INDEX_DTYPE) -> Path:
+    """
+    Exports a ChromaDB collection into a memory-mappable NumPy index.
+
+    The embeddings are L2-normalised and written to a new `embeddings-<build>.npy` as
+    one contiguous float32/float16 matrix; ids, documents and metadatas go to a
+    `metadata.json` sidecar that names the matrix (see `write_sidecar`). Swapping the
+    sidecar in publishes the build atomically, so a reader never pairs the rows of
+    one build with the ids of another, and processes that still have the old index
+    mapped keep reading a consistent copy.
+
+    Args:
+        collection (chromadb.Collection): The collection to export.
+        path (Optional[Union[str, Path]]): The index directory. Defaults to `index_path(collection.name)`.
+        dtype (str): "float32" or "float16".
+
+    Returns:
+        Path: The index directory.
+    """
+    path = Path(path) if path else index_path(collection.name)
+    path.mkdir(parents=True, exist_ok=True)
+    total = collection.count()
+
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    matrix = None
+    embeddings_file = new_embeddings_file(path)
+
+    for offset in range(0, total, _EXPORT_PAGE_SIZE):
+        page = collection.get(
+            limit=_EXPORT_PAGE_SIZE,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(embeddings_file, mode="w+", dtype=dtype, shape=(total, vectors.shape[1]))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        matrix[len(ids):len(ids) + len(vectors)] = vectors / np.maximum(norms, 1e-12)
+
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+
+    if matrix is None:
+        matrix = np.lib.format.open_memmap(embeddings_file, mode="w+", dtype=dtype, shape=(0, 0))
+    matrix.flush()
+    del matrix
+
+    write_sidecar(path, embeddings_file, {"name": collection.name, "ids": ids, "documents": documents, "metadatas": metadatas})
+    return path
+
+def new_embeddings_file(path: Path) -> Path:
+    """
+    Returns a fresh, unpublished file name for the embedding matrix of a new build.
+    """
+    return path / f"embeddings-{uuid.uuid4().hex[:16]}.npy"
+
+def write_sidecar(path: Path, embeddings_file: Path, sidecar: Dict[str, Any]) -> str:
+    """
+    Publishes a build: atomically replaces `metadata.json` with `sidecar` ("name", "ids",
+    "documents", "metadatas"), pointing it at `embeddings_file` and recording its row count.
+
+    Matrices of older builds are deleted afterwards, except the one published just
+    before, which a reader may have looked up right before the swap.
+
+    Returns:
+        str: The `ids_digest` of the published build.
+    """
+    sidecar = {**sidecar, "embeddings": embeddings_file.name, "rows": len(sidecar["ids"])}
+    tmp_metadata = path / (METADATA_FILE + ".tmp")
+    with open(tmp_metadata, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+    # Taken before the swap, so a concurrent build cannot hand us its digest
+    digest = _file_digest(tmp_metadata)
+    os.replace(tmp_metadata, path / METADATA_FILE)
+
+    old_files = [file for file in [path / EMBEDDINGS_FILE, *path.glob("embeddings-*.npy")] if file.is_file() and file != embeddings_file]
+    old_files.sort(key=lambda file: file.stat().st_mtime)
+    for file in old_files[:-1]:
+        try:
+            file.unlink()
+        except OSError:
+            # Still mapped by a process on a platform that does not allow it
+            pass
+    return digest
+
+def ids_digest(path: Union[str, Path]) -> str:
+    """
+    Fingerprints the published build of an index: its row order and the matrix it
+    points at. Indexes derived from a build (IVF lists, quantized codes) store it, so
+    they are detected as stale once the rows are rewritten or re-exported.
+    """
+    return _file_digest(Path(path) / METADATA_FILE)
+
+def _file_digest(file: Path) -> str:
+    return hashlib.sha256(file.read_bytes()).hexdigest()
+
+
+def row_blocks(n_rows: int, rows: Optional[np.ndarray], block_size: int):
+    """
+    Yields (selector, row numbers) per block: contiguous slices over all `n_rows`, or
+    chunks of the given `rows` (e.g. the rows that pass a metadata filter).
+    """
+    if rows is None:
+        for start in range(0, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            yield slice(start, stop), np.arange(start, stop)
+    else:
+        for start in range(0, len(rows), block_size):
+            block_rows = rows[start:start + block_size]
+            yield block_rows, block_rows
+
+
+class NumpyVectorIndex:
+    """
+    An exact, in-process vector index over a memory-mapped `.npy` matrix.
+
+    The matrix is opened read-only with `mmap_mode="r"`, so any number of worker
+    processes share the same physical pages through the OS page cache. Search is a
+    blocked matmul followed by `argpartition`, and many queries are scored at once.
+
+    The `count()` and `query()` methods mirror `chromadb.Collection`, so an index can
+    be passed anywhere a collection is used for retrieval.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path (Union[str, Path]): The index directory created by `build_numpy_index`.
+
+        Raises:
+            ValueError: If there is no index at `path`, or its matrix and sidecar do not match.
+        """
+        path = Path(path)
+        if not (path / METADATA_FILE).is_file():
+            raise ValueError(f"NumPy vector index not found at: {path}")
+
+        self.path = path
+        # The sidecar names the matrix of its own build
+        with open(path / METADATA_FILE, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        embeddings_file = path / sidecar.get("embeddings", EMBEDDINGS_FILE)
+        if not embeddings_file.is_file():
+            raise ValueError(f"NumPy vector index not found at: {path}")
+        self.embeddings = np.load(embeddings_file, mmap_mode="r")
+        self.name = sidecar["name"]
+        self.ids: List[str] = sidecar["ids"]
+        self.documents: List[str] = sidecar["documents"]
+        self.metadatas: List[Dict[str, Any]] = sidecar["metadatas"]
+        if len(self.embeddings) != len(self.ids) or sidecar.get("rows", len(self.ids)) != len(self.ids):
+            raise ValueError(
+                f"NumPy vector index at {path} has {len(self.embeddings)} vectors for {len(self.ids)} ids. "
+                "Rebuild it with build_numpy_index()."
+            )
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        """
+        The inverted metadata index used for `where` filters, built on first use.
+        """
+        if not hasattr(self, "_metadata_index"):
+            self._metadata_index = MetadataIndex(self.metadatas)
+        return self._metadata_index
+
+    def filter_rows(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Returns the sorted rows matching a Chroma-style `where` clause, or None without a filter.
+        """
+        return self.metadata_index.rows(where) if where else None
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Dict[str, List[Any]]:
+        """
+        Chroma-compatible lookup of documents and metadatas by ID and/or `where` filter.
+        """
+        if not hasattr(self, "_row_by_id"):
+            self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        if ids is None:
+            rows = range(self.count()) if not where else self.filter_rows(where).tolist()
+        else:
+            rows = [self._row_by_id[i] for i in ids if i in self._row_by_id]
+            if where:
+                mask = self.metadata_index.mask(where)
+                rows = [row for row in rows if mask[row]]
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self.documents[row] for row in rows],
+            "metadatas": [self.metadatas[row] for row in rows],
+        }
+
+    def search(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        k: int,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the exact top-k rows by cosine similarity for a batch of queries.
+
+        Args:
+            query_embeddings (Sequence[Sequence[float]]): One or more query vectors.
+            k (int): The number of results per query.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter. Only the
+                matching rows are read and scored.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row indices and similarities, both of shape
+            (n_queries, k), best match first.
+        """
+        queries = np.atleast_2d(np.array(query_embeddings, dtype=np.float32))
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        rows = self.filter_rows(where)
+        n_rows = self.count() if rows is None else len(rows)
+        k = min(k, n_rows)
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for selector, block_rows in row_blocks(self.count(), rows, _SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[selector], dtype=np.float32)
+            scores = queries @ block.T
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_idx = np.concatenate([best_idx, block_rows[top]], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+
+            # Keep only the current top-k candidates across blocks
+            if best_idx.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Chroma-compatible query. Distances are cosine distances (1 - similarity).
+        The stored (normalised) vectors are returned if `include` has "embeddings".
+        """
+        indices, scores = self.search(query_embeddings, n_results, where=where)
+        return self._format_results(indices, scores, include)
+
+    def _format_results(self, indices: np.ndarray, scores: np.ndarray, include: Optional[List[str]] = None) -> Dict[str, List[List[Any]]]:
+        results = {
+            "ids": [[self.ids[i] for i in row] for row in indices],
+            "documents": [[self.documents[i] for i in row] for row in indices],
+            "metadatas": [[self.metadatas[i] for i in row] for row in indices],
+            "distances": [(1.0 - row).tolist() for row in scores],
+        }
+        if include and "embeddings" in include:
+            results["embeddings"] = [np.asarray(self.embeddings[np.asarray(row, dtype=np.int64)], dtype=np.float32) for row in indices]
+        return results
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    import tempfile
+    import time
+
+    class _InMemoryCollection:
+        """A minimal stand-in for a chromadb.Collection."""
+        def __init__(self, name, embeddings):
+            self.name = name
+            self._embeddings = embeddings
+
+        def count(self):
+            return len(self._embeddings)
+
+        def get(self, limit, offset, include):
+            rows = range(offset, min(offset + limit, len(self._embeddings)))
+            return {
+                "ids": [f"id_{i}" for i in rows],
+                "embeddings": self._embeddings[offset:offset + limit],
+                "documents": [f"document {i}" for i in rows],
+                "metadatas": [{"source": "random", "chunk_number": i} for i in rows],
+            }
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50_000, 256)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_numpy_index(_InMemoryCollection("random", vectors), path=tmp, dtype="float16")
+        index = NumpyVectorIndex(tmp)
+        print(f"Index '{index.name}' contains {index.count()} vectors of dtype {index.embeddings.dtype}.")
+
+        queries = vectors[:32] + 0.01 * rng.standard_normal((32, 256)).astype(np.float32)
+        start = time.perf_counter()
+        indices, scores = index.search(queries, k=5)
+        elapsed = time.perf_counter() - start
+        print(f"Searched {len(queries)} queries in {elapsed * 1000:.1f} ms")
+        print(f"Self-match rate: {np.mean(indices[:, 0] == np.arange(32)):.2f}")
+        del index
@@ -0,0 +1,345 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.config import PQ_SUBVECTORS, QUANTIZATION_RESCORE_FACTOR
+from .numpy_store import NumpyVectorIndex, ids_digest, row_blocks
+
+QUANTIZATION_MODES = ("int8", "pq")
+
+# Number of centroids per PQ subspace, so that every code fits in one uint8
+PQ_CENTROIDS = 256
+
+# Maximum number of vectors used to train the PQ codebooks
+_PQ_TRAIN_SAMPLE_SIZE = 20_000
+# Number of rows encoded or scored per block
+_BLOCK_ROWS = 65_536
+
+def codes_file(mode: str) -> str:
+    return f"codes_{mode}.npy"
+
+def params_file(mode: str) -> str:
+    return f"quant_{mode}.npz"
+
+def _check_mode(mode: str) -> None:
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}. Expected one of {QUANTIZATION_MODES}.")
+
+def _pad(vectors: np.ndarray, dim: int) -> np.ndarray:
+    if vectors.shape[1] == dim:
+        return vectors
+    return np.pad(vectors, ((0, 0), (0, dim - vectors.shape[1])))
+
+def train_pq_codebooks(vectors: np.ndarray, n_subvectors: int, n_centroids: int = PQ_CENTROIDS, n_iter: int = 15, seed: int = 0) -> np.ndarray:
+    """
+    Trains one k-means codebook per subspace for product quantization.
+
+    Args:
+        vectors (np.ndarray): The training vectors, shape (n, dim). `dim` must be a
+            multiple of `n_subvectors` (pad with zeros otherwise).
+        n_subvectors (int): The number of subspaces M.
+        n_centroids (int): The number of centroids per subspace.
+        n_iter (int): The number of Lloyd iterations.
+        seed (int): The random seed.
+
+    Returns:
+        np.ndarray: The codebooks, shape (M, n_centroids, dim // M).
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_rows, dim = vectors.shape
+    sub_dim = dim // n_subvectors
+    n_centroids = min(n_centroids, n_rows)
+
+    codebooks = np.empty((n_subvectors, n_centroids, sub_dim), dtype=np.float32)
+    for m in range(n_subvectors):
+        sub = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+        centroids = sub[rng.choice(n_rows, n_centroids, replace=False)].copy()
+        for _ in range(n_iter):
+            # argmin ||x - c||^2 == argmax (x . c - ||c||^2 / 2)
+            assignments = np.argmax(sub @ centroids.T - 0.5 * np.einsum("ij,ij->i", centroids, centroids), axis=1)
+            counts = np.bincount(assignments, minlength=n_centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sub)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+            # Re-seed empty centroids with random training vectors
+            n_empty = int((~non_empty).sum())
+            if n_empty:
+                centroids[~non_empty] = sub[rng.choice(n_rows, n_empty, replace=False)]
+        codebooks[m] = centroids
+    return codebooks
+
+def encode_pq(vectors: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """
+    Encodes vectors as the index of the nearest centroid in every subspace.
+
+    Returns:
+        np.ndarray: The codes, shape (n, M), dtype uint8.
+    """
+    n_subvectors, _, sub_dim = codebooks.shape
+    vectors = _pad(np.asarray(vectors, dtype=np.float32), n_subvectors * sub_dim)
+    codes = np.empty((len(vectors), n_subvectors), dtype=np.uint8)
+    for m, centroids in enumerate(codebooks):
+        sub = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+        codes[:, m] = np.argmax(sub @ centroids.T - 0.5 * np.einsum("ij,ij->i", centroids, centroids), axis=1)
+    return codes
+
+def build_quantized_index(path: Union[str, Path], mode: str, n_subvectors: Optional[int] = None, seed: int = 0) -> Path:
+    """
+    Builds compressed codes on top of a NumPy index created by `build_numpy_index`.
+
+    The full-precision embedding matrix stays on disk and is only read to rescore
+    candidates. The codes are written to `codes_<mode>.npy` and the parameters needed
+    to score them to `quant_<mode>.npz`.
+
+    - "int8": scalar quantization with one symmetric scale per dimension (4x smaller
+      than float32).
+    - "pq": product quantization with 256 centroids per subspace, one byte per
+      subvector (`4 * dim / M` times smaller than float32).
+
+    Args:
+        path (Union[str, Path]): The NumPy index directory.
+        mode (str): "int8" or "pq".
+        n_subvectors (Optional[int]): The number of PQ subspaces M. Defaults to
+            PQ_SUBVECTORS, or dim / 4 if that is 0.
+        seed (int): The random seed for training the PQ codebooks.
+
+    Returns:
+        Path: The index directory.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    _check_mode(mode)
+    path = Path(path)
+    # Taken before the rows are read: if a new build is published in between, the
+    # codes are marked with the older digest and rejected as stale
+    params: Dict[str, Any] = {"digest": np.array(ids_digest(path))}
+    embeddings = NumpyVectorIndex(path).embeddings
+    n_rows = len(embeddings)
+    dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+
+    if mode == "int8":
+        max_abs = np.zeros(dim, dtype=np.float32)
+        for start in range(0, n_rows, _BLOCK_ROWS):
+            block = np.abs(np.asarray(embeddings[start:start + _BLOCK_ROWS], dtype=np.float32))
+            np.maximum(max_abs, block.max(axis=0), out=max_abs)
+        scales = np.maximum(max_abs, 1e-12) / 127.0
+        codes = np.empty((n_rows, dim), dtype=np.int8)
+        for start in range(0, n_rows, _BLOCK_ROWS):
+            block = np.asarray(embeddings[start:start + _BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / scales), -127, 127)
+        params["scales"] = scales
+    else:
+        n_subvectors = max(1, min(n_subvectors or PQ_SUBVECTORS or dim // 4, dim or 1))
+        sub_dim = -(-dim // n_subvectors)
+        if n_rows:
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(n_rows, min(n_rows, _PQ_TRAIN_SAMPLE_SIZE), replace=False))
+            training = _pad(np.asarray(embeddings[sample], dtype=np.float32), n_subvectors * sub_dim)
+            codebooks = train_pq_codebooks(training, n_subvectors, seed=seed)
+        else:
+            codebooks = np.zeros((n_subvectors, 0, sub_dim), dtype=np.float32)
+        codes = np.empty((n_rows, n_subvectors), dtype=np.uint8)
+        for start in range(0, n_rows, _BLOCK_ROWS):
+            block = embeddings[start:start + _BLOCK_ROWS]
+            codes[start:start + len(block)] = encode_pq(block, codebooks)
+        params["codebooks"] = codebooks
+    del embeddings
+
+    tmp_codes = path / (codes_file(mode) + ".tmp.npy")
+    np.save(tmp_codes, codes)
+    tmp_params = path / (params_file(mode) + ".tmp.npz")
+    np.savez(tmp_params, **params)
+
+    os.replace(tmp_codes, path / codes_file(mode))
+    os.replace(tmp_params, path / params_file(mode))
+    return path
+
+
+class QuantizedVectorIndex(NumpyVectorIndex):
+    """
+    A two-stage index over int8 or PQ codes of a NumPy index.
+
+    The compact codes are held in memory and scored for every query; only the best
+    `k * rescore_factor` candidates are then rescored exactly against the
+    full-precision matrix, which stays memory-mapped on disk. A small rescore set
+    recovers most of the recall lost to quantization for a fraction of the memory.
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str, rescore_factor: int = QUANTIZATION_RESCORE_FACTOR):
+        """
+        Args:
+            path (Union[str, Path]): The index directory created by `build_quantized_index`.
+            mode (str): "int8" or "pq".
+            rescore_factor (int): The default number of candidates rescored per
+                result. 0 returns the approximate scores without rescoring.
+
+        Raises:
+            ValueError: If the mode is unknown, or there are no matching codes at `path`.
+        """
+        _check_mode(mode)
+        super().__init__(path)
+        if not (self.path / codes_file(mode)).is_file() or not (self.path / params_file(mode)).is_file():
+            raise ValueError(f"Quantized '{mode}' index not found at: {self.path}")
+
+        self.mode = mode
+        self.codes = np.load(self.path / codes_file(mode))
+        with np.load(self.path / params_file(mode)) as params:
+            if str(params["digest"]) != ids_digest(self.path) or len(self.codes) != self.count():
+                raise ValueError(f"Quantized index at {self.path} is stale. Rebuild it with build_quantized_index().")
+            self.scales = params["scales"] if mode == "int8" else None
+            self.codebooks = params["codebooks"] if mode == "pq" else None
+        self.rescore_factor = rescore_factor
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory held by the codes and their parameters.
+        """
+        params = self.scales if self.mode == "int8" else self.codebooks
+        return self.codes.nbytes + params.nbytes
+
+    def exact_search(self, query_embeddings: Sequence[Sequence[float]], k: int, where: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force search over the full-precision rows, used as the ground truth for recall.
+        """
+        return NumpyVectorIndex.search(self, query_embeddings, k, where=where)
+
+    def approximate_scores(self, queries: np.ndarray, rows: Union[slice, np.ndarray]) -> np.ndarray:
+        """
+        Scores the selected rows from their codes, shape (n_queries, n_selected).
+        """
+        codes = self.codes[rows]
+        if self.mode == "int8":
+            # q . x ~= sum_d (q_d * scale_d) * code_d
+            return (queries * self.scales) @ codes.T.astype(np.float32)
+
+        # Asymmetric distance: one lookup table of query . centroid per subspace
+        n_subvectors, n_centroids, sub_dim = self.codebooks.shape
+        padded = _pad(queries, n_subvectors * sub_dim).reshape(len(queries), n_subvectors, sub_dim)
+        tables = np.einsum("qms,mcs->qmc", padded, self.codebooks).reshape(len(queries), -1)
+        flat_codes = codes.astype(np.intp) + np.arange(n_subvectors) * n_centroids
+        return np.stack([table[flat_codes].sum(axis=1) for table in tables])
+
+    def search(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        k: int,
+        rescore_factor: Optional[int] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the approximate top-k rows for a batch of queries.
+
+        Args:
+            query_embeddings (Sequence[Sequence[float]]): One or more query vectors.
+            k (int): The number of results per query.
+            rescore_factor (Optional[int]): The number of candidates rescored per result.
+                Defaults to `self.rescore_factor`; 0 skips rescoring.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter. Only the
+                codes of the matching rows are scored.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row indices and similarities, both of shape
+            (n_queries, k), best match first.
+        """
+        queries = np.atleast_2d(np.array(query_embeddings, dtype=np.float32))
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        rescore_factor = self.rescore_factor if rescore_factor is None else rescore_factor
+        rows = self.filter_rows(where)
+        n_rows = self.count() if rows is None else len(rows)
+        k = min(k, n_rows)
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        n_candidates = min(max(k * rescore_factor, k), n_rows)
+
+        # Stage 1: keep the best candidates by their approximate scores
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for selector, block_rows in row_blocks(self.count(), rows, _BLOCK_ROWS):
+            scores = self.approximate_scores(queries, selector)
+            n = min(n_candidates, scores.shape[1])
+            top = np.argpartition(-scores, n - 1, axis=1)[:, :n] if scores.shape[1] > n else np.broadcast_to(np.arange(n), (len(queries), n))
+            best_idx = np.concatenate([best_idx, block_rows[top]], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            if best_idx.shape[1] > n_candidates:
+                keep = np.argpartition(-best_scores, n_candidates - 1, axis=1)[:, :n_candidates]
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        # Stage 2: rescore the candidates against the full-precision rows on disk
+        if rescore_factor:
+            for q, rows in enumerate(best_idx):
+                rows = np.sort(rows)
+                best_idx[q] = rows
+                best_scores[q] = np.asarray(self.embeddings[rows], dtype=np.float32) @ queries[q]
+
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        rescore_factor: Optional[int] = None,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Chroma-compatible query with an optional per-query `rescore_factor`.
+        """
+        indices, scores = self.search(query_embeddings, n_results, rescore_factor=rescore_factor, where=where)
+        return self._format_results(indices, scores, include)
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from .numpy_store import build_numpy_index
+
+    class _InMemoryCollection:
+        """A minimal stand-in for a chromadb.Collection."""
+        def __init__(self, name, embeddings):
+            self.name = name
+            self._embeddings = embeddings
+
+        def count(self):
+            return len(self._embeddings)
+
+        def get(self, limit, offset, include):
+            rows = range(offset, min(offset + limit, len(self._embeddings)))
+            return {
+                "ids": [f"id_{i}" for i in rows],
+                "embeddings": self._embeddings[offset:offset + limit],
+                "documents": [f"document {i}" for i in rows],
+                "metadatas": [{"source": "random", "chunk_number": i} for i in rows],
+            }
+
+    rng = np.random.default_rng(0)
+    clusters = rng.standard_normal((200, 128)).astype(np.float32)
+    vectors = clusters[rng.integers(0, 200, 50_000)] + 0.3 * rng.standard_normal((50_000, 128)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_numpy_index(_InMemoryCollection("random", vectors), path=tmp)
+        queries = vectors[rng.integers(0, len(vectors), 100)] + 0.1 * rng.standard_normal((100, 128)).astype(np.float32)
+
+        for mode in QUANTIZATION_MODES:
+            build_quantized_index(tmp, mode)
+            index = QuantizedVectorIndex(tmp, mode)
+            exact, _ = index.exact_search(queries, k=10)
+            print(f"{mode}: {index.nbytes / 1e6:.1f} MB of codes vs {index.embeddings.nbytes / 1e6:.1f} MB float32")
+            for factor in (0, 4, 16):
+                start = time.perf_counter()
+                approx, _ = index.search(queries, k=10, rescore_factor=factor)
+                elapsed = time.perf_counter() - start
+                recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approx, exact)])
+                print(f"  rescore_factor={factor:2d}  recall@10={recall:.3f}  {elapsed / len(queries) * 1000:.2f} ms/query")
+            del index
@@ -1,28 +1,142 @@
-from typing import List, Dict, Union
-import chromadb
+from __future__ import annotations
 
-from .vector_store import search_vector_store
-from core.model_provider import llm
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 
-# Define Document type
-Document = Dict[str, Union[str, Dict]]
+from .answer_cache import ExactAnswerCache, SemanticAnswerCache
+from .bm25_index import BM25Index
+from .context import compact_context
+from .schema import Document
+from .vector_store import (
+    search_vector_store,
+    asearch_vector_store,
+    search_vector_store_many,
+    lexical_search_vector_store,
+    hybrid_search_vector_store,
+    mmr_search_vector_store,
+    get_bm25_index,
+    collection_version,
+)
+from core.config import RETRIEVAL_MODE, ANSWER_CACHE_ENABLED
+from core.logger import log
+from core import registry
+from core.llm_cache import label_chain
+from core.model_provider import get_role_llm
+
+if TYPE_CHECKING:
+    import chromadb
 
 class RAGRetriever:
-    def __init__(self, collection: chromadb.Collection):
+    def __init__(
+        self,
+        collection: chromadb.Collection,
+        mode: str = RETRIEVAL_MODE,
+        bm25_index: Optional[BM25Index] = None,
+        answer_cache: Optional[Union[SemanticAnswerCache, ExactAnswerCache]] = None,
+        n_results: int = 3,
+    ):
         """
         Initializes the RAG retriever.
 
         Args:
             collection (chromadb.Collection): The ChromaDB collection to retrieve documents from.
+                Any backend returned by `rag.vector_store.get_collection` (e.g. a
+                NumpyVectorIndex) can be used as well.
+            mode (str): "vector", "hybrid" (BM25 + vector, fused with RRF), "lexical"
+                (BM25 only, no embedding call) or "mmr" (vector search re-ranked for
+                diversity with MMR_FETCH_K and MMR_LAMBDA).
+            bm25_index (Optional[BM25Index]): The BM25 index of the collection. Loaded
+                from disk if needed and not given.
+            answer_cache (Optional[Union[SemanticAnswerCache, ExactAnswerCache]]): The
+                cache for answers to similar questions. A new one is created if
+                ANSWER_CACHE_ENABLED is set: an ExactAnswerCache in "lexical" mode, so
+                no query is embedded, and a SemanticAnswerCache otherwise.
+            n_results (int): The number of chunks retrieved per question. Neighbouring
+                chunks are merged before prompting, so raising it costs fewer tokens
+                than n_results full chunks.
         """
+        if mode not in ("vector", "hybrid", "lexical", "mmr"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
         self.collection = collection
-        self.llm = llm # Use the globally initialized LLM
+        self.mode = mode
+        self.bm25_index = bm25_index
+        if mode in ("hybrid", "lexical") and bm25_index is None:
+            self.bm25_index = get_bm25_index(collection.name)
+        self.answer_cache = answer_cache
+        self.n_results = n_results
+        # The shared models are built on first use and reused by every retriever
+        self.embedding_model = registry.get("embedding_model")
+        if answer_cache is None and ANSWER_CACHE_ENABLED:
+            if mode == "lexical":
+                self.answer_cache = ExactAnswerCache()
+            elif self.embedding_model:
+                self.answer_cache = SemanticAnswerCache()
+        llm = get_role_llm("rag")
+        self.llm = label_chain(llm, "rag") if llm else None
+        # Timings of the last answer_query_stream call, None until the first one
+        self.last_stream_stats: Optional[Dict[str, Any]] = None
+
+    def retrieve(
+        self,
+        query: str,
+        n_results: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        """
+        Retrieves the most relevant chunks for a query using the configured mode.
+
+        `where` is a Chroma-style metadata filter (e.g. {"source": "handbook.pdf"})
+        that restricts the search to a slice of the collection.
+        """
+        if self.mode == "lexical":
+            return lexical_search_vector_store(query, self.collection, self.bm25_index, n_results=n_results, where=where)
+        if self.mode == "hybrid":
+            return hybrid_search_vector_store(
+                query, self.collection, self.bm25_index, n_results=n_results, query_embedding=query_embedding, where=where
+            )
+        if self.mode == "mmr":
+            return mmr_search_vector_store(query, self.collection, n_results=n_results, query_embedding=query_embedding, where=where)
+        return search_vector_store(query, self.collection, n_results=n_results, query_embedding=query_embedding, where=where)
+
+    async def aretrieve(
+        self,
+        query: str,
+        n_results: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        """
+        Async `retrieve`. The query is embedded with the async API, and the blocking
+        index lookups run in a worker thread.
+        """
+        if self.mode == "vector":
+            return await asearch_vector_store(query, self.collection, n_results=n_results, query_embedding=query_embedding, where=where)
+        if self.mode in ("hybrid", "mmr") and query_embedding is None:
+            if not self.embedding_model:
+                raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+            query_embedding = await self.embedding_model.aembed_query(query)
+        return await asyncio.to_thread(self.retrieve, query, n_results, query_embedding, where)
+
+    def _uses_cache(self, where: Optional[Dict[str, Any]]) -> bool:
+        # Answers are cached per question only, so filtered questions bypass the cache
+        # instead of returning an answer built from another slice of the collection
+        return self.answer_cache is not None and not where
+
+    def _needs_query_embedding(self, where: Optional[Dict[str, Any]]) -> bool:
+        # Lexical retrieval and the exact answer cache work on the query text alone
+        return self.mode != "lexical" or (self._uses_cache(where) and not isinstance(self.answer_cache, ExactAnswerCache))
 
     def _create_prompt(self, query: str, context_docs: List[Document]) -> str:
         """
         Creates a prompt based on the retrieved context and the user's query.
+
+        The chunks are compacted first: overlapping neighbours are merged, and the
+        context is cut to CONTEXT_MAX_TOKENS.
         """
-        context = "\n\n".join([doc["page_content"] for doc in context_docs])
+        context = "\n\n".join([doc.page_content for doc in compact_context(context_docs)])
         
         prompt_template = f"""
         You are a helpful assistant. Answer the following question based only on the provided context.
@@ -37,12 +151,59 @@ class RAGRetriever:
         """
         return prompt_template.strip()
 
-    def answer_query(self, query: str) -> str:
+    def _prepare(self, query: str, where: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Optional[str], Any, Optional[str]]:
+        """
+        Runs the steps before generation: answer cache lookup, retrieval and prompt creation.
+
+        Returns:
+            Tuple: (answer, prompt, cache_key, version). `answer` is set if no LLM
+            call is needed (cache hit or no context); otherwise `prompt` is set.
+            `cache_key` is the query embedding, or the query text for an ExactAnswerCache.
+        """
+        query_embedding = None
+        if self.embedding_model and self._needs_query_embedding(where):
+            query_embedding = self.embedding_model.embed_query(query)
+
+        # 0. Reuse the answer to a sufficiently similar question, if the collection is unchanged
+        cache_key = query_embedding if query_embedding is not None else query
+        version = None
+        if self._uses_cache(where):
+            version = collection_version(self.collection.name)
+            cached_answer = self.answer_cache.lookup(cache_key, version)
+            if cached_answer is not None:
+                log.debug("Answer cache hit for: '%s'", query)
+                return cached_answer, None, cache_key, version
+
+        # 1. Retrieve
+        log.debug("Searching for context related to: '%s'", query)
+        retrieved_docs = self.retrieve(query, n_results=self.n_results, query_embedding=query_embedding, where=where)
+
+        # 2. Augment
+        answer, prompt = self._augment(query, retrieved_docs)
+        return answer, prompt, cache_key, version
+
+    def _augment(self, query: str, retrieved_docs: List[Document]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (answer, None) if nothing was retrieved, otherwise (None, prompt).
+        """
+        if not retrieved_docs:
+            log.debug("No relevant context found in the vector store.")
+            return "I could not find any relevant information to answer your question.", None
+
+        log.debug("Found %d relevant document chunks.", len(retrieved_docs))
+        prompt = self._create_prompt(query, retrieved_docs)
+        log.debug("Generated prompt for LLM:\n%s", prompt)
+        return None, prompt
+
+    def answer_query(self, query: str, where: Optional[Dict[str, Any]] = None) -> str:
         """
         Executes the full RAG process: retrieve -> augment -> generate.
 
         Args:
             query (str): The user's query.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter that
+                restricts retrieval, e.g. {"source": "handbook.pdf"}. Filtered
+                questions bypass the answer cache.
 
         Returns:
             str: The final answer generated by the LLM.
@@ -50,34 +211,212 @@ class RAGRetriever:
         if not self.llm:
             return "Error: LLM is not available. Please check your API key."
 
-        # 1. Retrieve
-        print(f"Searching for context related to: '{query}'")
-        retrieved_docs = search_vector_store(query, self.collection, n_results=3)
+        answer, prompt, cache_key, version = self._prepare(query, where)
+        if answer is not None:
+            return answer
+
+        # 3. Generate
+        log.debug("Generating answer from LLM...")
+        response = self.llm.invoke(prompt)
+
+        if self._uses_cache(where):
+            self.answer_cache.store(cache_key, response.content, version)
         
-        if not retrieved_docs:
-            print("No relevant context found in the vector store.")
-            return "I could not find any relevant information to answer your question."
+        return response.content
+
+    def answer_query_stream(self, query: str, where: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Executes the full RAG process and yields the answer as the LLM generates it.
+
+        The timings of the last call are kept in `self.last_stream_stats`:
+        "time_to_first_token" and "total_time" in seconds (from the start of the call,
+        including retrieval) and the number of streamed "chunks".
 
-        print(f"Found {len(retrieved_docs)} relevant document chunks.")
+        Args:
+            query (str): The user's query.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter that
+                restricts retrieval, e.g. {"source": "handbook.pdf"}. Filtered
+                questions bypass the answer cache.
+
+        Yields:
+            str: Pieces of the answer, in order. A cached answer or an error is
+            yielded as a single piece.
+        """
+        start = time.perf_counter()
+        self.last_stream_stats = {"time_to_first_token": None, "total_time": None, "chunks": 0}
+        stats = self.last_stream_stats
+
+        if not self.llm:
+            answer = "Error: LLM is not available. Please check your API key."
+            prompt = None
+        else:
+            answer, prompt, cache_key, version = self._prepare(query, where)
+
+        if answer is not None:
+            stats["time_to_first_token"] = stats["total_time"] = time.perf_counter() - start
+            stats["chunks"] = 1
+            yield answer
+            return
+
+        # 3. Generate, token by token
+        log.debug("Streaming answer from LLM...")
+        parts = []
+        for message_chunk in self.llm.stream(prompt):
+            content = message_chunk.content
+            if not content:
+                continue
+            if stats["time_to_first_token"] is None:
+                stats["time_to_first_token"] = time.perf_counter() - start
+                log.debug("Time to first token: %.3fs", stats["time_to_first_token"])
+            stats["chunks"] += 1
+            parts.append(content)
+            yield content
+
+        stats["total_time"] = time.perf_counter() - start
+        log.debug("Streamed %d chunks in %.3fs", stats["chunks"], stats["total_time"])
+        if self._uses_cache(where):
+            self.answer_cache.store(cache_key, "".join(parts), version)
+
+    async def aanswer_query(self, query: str, where: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Async `answer_query`, for serving many questions from one event loop.
+
+        Embedding and generation use the async APIs of the models; the blocking
+        index lookups run in worker threads.
+
+        Args:
+            query (str): The user's query.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter that
+                restricts retrieval, e.g. {"source": "handbook.pdf"}. Filtered
+                questions bypass the answer cache.
+
+        Returns:
+            str: The final answer generated by the LLM.
+        """
+        if not self.llm:
+            return "Error: LLM is not available. Please check your API key."
+
+        query_embedding = None
+        if self.embedding_model and self._needs_query_embedding(where):
+            query_embedding = await self.embedding_model.aembed_query(query)
+
+        # 0. Reuse the answer to a sufficiently similar question, if the collection is unchanged
+        cache_key = query_embedding if query_embedding is not None else query
+        version = None
+        if self._uses_cache(where):
+            version = collection_version(self.collection.name)
+            cached_answer = self.answer_cache.lookup(cache_key, version)
+            if cached_answer is not None:
+                log.debug("Answer cache hit for: '%s'", query)
+                return cached_answer
+
+        # 1. Retrieve
+        log.debug("Searching for context related to: '%s'", query)
+        retrieved_docs = await self.aretrieve(query, n_results=self.n_results, query_embedding=query_embedding, where=where)
 
         # 2. Augment
-        prompt = self._create_prompt(query, retrieved_docs)
-        print("\n--- Generated Prompt for LLM ---")
-        print(prompt)
-        print("---------------------------------")
+        answer, prompt = self._augment(query, retrieved_docs)
+        if answer is not None:
+            return answer
 
         # 3. Generate
-        print("\nGenerating answer from LLM...")
-        response = self.llm.invoke(prompt)
-        
+        log.debug("Generating answer from LLM...")
+        response = await self.llm.ainvoke(prompt)
+
+        if self._uses_cache(where):
+            self.answer_cache.store(cache_key, response.content, version)
+
         return response.content
 
+    def answer_queries(self, queries: List[str], use_batch: bool = True, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Executes the full RAG process for many queries at once.
+
+        All queries are embedded with one `embed_documents` call and, in "vector" mode,
+        retrieved with one multi-vector query. With `use_batch`, the answers are
+        generated with a single `llm.batch` call, which runs the requests concurrently.
+
+        Args:
+            queries (List[str]): The user's queries.
+            use_batch (bool): Whether to generate the answers with `llm.batch`.
+            where (Optional[Dict[str, Any]]): A Chroma-style metadata filter applied to
+                every query.
+
+        Returns:
+            List[str]: The answers, in the same order as the queries.
+        """
+        if not self.llm:
+            return ["Error: LLM is not available. Please check your API key."] * len(queries)
+        if not queries:
+            return []
+
+        answers: List[Optional[str]] = [None] * len(queries)
+        query_embeddings = None
+        if self.embedding_model and self._needs_query_embedding(where):
+            query_embeddings = self.embedding_model.embed_documents(queries)
+        cache_keys = query_embeddings if query_embeddings is not None else queries
+
+        # 0. Reuse cached answers to similar questions
+        pending = list(range(len(queries)))
+        if self._uses_cache(where):
+            version = collection_version(self.collection.name)
+            pending = []
+            for i, cache_key in enumerate(cache_keys):
+                cached_answer = self.answer_cache.lookup(cache_key, version)
+                if cached_answer is None:
+                    pending.append(i)
+                else:
+                    answers[i] = cached_answer
+
+        # 1. Retrieve
+        log.debug("Searching for context related to %d queries...", len(pending))
+        if self.mode == "vector":
+            retrieved = search_vector_store_many(
+                [queries[i] for i in pending],
+                self.collection,
+                n_results=self.n_results,
+                query_embeddings=[query_embeddings[i] for i in pending] if query_embeddings else None,
+                where=where,
+            )
+        else:
+            retrieved = [
+                self.retrieve(
+                    queries[i], n_results=self.n_results, query_embedding=query_embeddings[i] if query_embeddings else None, where=where
+                )
+                for i in pending
+            ]
+
+        # 2. Augment
+        prompts, prompt_indices = [], []
+        for i, retrieved_docs in zip(pending, retrieved):
+            if not retrieved_docs:
+                answers[i] = "I could not find any relevant information to answer your question."
+            else:
+                prompts.append(self._create_prompt(queries[i], retrieved_docs))
+                prompt_indices.append(i)
+
+        # 3. Generate
+        log.debug("Generating %d answers from LLM...", len(prompts))
+        if use_batch:
+            responses = self.llm.batch(prompts) if prompts else []
+        else:
+            responses = [self.llm.invoke(prompt) for prompt in prompts]
+
+        for i, response in zip(prompt_indices, responses):
+            answers[i] = response.content
+            if self._uses_cache(where):
+                self.answer_cache.store(cache_keys[i], response.content, version)
+
+        return answers
+
 # --- Example Usage ---
 if __name__ == '__main__':
     # This example depends on the vector_store.py example running successfully.
     # We will recreate a temporary vector store here.
-    from .vector_store import create_vector_store, client as chroma_client
+    from .vector_store import create_vector_store
 
+    llm = get_role_llm("rag")
+    chroma_client = registry.get("chroma_client")
     if not llm:
         print("Skipping retriever example because LLM is not available.")
     else:
@@ -89,7 +428,7 @@ if __name__ == '__main__':
         ]
         collection_name = "france_facts_openai"
         if collection_name in [c.name for c in chroma_client.list_collections()]:
-            client.delete_collection(name=collection_name)
+            chroma_client.delete_collection(name=collection_name)
             
         collection = create_vector_store(sample_chunks, collection_name=collection_name)
         print(f"\nVector store '{collection.name}' created with {collection.count()} items.")
@@ -110,4 +449,10 @@ if __name__ == '__main__':
         answer_2 = retriever.answer_query(question_2)
         
         print(f"\nQuestion: {question_2}")
-        print(f"Answer: {answer_2}")
\ No newline at end of file
+        print(f"Answer: {answer_2}")
+        print("\n--- Streaming an answer ---")
+        print(f"Question: {question}\nAnswer: ", end="")
+        for token in retriever.answer_query_stream(question):
+            print(token, end="", flush=True)
+        stats = retriever.last_stream_stats
+        print(f"\n(time to first token: {stats['time_to_first_token']:.2f}s, total: {stats['total_time']:.2f}s)")
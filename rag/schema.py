@@ -0,0 +1,352 @@
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+import numpy as np
+
+class Document:
+    """
+    A piece of text and its metadata, shared by all modules of the rag package.
+
+    Instances use `__slots__` instead of a per-instance `__dict__`. The mapping
+    protocol of the former dict representation is kept (`doc["page_content"]`,
+    `doc["metadata"]`, `dict(doc)`), so code written against plain dicts and
+    LangChain interop keep working.
+    """
+    __slots__ = ("page_content", "_metadata")
+
+    _KEYS = ("page_content", "metadata")
+
+    def __init__(self, page_content: str, metadata: Optional[Dict[str, Any]] = None):
+        self.page_content = page_content
+        self._metadata = metadata if metadata is not None else {}
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, metadata: Dict[str, Any]) -> None:
+        self._metadata = metadata
+
+    # --- dict view ---
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._KEYS
+
+    def keys(self):
+        return self._KEYS
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self._KEYS else default
+
+    def get_metadata(self, key: str, default: Any = None) -> Any:
+        """
+        Returns one metadata value without building the metadata dict.
+        """
+        return self._metadata.get(key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns a plain {"page_content", "metadata"} dict with a copy of the metadata.
+        """
+        return {"page_content": self.page_content, "metadata": dict(self.metadata)}
+
+    def to_langchain(self):
+        """
+        Converts to a `langchain_core.documents.Document`.
+        """
+        from langchain_core.documents import Document as LangChainDocument
+        return LangChainDocument(page_content=self.page_content, metadata=dict(self.metadata))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Document, dict)):
+            return self.page_content == other["page_content"] and self.metadata == other["metadata"]
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(page_content={self.page_content!r}, metadata={self.metadata!r})"
+
+
+class Chunk(Document):
+    """
+    A chunk of a source document.
+
+    The metadata of the source is shared by all of its chunks instead of being copied
+    per chunk; the chunk's own position is kept in slots. `metadata` builds the merged
+    dict on access, so changes to it are not stored on the chunk.
+    """
+    _FIELDS = ("chunk_number", "start_index", "end_index", "token_count")
+    __slots__ = _FIELDS
+
+    def __init__(
+        self,
+        page_content: str,
+        source_metadata: Optional[Mapping[str, Any]] = None,
+        chunk_number: Optional[int] = None,
+        start_index: Optional[int] = None,
+        end_index: Optional[int] = None,
+        token_count: Optional[int] = None,
+    ):
+        super().__init__(page_content, source_metadata)
+        self.chunk_number = chunk_number
+        self.start_index = start_index
+        self.end_index = end_index
+        self.token_count = token_count
+
+    @property
+    def source_metadata(self) -> Mapping[str, Any]:
+        return self._metadata
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        metadata = dict(self._metadata)
+        for key in self._FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                metadata[key] = value
+        return metadata
+
+    @metadata.setter
+    def metadata(self, metadata: Dict[str, Any]) -> None:
+        self._metadata = metadata
+        self.chunk_number = self.start_index = self.end_index = self.token_count = None
+
+    def get_metadata(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELDS and getattr(self, key) is not None:
+            return getattr(self, key)
+        return self._metadata.get(key, default)
+
+    def __repr__(self) -> str:
+        return (
+            f"Chunk(page_content={self.page_content!r}, chunk_number={self.chunk_number}, "
+            f"start_index={self.start_index}, end_index={self.end_index}, source_metadata={dict(self._metadata)!r})"
+        )
+
+
+def as_document(value: Union[Document, Mapping[str, Any], Any]) -> Document:
+    """
+    Converts a dict with "page_content"/"metadata" or a LangChain document into a Document.
+    Documents are returned as they are.
+
+    Raises:
+        ValueError: If the value has no page content.
+    """
+    if isinstance(value, Document):
+        return value
+    if isinstance(value, Mapping) and "page_content" in value:
+        return Document(value["page_content"], value.get("metadata") or {})
+    if hasattr(value, "page_content"):
+        return Document(value.page_content, dict(getattr(value, "metadata", None) or {}))
+    raise ValueError("Input must be a Document, or a dictionary with a 'page_content' key.")
+
+
+# Chunk fields stored as integer columns; -1 marks a missing value
+_CHUNK_FIELDS = Chunk._FIELDS
+_MISSING = -1
+
+class ChunkBatch:
+    """
+    A compact, read-only, columnar batch of chunks.
+
+    All texts live in one string buffer addressed by an offsets array, the chunk
+    positions are integer columns, and each distinct source metadata dict is stored
+    once and referenced by index. A million chunks cost a few arrays instead of a
+    million dicts and metadata copies. Indexing returns `Chunk` objects that share
+    the interned metadata.
+    """
+    __slots__ = ("_text", "_offsets", "_metadata_ids", "_metadatas", "_columns")
+
+    def __init__(self, text: str, offsets: np.ndarray, metadata_ids: np.ndarray, metadatas: List[Mapping[str, Any]], columns: Dict[str, np.ndarray]):
+        self._text = text
+        self._offsets = offsets
+        self._metadata_ids = metadata_ids
+        self._metadatas = metadatas
+        self._columns = columns
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Union[Document, Mapping[str, Any]]]) -> "ChunkBatch":
+        """
+        Packs documents or chunks into a batch. Equal metadata dicts are interned.
+        """
+        parts: List[str] = []
+        lengths: List[int] = []
+        metadata_ids: List[int] = []
+        metadatas: List[Mapping[str, Any]] = []
+        interned: Dict[Any, int] = {}
+        columns: Dict[str, List[int]] = {field: [] for field in _CHUNK_FIELDS}
+        last_metadata, last_id = None, -1
+
+        for doc in documents:
+            doc = as_document(doc)
+            parts.append(doc.page_content)
+            lengths.append(len(doc.page_content))
+
+            is_chunk = isinstance(doc, Chunk)
+            metadata = doc.source_metadata if is_chunk else doc.metadata
+            # Consecutive chunks of one source share the same metadata object
+            if metadata is not last_metadata:
+                key = _metadata_key(metadata)
+                if key not in interned:
+                    interned[key] = len(metadatas)
+                    metadatas.append(metadata)
+                last_metadata, last_id = metadata, interned[key]
+            metadata_ids.append(last_id)
+
+            for field in _CHUNK_FIELDS:
+                value = getattr(doc, field) if is_chunk else None
+                columns[field].append(_MISSING if value is None else value)
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            "".join(parts),
+            offsets,
+            np.asarray(metadata_ids, dtype=np.int32),
+            metadatas,
+            {field: np.asarray(values, dtype=np.int64) for field, values in columns.items()},
+        )
+
+    @classmethod
+    def concat(cls, batches: List["ChunkBatch"]) -> "ChunkBatch":
+        """
+        Joins batches into one, e.g. the page ranges of a file that were split in
+        different processes. The metadata dicts are interned again across batches.
+        """
+        if not batches:
+            return cls.from_documents([])
+        if len(batches) == 1:
+            return batches[0]
+        parts: List[str] = []
+        offsets: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+        metadata_ids: List[np.ndarray] = []
+        metadatas: List[Mapping[str, Any]] = []
+        interned: Dict[Any, int] = {}
+        end = 0
+        for batch in batches:
+            remap = []
+            for metadata in batch._metadatas:
+                key = _metadata_key(metadata)
+                if key not in interned:
+                    interned[key] = len(metadatas)
+                    metadatas.append(metadata)
+                remap.append(interned[key])
+            # Slices share the text buffer of their parent, so their offsets need not start at 0
+            start = int(batch._offsets[0])
+            parts.append(batch._text[start:int(batch._offsets[-1])])
+            offsets.append(batch._offsets[1:] - start + end)
+            end += int(batch._offsets[-1]) - start
+            metadata_ids.append(np.asarray(remap, dtype=np.int32)[batch._metadata_ids] if remap else batch._metadata_ids)
+        return cls(
+            "".join(parts),
+            np.concatenate(offsets),
+            np.concatenate(metadata_ids).astype(np.int32),
+            metadatas,
+            {field: np.concatenate([batch._columns[field] for batch in batches]) for field in _CHUNK_FIELDS},
+        )
+
+    def __reduce__(self):
+        # Streamed chunks share read-only (MappingProxyType) metadata, which cannot be
+        # pickled; batches are sent between processes with plain dict copies
+        return (
+            ChunkBatch,
+            (self._text, self._offsets, self._metadata_ids, [dict(metadata) for metadata in self._metadatas], self._columns),
+        )
+
+    def __len__(self) -> int:
+        return len(self._metadata_ids)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Chunk, "ChunkBatch"]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("ChunkBatch slices must be contiguous.")
+            # Shares the text buffer and the interned metadata
+            return ChunkBatch(
+                self._text,
+                self._offsets[start:max(start, stop) + 1],
+                self._metadata_ids[start:stop],
+                self._metadatas,
+                {field: values[start:stop] for field, values in self._columns.items()},
+            )
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ChunkBatch index out of range")
+        fields = {}
+        for field, values in self._columns.items():
+            value = int(values[index])
+            fields[field] = None if value == _MISSING else value
+        return Chunk(self.text(index), self._metadatas[self._metadata_ids[index]], **fields)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, index: int) -> str:
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+
+    def texts(self) -> List[str]:
+        """
+        Returns the texts of all chunks, e.g. for an embedding request.
+        """
+        bounds = self._offsets.tolist()
+        return [self._text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def metadatas(self) -> List[Dict[str, Any]]:
+        """
+        Returns the merged metadata dict of every chunk, e.g. for a ChromaDB upsert.
+        """
+        return [chunk.metadata for chunk in self]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Returns plain {"page_content", "metadata"} dicts.
+        """
+        return [chunk.to_dict() for chunk in self]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The approximate memory held by the batch's arrays and text buffer.
+        """
+        return (
+            sys.getsizeof(self._text)
+            + self._offsets.nbytes
+            + self._metadata_ids.nbytes
+            + sum(values.nbytes for values in self._columns.values())
+        )
+
+def _metadata_key(metadata: Mapping[str, Any]) -> Any:
+    try:
+        return tuple(sorted(metadata.items()))
+    except TypeError:
+        return json.dumps(metadata, sort_keys=True, default=str)
+
+
+# --- Example Usage ---
+if __name__ == '__main__':
+    source = {"source": "handbook.txt"}
+    chunks = [Chunk(f"chunk text {i} " * 20, source, chunk_number=i + 1, start_index=i * 200, end_index=i * 200 + 200) for i in range(10_000)]
+    as_dicts = [chunk.to_dict() for chunk in chunks]
+    batch = ChunkBatch.from_documents(chunks)
+
+    dict_bytes = sum(sys.getsizeof(d) + sys.getsizeof(d["metadata"]) + sys.getsizeof(d["page_content"]) for d in as_dicts)
+    print(f"{len(batch)} chunks: {dict_bytes / 1e6:.1f} MB as dicts, {batch.nbytes / 1e6:.1f} MB as a ChunkBatch")
+    print(f"Interned metadata dicts: {len(batch._metadatas)}")
+
+    chunk = batch[3]
+    print(f"Chunk: {chunk.page_content[:30]!r}... metadata={chunk['metadata']}")
+    print(f"Dict view: {dict(chunk)['metadata']}, equal to the dict: {chunk == as_dicts[3]}")
+    print(f"Slice of 2: {[c.chunk_number for c in batch[5:7]]}")
@@ -1,26 +1,45 @@
-from typing import List, Dict, Union
+import codecs
+import re
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, BinaryIO, Iterator, List, Mapping, Optional, TextIO, Union
 
-# 重新定义 Document 类型以保持一致
-Document = Dict[str, Union[str, Dict]]
+from core.config import TOKENIZER_ENCODING, CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS
+
+from .schema import Chunk, Document, as_document
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算一段文本的 token 数量，无需加载分词器。
+
+    中日韩 (CJK) 字符大约每个字符一个 token，其他字符大约每 4 个字符一个 token。
+
+    Args:
+        text (str): 要估算的文本。
+
+    Returns:
+        int: 估算的 token 数量 (至少为 1)。
+    """
+    cjk = sum(1 for ch in text if "\u3000" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af" or "\uff00" <= ch <= "\uffef")
+    return max(1, cjk + (len(text) - cjk + 3) // 4)
 
 def split_text_by_character(document: Document, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
     """
     将单个文档的文本内容按字符分割成多个块 (chunks)。
 
     Args:
-        document (Document): 包含 "page_content" 和 "metadata" 的文档字典。
+        document (Document): 要分割的文档 (也可以是包含 "page_content" 和 "metadata" 的字典)。
         chunk_size (int): 每个块的最大字符数。
         chunk_overlap (int): 相邻块之间的重叠字符数。
 
     Returns:
-        List[Document]: 一个由分割后的文本块组成的文档列表。
-                         每个块都继承了原始文档的元数据。
+        List[Document]: 一个由分割后的文本块 (Chunk) 组成的文档列表。
+                         所有块共享原始文档的元数据，不会为每个块复制一份。
     """
-    if not isinstance(document, dict) or "page_content" not in document:
-        raise ValueError("Input must be a Document dictionary with a 'page_content' key.")
-
-    text = document["page_content"]
-    metadata = document["metadata"]
+    document = as_document(document)
+    text = document.page_content
+    metadata = document.metadata
     
     if len(text) <= chunk_size:
         return [document]
@@ -32,14 +51,8 @@ def split_text_by_character(document: Document, chunk_size: int = 1000, chunk_ov
         end_index = start_index + chunk_size
         chunk_text = text[start_index:end_index]
         
-        # 为了区分每个 chunk，我们可以在 metadata 中添加一些信息
-        chunk_metadata = metadata.copy()
-        chunk_metadata["chunk_number"] = len(chunks) + 1
-        
-        chunks.append({
-            "page_content": chunk_text,
-            "metadata": chunk_metadata
-        })
+        # 为了区分每个 chunk，块的编号记录在 Chunk 上，其 metadata 中会包含 chunk_number
+        chunks.append(Chunk(chunk_text, metadata, chunk_number=len(chunks) + 1))
         
         # 如果已经到达文本末尾，则退出循环
         if end_index >= len(text):
@@ -50,6 +63,292 @@ def split_text_by_character(document: Document, chunk_size: int = 1000, chunk_ov
 
     return chunks
 
+def iter_text_chunks(
+    source: Union[str, Path, TextIO, BinaryIO],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    metadata: Optional[Mapping[str, Any]] = None,
+    encoding: str = "utf-8",
+    read_size: int = 1 << 16,
+) -> Iterator[Chunk]:
+    """
+    以生成器方式流式分割文本，内存占用为 O(chunk_size)，与文件大小无关。
+
+    与 `split_text_by_character` 的分割方式相同 (固定大小的字符窗口，相邻块重叠
+    `chunk_overlap` 个字符)，但不会一次性读入整个文件。二进制流 (包括 `mmap`) 通过
+    增量解码器读取，因此多字节 UTF-8 字符跨越读取边界时也能正确处理。
+
+    Args:
+        source (Union[str, Path, TextIO, BinaryIO]): 文件路径，或一个文本/二进制流 (例如 mmap)。
+        chunk_size (int): 每个块的最大字符数。
+        chunk_overlap (int): 相邻块之间的重叠字符数。
+        metadata (Optional[Mapping[str, Any]]): 源元数据。传入路径时默认为 {"source": 路径}。
+        encoding (str): 二进制流和文件的编码。
+        read_size (int): 每次从流中读取的大小。
+
+    Yields:
+        Chunk: 带有偏移量 (start_index, end_index，左闭右开) 和共享的只读源元数据的文本块。
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size.")
+
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        if not path.is_file():
+            raise FileNotFoundError(f"File not found at: {path}")
+        with open(path, "r", encoding=encoding) as f:
+            yield from iter_text_chunks(
+                f, chunk_size, chunk_overlap,
+                metadata=metadata if metadata is not None else {"source": str(path)},
+                encoding=encoding, read_size=read_size,
+            )
+        return
+
+    shared_metadata = MappingProxyType(dict(metadata or {}))
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    def read() -> str:
+        while True:
+            data = source.read(read_size)
+            if not isinstance(data, (bytes, bytearray, memoryview)):
+                return data
+            # 多字节字符可能被截断在两次读取之间，增量解码器会保留不完整的字节
+            text = decoder.decode(bytes(data), final=not data)
+            if text or not data:
+                return text
+
+    buffer = ""       # 从 buffer_start 开始的文本，start 之前的部分已经消费
+    buffer_start = 0
+    start = 0
+    chunk_number = 0
+    eof = False
+    step = chunk_size - chunk_overlap
+
+    while True:
+        # 保证缓冲区覆盖 [start, start + chunk_size]，多读一个字符以判断是否到达末尾
+        while not eof and buffer_start + len(buffer) <= start + chunk_size:
+            data = read()
+            if not data:
+                eof = True
+                break
+            buffer += data
+
+        chunk_text = buffer[start - buffer_start:start - buffer_start + chunk_size]
+        if not chunk_text and chunk_number > 0:
+            break
+
+        chunk_number += 1
+        end = start + len(chunk_text)
+        yield Chunk(chunk_text, shared_metadata, chunk_number=chunk_number, start_index=start, end_index=end)
+
+        # 如果已经到达文本末尾，则退出循环
+        if eof and end >= buffer_start + len(buffer):
+            break
+
+        # 下一个块的起始位置要考虑重叠。已经不再需要的文本只在超过 read_size 时才丢弃，
+        # 避免每个块都复制一遍整个缓冲区
+        start += step
+        if start - buffer_start > read_size:
+            buffer = buffer[start - buffer_start:]
+            buffer_start = start
+
+# 句子结束位置: 中英文句末标点 (及其后的引号/括号)、英文句点后接空白，或换行；句末的空白归属于该句
+_SENTENCE_END = re.compile(r"(?:[。！？；!?;…]+[”’」』）)\]\"']*|\.(?=\s)|\n)\s*")
+
+def split_sentences(text: str) -> List[str]:
+    """
+    将文本切分为句子。所有句子依次拼接后与原文完全相同。
+
+    Args:
+        text (str): 要切分的文本。
+
+    Returns:
+        List[str]: 句子列表 (段落之间的换行归属于前一句)。
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() > start:
+            sentences.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str = TOKENIZER_ENCODING):
+    """
+    加载并缓存 tiktoken 分词器。
+
+    未安装 tiktoken、编码名为空或编码文件无法下载时返回 None，此时 token 数由
+    `estimate_tokens` 估算。
+
+    Args:
+        encoding_name (str): tiktoken 编码名，例如 "cl100k_base"。
+
+    Returns:
+        tiktoken.Encoding 或 None。
+    """
+    if not encoding_name:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        print(f"Tokenizer '{encoding_name}' is not available ({e}). Falling back to estimated token counts.")
+        return None
+
+def _token_length(text: str, encoding_name: str) -> int:
+    tokenizer = get_tokenizer(encoding_name)
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+@lru_cache(maxsize=1 << 16)
+def count_tokens(text: str, encoding_name: str = TOKENIZER_ENCODING) -> int:
+    """
+    计算文本的 token 数。结果按文本缓存，重复出现的句子 (页眉、模板段落等) 只分词一次。
+
+    Args:
+        text (str): 要计算的文本。
+        encoding_name (str): tiktoken 编码名。
+
+    Returns:
+        int: token 数量。
+    """
+    return _token_length(text, encoding_name)
+
+def _split_by_tokens(text: str, max_tokens: int, encoding_name: str) -> List[str]:
+    """
+    将超过 token 预算的长句按字符切开，每段取不超过预算的最长前缀 (二分查找)。
+    """
+    pieces = []
+    while _token_length(text, encoding_name) > max_tokens:
+        low, high = 1, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if _token_length(text[:mid], encoding_name) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        pieces.append(text[:low])
+        text = text[low:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding_name: str = TOKENIZER_ENCODING) -> str:
+    """
+    截取文本中不超过 token 预算的最长前缀，并尽量在句子边界处截断。
+
+    Args:
+        text (str): 要截取的文本。
+        max_tokens (int): token 预算。
+        encoding_name (str): tiktoken 编码名。
+
+    Returns:
+        str: 截取后的文本；预算不大于 0 时返回空字符串。
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, encoding_name) <= max_tokens:
+        return text
+
+    kept, used = [], 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence, encoding_name)
+        if used + tokens > max_tokens:
+            # 第一句就超出预算时，按字符截取其前缀
+            if not kept:
+                kept.append(_split_by_tokens(sentence, max_tokens, encoding_name)[0])
+            break
+        kept.append(sentence)
+        used += tokens
+    return "".join(kept)
+
+def split_text_by_tokens(
+    document: Document,
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+    encoding_name: str = TOKENIZER_ENCODING,
+) -> List[Document]:
+    """
+    按 token 预算将文档分割成块，在句子或段落边界处断开。
+
+    句子按顺序贪心地装入每个块，直到再加一句就会超过 `chunk_size` 个 token；单句超过
+    预算时才会在句中切开。相邻块重叠前一块末尾的若干完整句子，其 token 总数不超过
+    `chunk_overlap` (为 0 时不重叠，重叠部分不会被重复嵌入)。
+
+    Args:
+        document (Document): 要分割的文档 (也可以是包含 "page_content" 和 "metadata" 的字典)。
+        chunk_size (int): 每个块的最大 token 数。
+        chunk_overlap (int): 相邻块之间最多重叠的 token 数。
+        encoding_name (str): 用于计数的 tiktoken 编码名。
+
+    Returns:
+        List[Document]: 分割后的文本块 (Chunk)。元数据中额外包含 chunk_number、start_index、
+                         end_index 和 token_count。
+    """
+    document = as_document(document)
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size.")
+
+    text = document.page_content
+    metadata = document.metadata
+
+    # 1. 切分为不超过预算的单元 (start, end, token 数)
+    units = []
+    offset = 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence, encoding_name)
+        pieces = [sentence] if tokens <= chunk_size else _split_by_tokens(sentence, chunk_size, encoding_name)
+        for piece in pieces:
+            units.append((offset, offset + len(piece), tokens if len(pieces) == 1 else count_tokens(piece, encoding_name)))
+            offset += len(piece)
+
+    if not units:
+        return [document]
+
+    # 2. 贪心装箱
+    chunks = []
+    first = 0
+    while first < len(units):
+        last = first
+        total = 0
+        while last < len(units) and total + units[last][2] <= chunk_size:
+            total += units[last][2]
+            last += 1
+
+        # 句子拼接后的 token 数可能与逐句之和不同，以整块的实际计数为准
+        chunk_text = text[units[first][0]:units[last - 1][1]]
+        token_count = _token_length(chunk_text, encoding_name)
+        while token_count > chunk_size and last - first > 1:
+            last -= 1
+            chunk_text = text[units[first][0]:units[last - 1][1]]
+            token_count = _token_length(chunk_text, encoding_name)
+
+        chunks.append(Chunk(
+            chunk_text,
+            metadata,
+            chunk_number=len(chunks) + 1,
+            start_index=units[first][0],
+            end_index=units[last - 1][1],
+            token_count=token_count,
+        ))
+
+        if last >= len(units):
+            break
+
+        # 下一个块从末尾若干完整句子开始，以保证重叠不超过 chunk_overlap 且总能向前推进
+        next_first = last
+        overlap = 0
+        while next_first - 1 > first and overlap + units[next_first - 1][2] <= chunk_overlap:
+            next_first -= 1
+            overlap += units[next_first][2]
+        first = next_first
+
+    return chunks
+
 # --- 使用示例 ---
 if __name__ == '__main__':
     # 1. 创建一个示例文本
@@ -95,3 +394,11 @@ if __name__ == '__main__':
     custom_chunks = split_text_by_character(sample_doc, chunk_size=500, chunk_overlap=50)
     print(f"Number of chunks created: {len(custom_chunks)}")
     print(f"Length of first chunk: {len(custom_chunks[0]['page_content'])}")
+
+    # 4. 按 token 预算分割，并比较两种方式需要嵌入的 token 总数
+    print(f"\n--- Splitting by tokens (chunk_size={CHUNK_SIZE_TOKENS}, chunk_overlap={CHUNK_OVERLAP_TOKENS}) ---")
+    token_chunks = split_text_by_tokens(sample_doc)
+    print(f"Number of chunks created: {len(token_chunks)}")
+    print(f"Metadata of first chunk: {token_chunks[0]['metadata']}")
+    print(f"Embedding tokens (character splitter): {sum(count_tokens(c['page_content']) for c in chunks)}")
+    print(f"Embedding tokens (token splitter): {sum(c['metadata']['token_count'] for c in token_chunks)}")
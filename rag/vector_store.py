@@ -1,18 +1,500 @@
-import chromadb
-from typing import List, Dict, Union
-from core.model_provider import embedding_model
+from __future__ import annotations
 
-# Define Document type
-Document = Dict[str, Union[str, Dict]]
+import asyncio
+import hashlib
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, List, Dict, Union, Optional, Iterable, Iterator, Tuple
+from core.config import (
+    EMBEDDING_BATCH_TOKENS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    VECTOR_STORE_BACKEND,
+    BM25_INDEX_ENABLED,
+    DEDUP_ENABLED,
+    MMR_FETCH_K,
+    MMR_LAMBDA,
+)
+from core import registry
+from core.metrics import count_retry
+from .ann_index import IVFVectorIndex, build_ivf_index
+from .bm25_index import BM25Index, build_bm25_index, reciprocal_rank_fusion
+from .dedup import ChunkDeduplicator
+from .mmr import maximal_marginal_relevance
+from .numpy_store import NumpyVectorIndex, build_numpy_index, index_path
+from .quantization import QUANTIZATION_MODES, QuantizedVectorIndex, build_quantized_index
+from .schema import ChunkBatch, Document, as_document
+from .text_splitter import estimate_tokens
 
-# Initialize ChromaDB client
-# Using persistent storage
-client = chromadb.PersistentClient(path="chroma_db")
+if TYPE_CHECKING:
+    import chromadb
+
+def create_client() -> chromadb.ClientAPI:
+    """
+    Opens the persistent ChromaDB client.
+
+    Use `registry.get("chroma_client")` rather than calling this directly, so the
+    client is opened once, on first use.
+    """
+    # chromadb is slow to import, and the numpy/ivf/int8/pq backends only need it to ingest
+    import chromadb
+
+    return chromadb.PersistentClient(path="chroma_db")
+
+def __getattr__(name: str):
+    # Keeps `from rag.vector_store import client` working
+    if name == "client":
+        return registry.get("chroma_client")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_collection(collection_name: str, backend: str = VECTOR_STORE_BACKEND):
+    """
+    Returns the collection to retrieve from, using the configured retrieval backend.
+
+    ChromaDB is always the store that ingestion writes to. With the "numpy", "ivf",
+    "int8" or "pq" backends, retrieval runs against the memory-mapped index exported
+    from it instead.
+
+    Args:
+        collection_name (str): The name of the collection.
+        backend (str): "chroma", "numpy", "ivf", "int8" or "pq".
+
+    Returns:
+        A chromadb.Collection, a NumpyVectorIndex, an IVFVectorIndex or a QuantizedVectorIndex.
+
+    Raises:
+        ValueError: If the backend is unknown or the collection does not exist.
+    """
+    if backend == "chroma":
+        from chromadb.errors import NotFoundError
+
+        try:
+            return registry.get("chroma_client").get_collection(name=collection_name)
+        except NotFoundError as e:
+            # Older chromadb versions raised ValueError here; keep that contract
+            raise ValueError(str(e)) from e
+    if backend == "numpy":
+        return NumpyVectorIndex(index_path(collection_name))
+    if backend == "ivf":
+        return IVFVectorIndex(index_path(collection_name))
+    if backend in QUANTIZATION_MODES:
+        return QuantizedVectorIndex(index_path(collection_name), backend)
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+VERSION_FILE = "version"
+
+def collection_version(collection_name: str) -> str:
+    """
+    Returns a token that changes whenever the chunks of a collection change.
+
+    Caches derived from a collection (e.g. the semantic answer cache) compare this
+    token to detect that their entries are stale.
+    """
+    try:
+        return (index_path(collection_name) / VERSION_FILE).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return ""
+
+def bump_collection_version(collection_name: str) -> str:
+    """
+    Records that the chunks of a collection changed and returns the new version token.
+    """
+    path = index_path(collection_name)
+    path.mkdir(parents=True, exist_ok=True)
+    version = uuid.uuid4().hex
+    tmp_file = path / (VERSION_FILE + ".tmp")
+    tmp_file.write_text(version, encoding="utf-8")
+    os.replace(tmp_file, path / VERSION_FILE)
+    return version
+
+def get_bm25_index(collection_name: str) -> BM25Index:
+    """
+    Returns the BM25 index that was built for a collection at ingest time.
+
+    Raises:
+        ValueError: If the collection has no BM25 index.
+    """
+    return BM25Index(index_path(collection_name))
+
+def get_deduplicator(collection: chromadb.Collection) -> ChunkDeduplicator:
+    """
+    Returns the near-duplicate detector of a collection, with its alias table.
+
+    The saved signatures are reused if they still cover every stored chunk. Otherwise
+    (first run, or chunks were added without dedup) the stored chunks are signed again.
+    Save it with `deduplicator.save(index_path(collection.name))` after ingestion.
+    """
+    try:
+        deduplicator = ChunkDeduplicator.load(index_path(collection.name))
+        if len(deduplicator) == collection.count():
+            return deduplicator
+        aliases = deduplicator.aliases
+    except ValueError:
+        aliases = None
+    return ChunkDeduplicator.from_collection(collection, aliases=aliases)
+
+def refresh_index(collection: chromadb.Collection, backend: str = VECTOR_STORE_BACKEND) -> None:
+    """
+    Rebuilds the indexes that are kept outside ChromaDB after the collection changed:
+    the vector index of the "numpy"/"ivf"/"int8"/"pq" backends and the BM25 index.
+
+    Every call rebuilds the indexes and bumps the collection version, which drops the
+    cached answers, so callers skip it when nothing was added, updated or deleted.
+    """
+    if backend in ("numpy", "ivf") + QUANTIZATION_MODES:
+        path = build_numpy_index(collection)
+        if backend == "ivf":
+            build_ivf_index(path)
+        elif backend in QUANTIZATION_MODES:
+            build_quantized_index(path, backend)
+    if BM25_INDEX_ENABLED:
+        build_bm25_index(collection, index_path(collection.name))
+    bump_collection_version(collection.name)
+
+def chunk_ids(documents: List[Document], occurrences: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Derives a deterministic ID for every chunk from its source and a hash of its content.
+
+    The same chunk always gets the same ID, so re-ingesting a document only touches
+    the chunks that actually changed. Identical chunks within one source are told
+    apart by an occurrence counter.
+
+    Args:
+        documents (List[Document]): The complete list of chunks of one or more documents.
+        occurrences (Optional[Dict[str, int]]): The occurrence counters to continue from,
+            when the chunks of a document are processed in several batches.
+
+    Returns:
+        List[str]: One ID per chunk, in the same order.
+    """
+    ids = []
+    if occurrences is None:
+        occurrences = {}
+    for doc in documents:
+        doc = as_document(doc)
+        source = doc.get_metadata("source", "")
+        content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:32]
+        base_id = f"{source}::{content_hash}"
+
+        count = occurrences.get(base_id, 0)
+        occurrences[base_id] = count + 1
+        ids.append(base_id if count == 0 else f"{base_id}::{count}")
+    return ids
+
+def token_batches(documents: List[Document], max_tokens: int = EMBEDDING_BATCH_TOKENS, max_size: int = EMBEDDING_BATCH_SIZE) -> Iterator[Tuple[int, int]]:
+    """
+    Groups consecutive documents into batches that fit a token budget.
+
+    A single document larger than the budget gets a batch of its own.
+
+    Args:
+        documents (List[Document]): The documents to group.
+        max_tokens (int): The (estimated) token budget of one batch.
+        max_size (int): The maximum number of documents in one batch.
+
+    Yields:
+        Tuple[int, int]: The (start, end) indices of each batch.
+    """
+    start, tokens = 0, 0
+    for i, doc in enumerate(documents):
+        doc_tokens = estimate_tokens(doc.page_content)
+        if i > start and (tokens + doc_tokens > max_tokens or i - start >= max_size):
+            yield start, i
+            start, tokens = i, 0
+        tokens += doc_tokens
+    if start < len(documents):
+        yield start, len(documents)
+
+def _embed_with_retry(texts: List[str], max_retries: int) -> List[List[float]]:
+    """
+    Embeds one batch, retrying failures with exponential backoff.
+
+    If the provider rejects the request itself (HTTP 400/413, e.g. payload too
+    large), the batch is split in half and each half is embedded separately.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return registry.get("embedding_model").embed_documents(texts)
+        except Exception as e:
+            if getattr(e, "status_code", None) in (400, 413) and len(texts) > 1:
+                middle = len(texts) // 2
+                return _embed_with_retry(texts[:middle], max_retries) + _embed_with_retry(texts[middle:], max_retries)
+            if attempt == max_retries:
+                raise
+            count_retry("embedding")
+            time.sleep(2 ** attempt + random.random())
+
+def embed_and_store(
+    collection: chromadb.Collection,
+    documents: Union[List[Document], ChunkBatch],
+    ids: List[str],
+    max_tokens: int = EMBEDDING_BATCH_TOKENS,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+) -> int:
+    """
+    Embeds documents in token-budgeted batches on a thread pool and stores them.
+
+    Up to `concurrency` batches are embedded at once, and every batch is written to
+    the collection as soon as its embeddings arrive.
+
+    Args:
+        collection (chromadb.Collection): The collection to write to.
+        documents (Union[List[Document], ChunkBatch]): The document chunks to embed.
+            They are packed into a ChunkBatch while the requests are in flight.
+        ids (List[str]): The chunk IDs, in the same order.
+        max_tokens (int): The (estimated) token budget of one embedding request.
+        concurrency (int): The number of embedding requests in flight.
+        max_retries (int): How often a failed batch is retried.
+
+    Returns:
+        int: The number of chunks that were stored.
+    """
+    if not isinstance(documents, ChunkBatch):
+        documents = ChunkBatch.from_documents(documents)
+    batches = list(token_batches(documents, max_tokens=max_tokens))
+    stored = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as pool:
+        futures = {
+            pool.submit(_embed_with_retry, documents[start:end].texts(), max_retries): (start, end)
+            for start, end in batches
+        }
+        # Writes happen on this thread only, in the order the batches finish
+        for future in as_completed(futures):
+            start, end = futures[future]
+            batch = documents[start:end]
+            collection.upsert(
+                embeddings=future.result(),
+                documents=batch.texts(),
+                metadatas=batch.metadatas(),
+                ids=ids[start:end]
+            )
+            stored += len(batch)
+    return stored
+
+def add_documents(
+    collection: chromadb.Collection,
+    documents: List[Document],
+    ids: Optional[List[str]] = None,
+    deduplicator: Optional[ChunkDeduplicator] = None,
+) -> Dict[str, int]:
+    """
+    Vectorizes a batch of document chunks and adds them to an existing collection.
+
+    Chunks that are already stored under the same ID are not embedded again; only
+    their metadata is updated if it changed. This is the building block for
+    streaming ingestion: the caller keeps one collection open and feeds it batches
+    of chunks as they become available.
+
+    Args:
+        collection (chromadb.Collection): The collection to add the chunks to.
+        documents (List[Document]): The document chunks to vectorize and store.
+        ids (Optional[List[str]]): The chunk IDs. Computed with `chunk_ids` if not given.
+        deduplicator (Optional[ChunkDeduplicator]): If given, new chunks that nearly
+            duplicate a stored chunk are recorded as its aliases instead of being embedded.
+
+    Returns:
+        Dict[str, int]: The number of chunks that were "added", "updated", "skipped"
+        and recorded as "duplicates".
+    """
+    embedding_model = registry.get("embedding_model")
+    if not embedding_model:
+        raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+
+    result = {"added": 0, "updated": 0, "skipped": 0, "duplicates": 0}
+    if not documents:
+        return result
+    documents = [as_document(doc) for doc in documents]
+    if ids is None:
+        ids = chunk_ids(documents)
+
+    # Look up which chunks are already stored
+    existing = collection.get(ids=ids, include=["metadatas"])
+    stored_metadatas = dict(zip(existing["ids"], existing["metadatas"]))
+
+    new_docs, new_ids = [], []
+    changed_metadatas, changed_ids = [], []
+    for chunk_id, doc in zip(ids, documents):
+        if chunk_id not in stored_metadatas:
+            new_docs.append(doc)
+            new_ids.append(chunk_id)
+        else:
+            metadata = doc.metadata
+            if stored_metadatas[chunk_id] != metadata:
+                changed_metadatas.append(metadata)
+                changed_ids.append(chunk_id)
+
+    # Near duplicates are detected before anything is embedded
+    duplicates = 0
+    if deduplicator is not None:
+        unique_docs, unique_ids = [], []
+        for chunk_id, doc in zip(new_ids, new_docs):
+            if chunk_id in deduplicator.aliases:
+                deduplicator.aliases[chunk_id]["metadata"] = doc.metadata
+            elif deduplicator.check(chunk_id, doc) is None:
+                unique_docs.append(doc)
+                unique_ids.append(chunk_id)
+            else:
+                duplicates += 1
+        new_docs, new_ids = unique_docs, unique_ids
+
+    if new_docs:
+        embed_and_store(collection, new_docs, new_ids)
+
+    if changed_ids:
+        collection.update(ids=changed_ids, metadatas=changed_metadatas)
+
+    if new_ids or changed_ids:
+        bump_collection_version(collection.name)
+
+    result["added"] = len(new_ids)
+    result["updated"] = len(changed_ids)
+    result["duplicates"] = duplicates
+    result["skipped"] = len(ids) - len(new_ids) - len(changed_ids) - duplicates
+    return result
+
+def delete_stale_chunks(
+    collection: chromadb.Collection,
+    source: str,
+    keep_ids: Iterable[str],
+    deduplicator: Optional[ChunkDeduplicator] = None,
+) -> Dict[str, int]:
+    """
+    Deletes the chunks of `source` that are not in `keep_ids`.
+
+    Used when a document is re-ingested: chunks that no longer exist in the new
+    version (e.g. because the document shrank or changed) are removed.
+
+    Args:
+        collection (chromadb.Collection): The collection to clean up.
+        source (str): The source whose chunks should be checked.
+        keep_ids (Iterable[str]): The IDs of the current chunks of the source.
+        deduplicator (Optional[ChunkDeduplicator]): If given, stale aliases of the
+            source are dropped as well, and aliases of other sources whose canonical
+            chunk was deleted are stored in its place.
+
+    Returns:
+        Dict[str, int]: The number of chunks (including aliases) that were "deleted",
+        and the "added", "updated", "skipped" and "duplicates" counts of storing the
+        orphaned aliases.
+    """
+    result = {"added": 0, "updated": 0, "skipped": 0, "duplicates": 0, "deleted": 0}
+    keep = set(keep_ids)
+    stored = collection.get(where={"source": source}, include=[])
+    stale_ids = [chunk_id for chunk_id in stored["ids"] if chunk_id not in keep]
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        bump_collection_version(collection.name)
+    result["deleted"] = len(stale_ids)
+
+    if deduplicator is None:
+        return result
+
+    stale_aliases = [alias_id for alias_id in deduplicator.aliases_from(source) if alias_id not in keep]
+    result["deleted"] += len(stale_aliases)
+    orphans = deduplicator.remove(stale_ids + stale_aliases)
+    if orphans:
+        # The orphaned aliases are embedded and stored like new chunks
+        orphan_result = add_documents(collection, [doc for _, doc in orphans], [alias_id for alias_id, _ in orphans], deduplicator)
+        for key, count in orphan_result.items():
+            result[key] += count
+    return result
+
+def index_documents(
+    collection: chromadb.Collection,
+    documents: List[Document],
+    deduplicator: Optional[ChunkDeduplicator] = None,
+) -> Dict[str, int]:
+    """
+    Incrementally (re-)indexes the complete chunk lists of one or more documents.
+
+    New or changed chunks are embedded and stored, unchanged chunks are skipped
+    and chunks of the same sources that no longer exist are deleted.
+
+    Args:
+        collection (chromadb.Collection): The collection to index into.
+        documents (List[Document]): All chunks of the documents being indexed.
+        deduplicator (Optional[ChunkDeduplicator]): The near-duplicate detector, if any.
+
+    Returns:
+        Dict[str, int]: The number of chunks that were "added", "updated", "skipped",
+        recorded as "duplicates" and "deleted". Orphaned aliases that were stored in
+        place of deleted chunks count as added.
+    """
+    documents = [as_document(doc) for doc in documents]
+    ids = chunk_ids(documents)
+
+    ids_by_source: Dict[str, set] = {}
+    for chunk_id, doc in zip(ids, documents):
+        ids_by_source.setdefault(doc.get_metadata("source", ""), set()).add(chunk_id)
+
+    result = {"added": 0, "updated": 0, "skipped": 0, "duplicates": 0, "deleted": 0}
+    for source, keep_ids in ids_by_source.items():
+        for key, count in delete_stale_chunks(collection, source, keep_ids, deduplicator).items():
+            result[key] += count
+    for key, count in add_documents(collection, documents, ids, deduplicator).items():
+        result[key] += count
+    return result
+
+def index_document_stream(
+    collection: chromadb.Collection,
+    documents: Iterable[Document],
+    batch_size: int = 256,
+    deduplicator: Optional[ChunkDeduplicator] = None,
+) -> Dict[str, int]:
+    """
+    Incrementally (re-)indexes a stream of chunks, e.g. from `iter_text_chunks`.
+
+    Works like `index_documents`, but only holds `batch_size` chunks in memory at a
+    time. Stale chunks of the streamed sources are deleted once the stream ends.
+
+    Args:
+        collection (chromadb.Collection): The collection to index into.
+        documents (Iterable[Document]): All chunks of the documents being indexed, in order.
+        batch_size (int): The number of chunks per `add_documents` call.
+        deduplicator (Optional[ChunkDeduplicator]): The near-duplicate detector, if any.
+
+    Returns:
+        Dict[str, int]: The number of chunks that were "added", "updated", "skipped",
+        recorded as "duplicates" and "deleted".
+    """
+    result = {"added": 0, "updated": 0, "skipped": 0, "duplicates": 0, "deleted": 0}
+    occurrences: Dict[str, int] = {}
+    ids_by_source: Dict[str, set] = {}
+
+    def flush(batch: List[Document]) -> None:
+        ids = chunk_ids(batch, occurrences)
+        for chunk_id, doc in zip(ids, batch):
+            ids_by_source.setdefault(doc.get_metadata("source", ""), set()).add(chunk_id)
+        for key, count in add_documents(collection, batch, ids, deduplicator).items():
+            result[key] += count
+
+    batch: List[Document] = []
+    for doc in documents:
+        batch.append(as_document(doc))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    for source, keep_ids in ids_by_source.items():
+        for key, count in delete_stale_chunks(collection, source, keep_ids, deduplicator).items():
+            result[key] += count
+    return result
 
 def create_vector_store(documents: List[Document], collection_name: str = "default_collection") -> chromadb.Collection:
     """
     Creates a vector store, vectorizes the documents, and stores them.
 
+    Chunks get deterministic IDs, so calling this again with an updated version of
+    the same documents only embeds what changed. With DEDUP_ENABLED, near-duplicate
+    chunks are recorded as aliases instead of being embedded.
+
     Args:
         documents (List[Document]): A list of document chunks to process.
         collection_name (str): The name of the collection to create in ChromaDB.
@@ -20,69 +502,332 @@ def create_vector_store(documents: List[Document], collection_name: str = "defau
     Returns:
         chromadb.Collection: The created or retrieved collection object.
     """
+    embedding_model = registry.get("embedding_model")
     if not embedding_model:
         raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
 
     # Get or create a collection
-    collection = client.get_or_create_collection(name=collection_name)
-
-    # Prepare data for the collection
-    ids = [f"doc_{i}" for i in range(len(documents))]
-    contents = [doc["page_content"] for doc in documents]
-    metadatas = [doc["metadata"] for doc in documents]
-
-    # Use the OpenAIEmbeddings model to create embeddings in batches
-    print(f"Creating embeddings for {len(contents)} documents...")
-    embeddings = embedding_model.embed_documents(contents)
-    print("Embeddings created successfully.")
-
-    # Add data to the collection
-    collection.add(
-        embeddings=embeddings,
-        documents=contents,
-        metadatas=metadatas,
-        ids=ids
+    collection = registry.get("chroma_client").get_or_create_collection(name=collection_name)
+
+    deduplicator = get_deduplicator(collection) if DEDUP_ENABLED else None
+
+    print(f"Indexing {len(documents)} documents...")
+    result = index_documents(collection, documents, deduplicator)
+    print(
+        f"Indexing complete: {result['added']} added, {result['updated']} updated, "
+        f"{result['skipped']} unchanged, {result['duplicates']} duplicates, {result['deleted']} deleted."
     )
+    if deduplicator is not None:
+        deduplicator.save(index_path(collection.name))
+        print(f"Dedup stats: {deduplicator.stats()}")
+    if result["added"] or result["updated"] or result["deleted"]:
+        refresh_index(collection)
     
     return collection
 
-def search_vector_store(query: str, collection: chromadb.Collection, n_results: int = 3) -> List[Document]:
+def search_vector_store(
+    query: str,
+    collection: chromadb.Collection,
+    n_results: int = 3,
+    search_params: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[List[float]] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
     """
     Performs a similarity search in the vector store.
 
     Args:
         query (str): The user's query string.
-        collection (chromadb.Collection): The collection to search in.
+        collection (chromadb.Collection): The collection to search in (or a NumpyVectorIndex/IVFVectorIndex).
         n_results (int): The number of results to return.
+        search_params (Optional[Dict[str, Any]]): Backend-specific query parameters,
+            e.g. {"nprobe": 16} for an IVFVectorIndex.
+        query_embedding (Optional[List[float]]): The embedding of the query, if the
+            caller already has it.
+        where (Optional[Dict[str, Any]]): A Chroma-style metadata filter, e.g.
+            {"source": "handbook.pdf"}, evaluated by the store before ranking.
 
     Returns:
         List[Document]: A list of documents containing the search results.
     """
-    if not embedding_model:
-        raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+    if query_embedding is None:
+        embedding_model = registry.get("embedding_model")
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
 
-    # Vectorize the query text
-    query_embedding = embedding_model.embed_query(query)
+        # Vectorize the query text
+        query_embedding = embedding_model.embed_query(query)
 
     # Perform the query in the collection
     results = collection.query(
         query_embeddings=[query_embedding],
-        n_results=n_results
+        n_results=n_results,
+        **_where_params(where),
+        **(search_params or {})
     )
 
     # Format the results into a list of Documents
+    return _format_query_results(results, 0)
+
+async def asearch_vector_store(
+    query: str,
+    collection: chromadb.Collection,
+    n_results: int = 3,
+    search_params: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[List[float]] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
+    """
+    Async `search_vector_store`.
+
+    The query is embedded with the async embedding API, and the blocking collection
+    query runs in a worker thread, so the event loop stays free while waiting.
+
+    Args:
+        query (str): The user's query string.
+        collection (chromadb.Collection): The collection to search in (or a NumpyVectorIndex/IVFVectorIndex).
+        n_results (int): The number of results to return.
+        search_params (Optional[Dict[str, Any]]): Backend-specific query parameters.
+        query_embedding (Optional[List[float]]): The embedding of the query, if the
+            caller already has it.
+        where (Optional[Dict[str, Any]]): A Chroma-style metadata filter, e.g.
+            {"source": "handbook.pdf"}, evaluated by the store before ranking.
+
+    Returns:
+        List[Document]: A list of documents containing the search results.
+    """
+    if query_embedding is None:
+        embedding_model = registry.get("embedding_model")
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+        query_embedding = await embedding_model.aembed_query(query)
+
+    results = await asyncio.to_thread(
+        collection.query,
+        query_embeddings=[query_embedding],
+        n_results=n_results,
+        **_where_params(where),
+        **(search_params or {})
+    )
+    return _format_query_results(results, 0)
+
+def mmr_search_vector_store(
+    query: str,
+    collection: chromadb.Collection,
+    n_results: int = 3,
+    fetch_k: int = MMR_FETCH_K,
+    lambda_mult: float = MMR_LAMBDA,
+    search_params: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[List[float]] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
+    """
+    Performs a similarity search and re-ranks the candidates with Maximal Marginal Relevance.
+
+    `fetch_k` candidates are fetched together with their embeddings, so the re-rank
+    needs no second round trip, and `n_results` of them are chosen to be relevant
+    but not redundant (e.g. not three overlapping windows of the same passage).
+
+    Args:
+        query (str): The user's query string.
+        collection (chromadb.Collection): The collection to search in (or a NumpyVectorIndex/IVFVectorIndex).
+        n_results (int): The number of results to return.
+        fetch_k (int): The number of candidates to re-rank.
+        lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+        search_params (Optional[Dict[str, Any]]): Backend-specific query parameters.
+        query_embedding (Optional[List[float]]): The embedding of the query, if the
+            caller already has it.
+        where (Optional[Dict[str, Any]]): A Chroma-style metadata filter, e.g.
+            {"source": "handbook.pdf"}, evaluated by the store before ranking.
+
+    Returns:
+        List[Document]: The selected documents, in MMR order.
+    """
+    if query_embedding is None:
+        embedding_model = registry.get("embedding_model")
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+        query_embedding = embedding_model.embed_query(query)
+
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=max(fetch_k, n_results),
+        include=["embeddings", "documents", "metadatas", "distances"],
+        **_where_params(where),
+        **(search_params or {})
+    )
+    candidates = _format_query_results(results, 0)
+    if not candidates:
+        return []
+
+    selected = maximal_marginal_relevance(query_embedding, results["embeddings"][0], k=n_results, lambda_mult=lambda_mult)
+    return [candidates[i] for i in selected]
+
+def _format_query_results(results: Dict[str, Any], query_index: int) -> List[Document]:
+    """
+    Turns the results of one query of a `collection.query` call into Documents.
+    """
     retrieved_docs = []
-    if results and results['documents']:
-        for i, doc_content in enumerate(results['documents'][0]):
-            retrieved_docs.append({
-                "page_content": doc_content,
-                "metadata": results['metadatas'][0][i]
-            })
+    if results and results['documents'] and query_index < len(results['documents']):
+        for i, doc_content in enumerate(results['documents'][query_index]):
+            retrieved_docs.append(Document(doc_content, results['metadatas'][query_index][i]))
             
     return retrieved_docs
 
+def search_vector_store_many(
+    queries: List[str],
+    collection: chromadb.Collection,
+    n_results: int = 3,
+    search_params: Optional[Dict[str, Any]] = None,
+    query_embeddings: Optional[List[List[float]]] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[List[Document]]:
+    """
+    Performs a similarity search for many queries at once.
+
+    All queries are embedded with a single `embed_documents` call and searched with
+    a single multi-vector `collection.query`, instead of one round-trip each.
+
+    Args:
+        queries (List[str]): The query strings.
+        collection (chromadb.Collection): The collection to search in (or a NumpyVectorIndex/IVFVectorIndex).
+        n_results (int): The number of results to return per query.
+        search_params (Optional[Dict[str, Any]]): Backend-specific query parameters.
+        query_embeddings (Optional[List[List[float]]]): The embeddings of the queries,
+            if the caller already has them.
+        where (Optional[Dict[str, Any]]): A Chroma-style metadata filter, e.g.
+            {"source": "handbook.pdf"}, evaluated by the store before ranking.
+
+    Returns:
+        List[List[Document]]: The search results of every query, in the same order.
+    """
+    if not queries:
+        return []
+    if query_embeddings is None:
+        embedding_model = registry.get("embedding_model")
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+        query_embeddings = embedding_model.embed_documents(queries)
+
+    results = collection.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        **_where_params(where),
+        **(search_params or {})
+    )
+    return [_format_query_results(results, i) for i in range(len(queries))]
+
+def _where_params(where: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # ChromaDB rejects an empty `where`, so no filter is passed at all
+    return {"where": where} if where else {}
+
+def _filtered_ids(collection: chromadb.Collection, where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+    """
+    Returns the IDs of the chunks that pass a metadata filter, or None without a filter.
+    """
+    if not where:
+        return None
+    return collection.get(where=where, include=[])["ids"]
+
+def _get_documents(collection: chromadb.Collection, ids: List[str]) -> Dict[str, Document]:
+    """
+    Fetches stored chunks by ID, without any embedding call.
+    """
+    if not ids:
+        return {}
+    results = collection.get(ids=ids, include=["documents", "metadatas"])
+    return {
+        chunk_id: Document(content, metadata)
+        for chunk_id, content, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+    }
+
+def lexical_search_vector_store(
+    query: str,
+    collection: chromadb.Collection,
+    bm25_index: BM25Index,
+    n_results: int = 3,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
+    """
+    Performs a BM25 keyword search. Needs no call to the embedding model.
+
+    Args:
+        query (str): The user's query string.
+        collection (chromadb.Collection): The collection holding the chunks.
+        bm25_index (BM25Index): The BM25 index of the collection.
+        n_results (int): The number of results to return.
+        where (Optional[Dict[str, Any]]): A Chroma-style metadata filter, e.g.
+            {"source": "handbook.pdf"}, evaluated by the store before ranking.
+
+    Returns:
+        List[Document]: A list of documents containing the search results.
+    """
+    ids = [chunk_id for chunk_id, _ in bm25_index.search(query, n_results, allowed_ids=_filtered_ids(collection, where))]
+    documents = _get_documents(collection, ids)
+    return [documents[chunk_id] for chunk_id in ids if chunk_id in documents]
+
+def hybrid_search_vector_store(
+    query: str,
+    collection: chromadb.Collection,
+    bm25_index: BM25Index,
+    n_results: int = 3,
+    fetch_k: int = 20,
+    rrf_k: int = 60,
+    search_params: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[List[float]] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
+    """
+    Combines vector and BM25 search with reciprocal rank fusion.
+
+    Both searches return `fetch_k` candidates, their rankings are fused, and the
+    top `n_results` chunks are returned. This keeps semantic matches while exact
+    identifiers, error codes and product names still rank high.
+
+    Args:
+        query (str): The user's query string.
+        collection (chromadb.Collection): The collection to search in.
+        bm25_index (BM25Index): The BM25 index of the collection.
+        n_results (int): The number of results to return.
+        fetch_k (int): The number of candidates taken from each search.
+        rrf_k (int): The RRF smoothing constant.
+        search_params (Optional[Dict[str, Any]]): Backend-specific query parameters.
+        query_embedding (Optional[List[float]]): The embedding of the query, if the
+            caller already has it.
+        where (Optional[Dict[str, Any]]): A Chroma-style metadata filter, e.g.
+            {"source": "handbook.pdf"}, evaluated by the store before ranking.
+
+    Returns:
+        List[Document]: A list of documents containing the search results.
+    """
+    if query_embedding is None:
+        embedding_model = registry.get("embedding_model")
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+        query_embedding = embedding_model.embed_query(query)
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=fetch_k,
+        **_where_params(where),
+        **(search_params or {})
+    )
+    vector_ids = results["ids"][0] if results and results["ids"] else []
+    documents = {
+        chunk_id: Document(content, metadata)
+        for chunk_id, content, metadata in zip(vector_ids, results["documents"][0], results["metadatas"][0])
+    } if vector_ids else {}
+
+    lexical_ids = [chunk_id for chunk_id, _ in bm25_index.search(query, fetch_k, allowed_ids=_filtered_ids(collection, where))]
+    fused_ids = reciprocal_rank_fusion([vector_ids, lexical_ids], k=rrf_k)[:n_results]
+
+    # Chunks found only by BM25 still need their content
+    documents.update(_get_documents(collection, [chunk_id for chunk_id in fused_ids if chunk_id not in documents]))
+    return [documents[chunk_id] for chunk_id in fused_ids if chunk_id in documents]
+
 # --- Example Usage ---
 if __name__ == '__main__':
+    embedding_model = registry.get("embedding_model")
+    client = registry.get("chroma_client")
     if not embedding_model:
         print("\nSkipping vector store example because embedding model could not be initialized.")
     else:
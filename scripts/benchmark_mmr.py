@@ -0,0 +1,52 @@
+import argparse
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add project root to sys.path to allow importing project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.mmr import maximal_marginal_relevance
+
+def benchmark(fetch_k: int, k: int, dim: int, lambda_mult: float, repeats: int, seed: int = 0) -> float:
+    """
+    Times the MMR re-rank of `fetch_k` candidates and returns the median in milliseconds.
+    """
+    rng = np.random.default_rng(seed)
+    query = rng.standard_normal(dim).astype(np.float32)
+    # Candidates are returned by the index as float32 arrays
+    candidates = (query + rng.standard_normal((fetch_k, dim))).astype(np.float32)
+
+    maximal_marginal_relevance(query, candidates, k=k, lambda_mult=lambda_mult)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        maximal_marginal_relevance(query, candidates, k=k, lambda_mult=lambda_mult)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings)), float(np.percentile(timings, 99))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the overhead of MMR re-ranking per query.")
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 50, 100, 200], help="The candidate set sizes to benchmark.")
+    parser.add_argument("-k", type=int, default=3, help="The number of results selected.")
+    parser.add_argument("--dim", type=int, default=1536, help="The embedding dimension.")
+    parser.add_argument("--lambda-mult", type=float, default=0.5, help="The MMR relevance weight.")
+    parser.add_argument("--repeats", type=int, default=1000, help="The number of timed runs per size.")
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="The median overhead allowed for fetch_k <= 100.")
+
+    args = parser.parse_args()
+
+    print(f"MMR re-rank, k={args.k}, dim={args.dim}, lambda={args.lambda_mult}")
+    print(f"{'fetch_k':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    over_budget = False
+    for fetch_k in args.fetch_k:
+        median, p99 = benchmark(fetch_k, args.k, args.dim, args.lambda_mult, args.repeats)
+        print(f"{fetch_k:>8} {median:>10.3f} {p99:>10.3f}")
+        over_budget |= fetch_k <= 100 and median > args.budget_ms
+
+    if over_budget:
+        print(f"Error: The median re-rank overhead exceeds {args.budget_ms} ms for fetch_k <= 100.")
+        sys.exit(1)
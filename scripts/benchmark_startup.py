@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+from pathlib import Path
+import sys
+
+# The project root; every import is measured in a fresh interpreter started there
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Runs in the child process: times one import and reports which shared resources it built
+_MEASURE = """
+import json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from core import registry
+print(json.dumps({{"ms": elapsed * 1000, "initialized": registry.initialized()}}))
+"""
+
+def _run(args):
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT), "PYTHONWARNINGS": "ignore"}
+    return subprocess.run([sys.executable, *args], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+
+def measure_import(module: str) -> dict:
+    """
+    Imports `module` in a new interpreter and returns {"ms": ..., "initialized": [...]}.
+    """
+    result = _run(["-c", _MEASURE.format(module=module)])
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def slowest_imports(module: str, top: int) -> list:
+    """
+    Returns the `top` (cumulative ms, module) pairs of `python -X importtime`, slowest first.
+    """
+    result = _run(["-X", "importtime", "-c", f"import {module}"])
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative) / 1000, name.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the application entry points.")
+    parser.add_argument("--modules", nargs="+", default=["mcp.orchestrator"], help="The modules to import.")
+    parser.add_argument("--repeats", type=int, default=5, help="The number of fresh interpreters per module.")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="The median import time allowed per module.")
+    parser.add_argument("--top", type=int, default=10, help="The number of slowest imports shown for a module over budget.")
+
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'p50 ms':>10} {'max ms':>10}  initialized at import")
+    failed = False
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.repeats)]
+        timings = [run["ms"] for run in runs]
+        median = statistics.median(timings)
+        initialized = sorted({name for run in runs for name in run["initialized"]})
+        print(f"{module:<28} {median:>10.1f} {max(timings):>10.1f}  {', '.join(initialized) or '-'}")
+
+        if initialized:
+            print(f"Error: Importing {module} builds {initialized}; get them from core.registry on first use instead.")
+            failed = True
+        if median > args.budget_ms:
+            print(f"Error: Importing {module} takes {median:.1f} ms, over the budget of {args.budget_ms} ms. Slowest imports:")
+            for cumulative, name in slowest_imports(module, args.top):
+                print(f"  {cumulative:>10.1f} ms  {name}")
+            failed = True
+
+    if failed:
+        sys.exit(1)
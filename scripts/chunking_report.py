@@ -0,0 +1,65 @@
+import argparse
+from pathlib import Path
+import sys
+from typing import List, Tuple
+
+# Add project root to sys.path to allow importing project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.config import CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS, TOKENIZER_ENCODING
+from rag.document_loader import load_directory, load_document
+from rag.text_splitter import count_tokens, get_tokenizer, split_text_by_character, split_text_by_tokens
+
+def parse_strategy(value: str) -> Tuple[int, int]:
+    """
+    Parses a "size:overlap" pair, e.g. "1000:200".
+    """
+    size, _, overlap = value.partition(":")
+    return int(size), int(overlap or 0)
+
+def report(documents: List[dict], char_strategies: List[Tuple[int, int]], token_strategies: List[Tuple[int, int]]) -> None:
+    """
+    Prints the number of chunks and the total embedding tokens of every chunking strategy.
+
+    "Overhead" is the share of embedding tokens spent on text that is embedded more than
+    once because of the overlap.
+    """
+    document_tokens = sum(count_tokens(doc["page_content"]) for doc in documents)
+    tokenizer = f"tiktoken '{TOKENIZER_ENCODING}'" if get_tokenizer(TOKENIZER_ENCODING) else "estimated"
+    print(f"{len(documents)} documents, {document_tokens} tokens ({tokenizer} token counts)")
+    print(f"{'strategy':<24} {'chunks':>8} {'embed tokens':>13} {'overhead':>9} {'mean tok':>9} {'max tok':>8}")
+
+    strategies = [(f"character {s}/{o}", lambda doc, s=s, o=o: split_text_by_character(doc, s, o)) for s, o in char_strategies]
+    strategies += [(f"token {s}/{o}", lambda doc, s=s, o=o: split_text_by_tokens(doc, s, o)) for s, o in token_strategies]
+
+    for name, split in strategies:
+        counts = [count_tokens(chunk["page_content"]) for doc in documents for chunk in split(doc)]
+        total = sum(counts)
+        overhead = (total - document_tokens) / total if total else 0.0
+        mean = total / len(counts) if counts else 0.0
+        print(f"{name:<24} {len(counts):>8} {total:>13} {overhead:>8.1%} {mean:>9.1f} {max(counts, default=0):>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the embedding cost of character- and token-based chunking.")
+    parser.add_argument("path", type=str, help="A document (.txt/.md/.html/.pdf) or a directory of documents.")
+    parser.add_argument("--glob", type=str, default="*.txt", help="The file pattern used in directory mode.")
+    parser.add_argument("--char", type=parse_strategy, nargs="*", default=[(1000, 200), (1000, 0)], help="Character strategies as size:overlap.")
+    parser.add_argument(
+        "--token", type=parse_strategy, nargs="*",
+        default=[(CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS), (CHUNK_SIZE_TOKENS, 0)],
+        help="Token strategies as size:overlap.",
+    )
+
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if path.is_dir():
+        documents = list(load_directory(path, glob_pattern=args.glob))
+    else:
+        documents = list(load_document(path))
+    if not documents:
+        print(f"Error: No documents found at '{args.path}'.")
+        sys.exit(1)
+
+    report(documents, args.char, args.token)
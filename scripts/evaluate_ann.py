@@ -0,0 +1,77 @@
+import argparse
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add project root to sys.path to allow importing project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.ann_index import IVFVectorIndex
+from rag.numpy_store import index_path
+from tools.rag_tool import DEFAULT_COLLECTION_NAME
+
+def load_queries(index: IVFVectorIndex, queries_file: str, n_queries: int, seed: int) -> np.ndarray:
+    """
+    Embeds the queries in `queries_file` (one per line), or samples stored chunks as queries.
+    """
+    if queries_file:
+        from core.model_provider import embedding_model
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+        lines = [line.strip() for line in Path(queries_file).read_text(encoding="utf-8").splitlines() if line.strip()]
+        return np.asarray(embedding_model.embed_documents(lines[:n_queries]), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(index.count(), min(n_queries, index.count()), replace=False))
+    return np.asarray(index.embeddings[rows], dtype=np.float32)
+
+def evaluate(index: IVFVectorIndex, queries: np.ndarray, k: int, nprobes: list) -> None:
+    """
+    Prints recall@k against exact search and per-query latency for every nprobe.
+    """
+    exact, _ = index.exact_search(queries, k)
+    exact_sets = [set(row.tolist()) for row in exact]
+
+    print(f"{len(queries)} queries, k={k}, {index.count()} vectors in {index.n_lists} lists")
+    print(f"{'nprobe':>8} {'recall@k':>10} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+
+    # Exact search as the baseline, one query at a time like the retriever
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.exact_search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{'exact':>8} {1.0:>10.3f} {np.mean(latencies):>10.2f} {np.percentile(latencies, 50):>10.2f} {np.percentile(latencies, 99):>10.2f}")
+
+    for nprobe in nprobes:
+        latencies, recalls = [], []
+        for query, truth in zip(queries, exact_sets):
+            start = time.perf_counter()
+            found, _ = index.search(query[None, :], k, nprobe=nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth & set(found[0].tolist())) / max(len(truth), 1))
+        print(f"{nprobe:>8} {np.mean(recalls):>10.3f} {np.mean(latencies):>10.2f} {np.percentile(latencies, 50):>10.2f} {np.percentile(latencies, 99):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure recall@k and latency of the IVF index against exact search.")
+    parser.add_argument("--collection", type=str, default=DEFAULT_COLLECTION_NAME, help="The collection whose index to evaluate.")
+    parser.add_argument("--queries", type=str, default=None, help="A text file with one query per line. Defaults to sampling stored chunks.")
+    parser.add_argument("--n-queries", type=int, default=200, help="The number of queries to evaluate.")
+    parser.add_argument("-k", type=int, default=3, help="The number of results per query.")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64], help="The nprobe values to evaluate.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed for sampling queries.")
+
+    args = parser.parse_args()
+
+    try:
+        index = IVFVectorIndex(index_path(args.collection))
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Run the ingestion script with VECTOR_STORE_BACKEND=ivf to build the index.")
+        sys.exit(1)
+
+    queries = load_queries(index, args.queries, args.n_queries, args.seed)
+    evaluate(index, queries, args.k, [n for n in args.nprobe if n <= index.n_lists] or [index.n_lists])
@@ -0,0 +1,89 @@
+import argparse
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add project root to sys.path to allow importing project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.numpy_store import NumpyVectorIndex, index_path
+from rag.quantization import QUANTIZATION_MODES, QuantizedVectorIndex, build_quantized_index
+from tools.rag_tool import DEFAULT_COLLECTION_NAME
+
+def load_queries(index: NumpyVectorIndex, queries_file: str, n_queries: int, seed: int) -> np.ndarray:
+    """
+    Embeds the queries in `queries_file` (one per line), or samples stored chunks as queries.
+    """
+    if queries_file:
+        from core.model_provider import embedding_model
+        if not embedding_model:
+            raise RuntimeError("Embedding model is not available. Check your OPENAI_API_KEY.")
+        lines = [line.strip() for line in Path(queries_file).read_text(encoding="utf-8").splitlines() if line.strip()]
+        return np.asarray(embedding_model.embed_documents(lines[:n_queries]), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(index.count(), min(n_queries, index.count()), replace=False))
+    return np.asarray(index.embeddings[rows], dtype=np.float32)
+
+def evaluate(path: Path, queries: np.ndarray, k: int, modes: list, rescore_factors: list) -> None:
+    """
+    Prints the in-memory footprint, recall@k against exact search and per-query latency
+    of every quantization mode and rescore factor.
+    """
+    exact_index = NumpyVectorIndex(path)
+    exact, _ = exact_index.search(queries, k)
+    exact_sets = [set(row.tolist()) for row in exact]
+    full_bytes = exact_index.count() * exact_index.embeddings.shape[1] * 4
+
+    print(f"{len(queries)} queries, k={k}, {exact_index.count()} vectors of dim {exact_index.embeddings.shape[1]}")
+    print(f"{'mode':>8} {'rescore':>8} {'memory MB':>10} {'ratio':>7} {'recall@k':>10} {'mean ms':>10} {'p99 ms':>10}")
+
+    # Exact float32 search as the baseline, one query at a time like the retriever
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        exact_index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{'float32':>8} {'-':>8} {full_bytes / 1e6:>10.2f} {1.0:>7.1f} {1.0:>10.3f} {np.mean(latencies):>10.2f} {np.percentile(latencies, 99):>10.2f}")
+    del exact_index
+
+    for mode in modes:
+        build_quantized_index(path, mode)
+        index = QuantizedVectorIndex(path, mode)
+        for factor in rescore_factors:
+            latencies, recalls = [], []
+            for query, truth in zip(queries, exact_sets):
+                start = time.perf_counter()
+                found, _ = index.search(query[None, :], k, rescore_factor=factor)
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(truth & set(found[0].tolist())) / max(len(truth), 1))
+            ratio = full_bytes / max(index.nbytes, 1)
+            print(f"{mode:>8} {factor:>8} {index.nbytes / 1e6:>10.2f} {ratio:>7.1f} {np.mean(recalls):>10.3f} {np.mean(latencies):>10.2f} {np.percentile(latencies, 99):>10.2f}")
+        del index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure memory footprint and recall@k of int8 and PQ codes against exact search.")
+    parser.add_argument("--collection", type=str, default=DEFAULT_COLLECTION_NAME, help="The collection whose index to evaluate.")
+    parser.add_argument("--queries", type=str, default=None, help="A text file with one query per line. Defaults to sampling stored chunks.")
+    parser.add_argument("--n-queries", type=int, default=200, help="The number of queries to evaluate.")
+    parser.add_argument("-k", type=int, default=3, help="The number of results per query.")
+    parser.add_argument("--modes", type=str, nargs="+", default=list(QUANTIZATION_MODES), choices=QUANTIZATION_MODES, help="The quantization modes to evaluate.")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 4, 8, 32], help="The rescore factors to evaluate (0 = codes only).")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed for sampling queries.")
+
+    args = parser.parse_args()
+
+    path = index_path(args.collection)
+    try:
+        index = NumpyVectorIndex(path)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Run the ingestion script with VECTOR_STORE_BACKEND=numpy (or int8/pq) to build the index.")
+        sys.exit(1)
+
+    queries = load_queries(index, args.queries, args.n_queries, args.seed)
+    del index
+    evaluate(path, queries, args.k, args.modes, args.rescore)
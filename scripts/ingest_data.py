@@ -1,42 +1,73 @@
+import functools
+import io
+import itertools
 import os
 import argparse
+import queue
+import threading
+import time
 from pathlib import Path
+from typing import Iterable, Iterator, List
 import sys
 
 # Add project root to sys.path to allow importing project modules
 sys.path.append(str(Path(__file__).parent.parent))
 
-from rag.document_loader import load_text_document
-from rag.text_splitter import split_text_by_character
-from rag.vector_store import create_vector_store, client as chroma_client
+from core.config import DEDUP_ENABLED
+from rag.document_loader import Document, is_supported, load_document, map_directory
+from rag.numpy_store import index_path
+from rag.schema import ChunkBatch
+from rag.text_splitter import iter_text_chunks
+from rag.vector_store import (
+    add_documents,
+    chunk_ids,
+    delete_stale_chunks,
+    get_deduplicator,
+    index_document_stream,
+    refresh_index,
+    client as chroma_client,
+)
+from core.model_provider import embedding_model
 from tools.rag_tool import DEFAULT_COLLECTION_NAME
 
+# Marks the end of the chunk stream produced by the loader pool
+_END_OF_STREAM = None
+
+def split_documents(documents: Iterable[Document], chunk_size: int, chunk_overlap: int) -> Iterator[Document]:
+    """
+    Lazily splits loaded documents (e.g. PDF pages) into chunks that keep their metadata.
+    """
+    for doc in documents:
+        for chunk in iter_text_chunks(io.StringIO(doc["page_content"]), chunk_size, chunk_overlap, metadata=doc["metadata"]):
+            yield chunk
+
+def split_to_batch(documents: List[Document], chunk_size: int, chunk_overlap: int) -> ChunkBatch:
+    """
+    Splits the documents of one loader task and packs the chunks into a ChunkBatch.
+
+    Runs in the loader processes, so only the compact batch is sent back to the
+    process that embeds and stores the chunks.
+    """
+    return ChunkBatch.from_documents(split_documents(documents, chunk_size, chunk_overlap))
+
 def main(file_path: str):
     """
     Main function to process a document and load it into the vector store.
+
+    Plain text is streamed in chunks, so memory use does not grow with the file size.
+    Other formats (PDF, Markdown, HTML) go through the loader registry, page by page.
     """
     print(f"--- Starting data ingestion for: {file_path} ---")
     
-    # 1. Load the document
-    print("1. Loading document...")
-    try:
-        doc = load_text_document(file_path)
-        print(f"   - Successfully loaded '{doc['metadata']['source']}'")
-    except Exception as e:
-        print(f"   - Error loading document: {e}")
-        return
-
-    # 2. Split the text into chunks
-    print("2. Splitting document into chunks...")
-    try:
-        chunks = split_text_by_character(doc, chunk_size=1000, chunk_overlap=200)
-        print(f"   - Document split into {len(chunks)} chunks.")
-    except Exception as e:
-        print(f"   - Error splitting document: {e}")
-        return
+    # 1. Split the document into chunks lazily, without reading the whole file
+    print("1. Streaming document chunks...")
+    if Path(file_path).suffix.lower() == ".txt":
+        chunks = iter_text_chunks(file_path, chunk_size=1000, chunk_overlap=200)
+    else:
+        chunks = split_documents(load_document(file_path), chunk_size=1000, chunk_overlap=200)
 
-    # 3. Create or update the vector store
-    print(f"3. Loading chunks into ChromaDB collection: '{DEFAULT_COLLECTION_NAME}'...")
+    # 2. Create or update the vector store
+    print(f"2. Loading chunks into ChromaDB collection: '{DEFAULT_COLLECTION_NAME}'...")
     try:
         # Check if the collection already exists
         if DEFAULT_COLLECTION_NAME in [c.name for c in chroma_client.list_collections()]:
@@ -44,7 +75,20 @@ def main(file_path: str):
         else:
             print(f"   - Creating new collection: '{DEFAULT_COLLECTION_NAME}'")
             
-        collection = create_vector_store(chunks, collection_name=DEFAULT_COLLECTION_NAME)
+        collection = chroma_client.get_or_create_collection(name=DEFAULT_COLLECTION_NAME)
+        deduplicator = get_deduplicator(collection) if DEDUP_ENABLED else None
+        result = index_document_stream(collection, chunks, deduplicator=deduplicator)
+        if deduplicator is not None:
+            deduplicator.save(index_path(collection.name))
+        # Nothing to rebuild (and no cached answers to invalidate) if no chunk changed
+        if result["added"] or result["updated"] or result["deleted"]:
+            refresh_index(collection)
+        print(
+            f"   - {result['added']} chunks added, {result['updated']} updated, "
+            f"{result['skipped']} unchanged, {result['duplicates']} duplicates, {result['deleted']} deleted."
+        )
+        if deduplicator is not None:
+            print(f"   - Dedup stats: {deduplicator.stats()}")
         print(f"   - Successfully loaded data. Collection now contains {collection.count()} items.")
     except Exception as e:
         print(f"   - Error creating vector store: {e}")
@@ -54,13 +98,179 @@ def main(file_path: str):
     print("The RAG tool is now ready to use this document.")
 
 
+# --- Directory Ingestion ---
+
+class IngestStats:
+    """
+    Tracks progress and throughput of a directory ingestion run.
+    """
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.files = 0
+        self.failed_files = 0
+        self.chunks = 0
+        self.failed_chunks = 0
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.deleted = 0
+
+    def record(self, result: dict) -> None:
+        for key in ("added", "updated", "skipped", "duplicates", "deleted"):
+            setattr(self, key, getattr(self, key) + result.get(key, 0))
+
+    def report(self, prefix: str = "   -") -> None:
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        print(
+            f"{prefix} {self.files} files ({self.failed_files} failed), {self.chunks} chunks ({self.failed_chunks} failed) "
+            f"in {elapsed:.1f}s | {self.files / elapsed:.1f} files/s, {self.chunks / elapsed:.1f} chunks/s "
+            f"| {self.added} embedded, {self.updated} updated, {self.skipped} unchanged, "
+            f"{self.duplicates} duplicates, {self.deleted} deleted"
+        )
+
+def produce_chunks(
+    directory: str,
+    glob_pattern: str,
+    chunk_queue: "queue.Queue",
+    stats: IngestStats,
+    workers: int,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> None:
+    """
+    Loads and splits files on a process pool and puts each file's (source, chunks) on `chunk_queue`.
+
+    `map_directory` extracts files (and PDFs page range by page range) in parallel,
+    splits them into a ChunkBatch in the worker processes, and yields the batches
+    in order, so the page ranges of one file are consecutive and are joined back
+    into one batch per file. Both the pool window and the queue are bounded, so
+    memory usage does not depend on the size of the corpus.
+    """
+    def on_error(file_path: str, error: Exception) -> None:
+        stats.failed_files += 1
+        print(f"   - Error processing file {file_path}: {error}")
+
+    try:
+        split = functools.partial(split_to_batch, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        batches = map_directory(directory, split, glob_pattern=glob_pattern, workers=workers, on_error=on_error)
+        for source, file_batches in itertools.groupby(batches, key=lambda result: result[0]):
+            chunk_queue.put((source, ChunkBatch.concat([batch for _, batch in file_batches])))
+    except Exception as e:
+        print(f"   - Error loading directory: {e}")
+    finally:
+        chunk_queue.put(_END_OF_STREAM)
+
+def ingest_directory(
+    directory: str,
+    glob_pattern: str = "*.txt",
+    workers: int = os.cpu_count() or 1,
+    batch_size: int = 256,
+    queue_size: int = 64,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    report_every: float = 5.0,
+) -> IngestStats:
+    """
+    Ingests every supported file under `directory` matching `glob_pattern` in a single process.
+
+    Files are loaded and split on a process pool, their chunks are streamed through a
+    bounded queue, and the main thread embeds and stores them in batches of
+    `batch_size`, so the ChromaDB client and the models are set up only once.
+    Chunks that are already stored are not embedded again, near duplicates of
+    stored chunks are recorded as aliases (with DEDUP_ENABLED), and chunks of files
+    that shrank or changed are deleted. A batch that cannot be embedded or stored is
+    counted in `failed_chunks` and the run goes on; the dedup index and the indexes
+    outside ChromaDB are saved even if the run stops early.
+    """
+    print(f"--- Starting directory ingestion for: {directory} (pattern '{glob_pattern}') ---")
+    collection = chroma_client.get_or_create_collection(name=DEFAULT_COLLECTION_NAME)
+    print(f"   - Collection '{DEFAULT_COLLECTION_NAME}' contains {collection.count()} items.")
+    deduplicator = get_deduplicator(collection) if DEDUP_ENABLED else None
+
+    stats = IngestStats()
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    producer = threading.Thread(
+        target=produce_chunks,
+        args=(directory, glob_pattern, chunk_queue, stats, workers, chunk_size, chunk_overlap),
+        daemon=True,
+    )
+    producer.start()
+
+    def store(batch: List[Document], batch_ids: List[str]) -> None:
+        try:
+            stats.record(add_documents(collection, batch, batch_ids, deduplicator))
+        except Exception as e:
+            stats.failed_chunks += len(batch)
+            print(f"   - Error storing {len(batch)} chunks: {e}")
+        stats.chunks += len(batch)
+
+    batch: List[Document] = []
+    batch_ids: List[str] = []
+    last_report = time.perf_counter()
+    try:
+        while True:
+            item = chunk_queue.get()
+            if item is _END_OF_STREAM:
+                break
+            source, file_chunks = item
+            stats.files += 1
+
+            # IDs are derived from the complete chunk list of the file. A file without
+            # chunks (e.g. it was emptied) still drops the chunks of its previous version
+            file_ids = chunk_ids(file_chunks)
+            stats.record(delete_stale_chunks(collection, source, file_ids, deduplicator))
+            for chunk, chunk_id in zip(file_chunks, file_ids):
+                batch.append(chunk)
+                batch_ids.append(chunk_id)
+                if len(batch) >= batch_size:
+                    store(batch, batch_ids)
+                    batch, batch_ids = [], []
+
+            if time.perf_counter() - last_report >= report_every:
+                stats.report()
+                last_report = time.perf_counter()
+
+        if batch:
+            store(batch, batch_ids)
+        producer.join()
+    finally:
+        # Chunks stored before an error must still reach the dedup index and the sidecar indexes
+        if deduplicator is not None:
+            deduplicator.save(index_path(collection.name))
+        if stats.added or stats.updated or stats.deleted:
+            refresh_index(collection)
+
+    stats.report(prefix="\n--- Ingestion complete! ---\n   -")
+    print(f"   - Collection now contains {collection.count()} items.")
+    if hasattr(embedding_model, "stats"):
+        print(f"   - Embedding cache: {embedding_model.stats()}")
+    if deduplicator is not None:
+        print(f"   - Dedup stats: {deduplicator.stats()}")
+    return stats
+
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Load a document into the Intelli-Core knowledge base.")
-    parser.add_argument("file_path", type=str, help="The path to the .txt file to ingest.")
-    
+    parser = argparse.ArgumentParser(description="Load documents into the Intelli-Core knowledge base.")
+    parser.add_argument("path", type=str, help="The path to a .txt/.md/.html/.pdf file, or a directory to ingest.")
+    parser.add_argument("--glob", type=str, default="*.txt", help="Glob pattern for directory mode, e.g. '**/*.txt' or '**/*'.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of loader processes.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Number of chunks per embedding/add call.")
+    parser.add_argument("--queue-size", type=int, default=64, help="Maximum number of files buffered between loaders and the embedder.")
+
     args = parser.parse_args()
-    
-    if not os.path.exists(args.file_path):
-        print(f"Error: File not found at '{args.file_path}'")
+
+    if os.path.isdir(args.path):
+        ingest_directory(
+            args.path,
+            glob_pattern=args.glob,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            queue_size=args.queue_size,
+        )
+    elif not os.path.exists(args.path):
+        print(f"Error: File not found at '{args.path}'")
+    elif not is_supported(args.path):
+        print(f"Error: Unsupported file type '{Path(args.path).suffix}'")
     else:
-        main(args.file_path)
+        main(args.path)
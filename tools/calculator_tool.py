@@ -1,7 +1,9 @@
 from langchain.chains import LLMMathChain
 from langchain.tools import Tool
 
-from core.model_provider import llm
+from core import registry
+from core.metrics import metrics_callbacks
+from core.model_provider import get_role_llm
 
 def get_calculator_tool() -> Tool:
     """
@@ -11,7 +13,7 @@ def get_calculator_tool() -> Tool:
     The returned Tool is configured with a name, the chain's run method, and a description
     that informs the agent how to use the tool for mathematical questions.
     """
-    llm_math_chain = LLMMathChain.from_llm(llm=llm, verbose=True)
+    llm_math_chain = LLMMathChain.from_llm(llm=get_role_llm("calculator"), verbose=True)
     
     tool = Tool(
         name="Calculator",
@@ -20,13 +22,18 @@ def get_calculator_tool() -> Tool:
         Useful for when you need to answer questions about math.
         Use this tool for any mathematical questions, calculations, or evaluations.
         """,
+        callbacks=metrics_callbacks(),
     )
     return tool
 
-# Instantiate the tool
-calculator_tool = get_calculator_tool()
+def __getattr__(name: str):
+    # The tool is built on first use; see core.registry
+    if name == "calculator_tool":
+        return registry.get("calculator_tool")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
+    calculator_tool = registry.get("calculator_tool")
     # Example usage of the calculator tool
     question = "What is 2 + 2?"
     result = calculator_tool.run(question)
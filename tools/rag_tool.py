@@ -1,24 +1,52 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
 from langchain.tools import Tool
-import chromadb
 
+from core import registry
+from core.config import DEFAULT_COLLECTION_NAME
+from core.metrics import metrics_callbacks
 from rag.retriever import RAGRetriever
-from rag.vector_store import client as chroma_client
+from rag.vector_store import get_collection
+
+def parse_tool_input(tool_input: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Splits the tool input into the question and an optional metadata filter.
+
+    Plain text is a question over the whole knowledge base. A JSON object such as
+    `{"question": "...", "where": {"source": "handbook.pdf"}}` searches only the
+    matching chunks; any other key (e.g. "source") is shorthand for an equality filter.
+    """
+    text = tool_input.strip()
+    if not text.startswith("{"):
+        return tool_input, None
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return tool_input, None
+    if not isinstance(data, dict) or "question" not in data:
+        return tool_input, None
 
-# Define a constant for the default knowledge base collection name
-DEFAULT_COLLECTION_NAME = "intelli-core-kb"
+    question = str(data.pop("question"))
+    where = data.pop("where", None)
+    conditions = ([where] if where else []) + [{key: value} for key, value in data.items()]
+    if not conditions:
+        return question, None
+    return question, conditions[0] if len(conditions) == 1 else {"$and": conditions}
 
 def get_rag_tool() -> Tool:
     """
     Initializes and returns a RAG (Retrieval-Augmented Generation) tool.
 
     This tool is designed to answer questions based on a private knowledge base
-    stored in a persistent ChromaDB collection. It checks if the collection
+    stored in a persistent ChromaDB collection (or the NumPy index exported from it,
+    depending on VECTOR_STORE_BACKEND). It checks if the collection
     exists and contains documents. If not, the tool's description will indicate
     that the knowledge base is not ready.
     """
     try:
-        # 1. Get the persistent ChromaDB collection
-        collection = chroma_client.get_collection(name=DEFAULT_COLLECTION_NAME)
+        # 1. Get the persistent collection from the configured backend
+        collection = get_collection(DEFAULT_COLLECTION_NAME)
         
         # 2. Check if the collection has documents
         if collection.count() == 0:
@@ -32,34 +60,49 @@ def get_rag_tool() -> Tool:
         # 3. Instantiate the RAGRetriever
         retriever = RAGRetriever(collection)
         
-        # 4. Create the LangChain Tool
+        def answer(tool_input: str) -> str:
+            return retriever.answer_query(*parse_tool_input(tool_input))
+
+        async def aanswer(tool_input: str) -> str:
+            return await retriever.aanswer_query(*parse_tool_input(tool_input))
+
+        # 4. Create the LangChain Tool. Async agents (`ainvoke`/`arun`) call the
+        # coroutine, so one event loop can serve many concurrent lookups.
         tool = Tool(
             name="Private Knowledge Base",
-            func=retriever.answer_query,
+            func=answer,
+            coroutine=aanswer,
             description="""
             Useful for when you need to answer questions about your private documents.
             Use this tool to find information within the internal knowledge base.
             Input should be a clear, specific question about the documents' content.
+            To search only some documents, pass JSON instead, e.g.
+            {"question": "...", "source": "handbook.pdf"}.
             """,
+            callbacks=metrics_callbacks(),
         )
         return tool
 
     except ValueError:
-        # This exception is often raised by ChromaDB if the collection does not exist.
+        # This exception is raised by the backend if the collection does not exist.
         return Tool(
             name="Private Knowledge Base",
             func=lambda q: "The knowledge base has not been initialized.",
             description="The knowledge base is not available. Please run the ingestion script.",
         )
 
-# Instantiate the tool
-rag_tool = get_rag_tool()
+def __getattr__(name: str):
+    # The tool opens the collection, so it is built on first use; see core.registry
+    if name == "rag_tool":
+        return registry.get("rag_tool")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
     # To test this tool, you first need to populate the "intelli-core-kb" collection.
     # You can do this by running a separate ingestion script.
     # For now, this example will likely show the "not initialized" message.
-    
+    rag_tool = registry.get("rag_tool")
+
     print(f"Tool Name: {rag_tool.name}")
     print(f"Tool Description: {rag_tool.description}")
     
@@ -68,3 +111,8 @@ if __name__ == '__main__':
     
     print(f"\nQuery: '{query}'")
     print(f"Result: {result}")
+
+    # The same tool can be awaited, e.g. from an async agent or server
+    import asyncio
+    async_result = asyncio.run(rag_tool.arun(query))
+    print(f"Async result: {async_result}")
@@ -1,7 +1,9 @@
 from langchain.tools import Tool
 from langchain_community.utilities import GoogleSearchAPIWrapper
 
+from core import registry
 from core.config import settings
+from core.metrics import metrics_callbacks
 
 def get_search_tool() -> Tool:
     """
@@ -30,23 +32,36 @@ def get_search_tool() -> Tool:
         Input should be a search query.
         """,
         func=search.run,
+        callbacks=metrics_callbacks(),
     )
     return tool
 
-# Instantiate the tool
-try:
-    search_tool = get_search_tool()
-except ValueError as e:
-    print(f"Could not instantiate search_tool: {e}")
-    # Create a placeholder or dummy tool if the API keys are not set
-    search_tool = Tool(
-        name="Google Search",
-        description="Search tool is not configured. Please set GOOGLE_API_KEY and GOOGLE_CSE_ID.",
-        func=lambda x: "Search tool is not configured."
-    )
+def create_search_tool() -> Tool:
+    """
+    Builds the shared search tool, or a placeholder tool if the API keys are not set.
+
+    Use `registry.get("search_tool")` rather than calling this directly.
+    """
+    try:
+        return get_search_tool()
+    except ValueError as e:
+        print(f"Could not instantiate search_tool: {e}")
+        # Create a placeholder or dummy tool if the API keys are not set
+        return Tool(
+            name="Google Search",
+            description="Search tool is not configured. Please set GOOGLE_API_KEY and GOOGLE_CSE_ID.",
+            func=lambda x: "Search tool is not configured."
+        )
+
+def __getattr__(name: str):
+    # The tool is built on first use; see core.registry
+    if name == "search_tool":
+        return registry.get("search_tool")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
+    search_tool = registry.get("search_tool")
     # Example usage of the search tool
     if "not configured" in search_tool.description:
         print("Search tool is not configured. Skipping example.")
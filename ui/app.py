@@ -6,9 +6,9 @@ import uuid
 # Add project root to sys.path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from core.config import settings
-from mcp.orchestrator import main_orchestrator
-from tools.rag_tool import DEFAULT_COLLECTION_NAME
+from core import registry
+from core.config import settings, DEFAULT_COLLECTION_NAME
+from mcp.orchestrator import stream_run
 
 # --- Streamlit UI Configuration ---
 st.set_page_config(page_title="Intelli-Core Multi-Agent Demo", layout="wide")
@@ -65,7 +65,8 @@ if st.button("开始执行"):
             with st.status("🚀 任务开始...", expanded=True) as status:
                 
                 # Stream the orchestrator's execution
-                for step in main_orchestrator.stream({"user_request": prompt}, config=config):
+                # (the metrics of the run are written to METRICS_DIR when it ends)
+                for step in stream_run(prompt, config):
                     node_name = list(step.keys())[0]
                     state_update = step[node_name]
                     
@@ -87,7 +88,9 @@ if st.button("开始执行"):
 
             # Display the final report
             st.header("最终报告")
-            final_state = main_orchestrator.get_state(config)
+            # The graph is compiled on the first run only: Streamlit reruns this script
+            # on every interaction, but the registry keeps it for the process
+            final_state = registry.get("orchestrator").get_state(config)
             final_report = final_state.values.get('final_report', "未能生成报告。")
             st.markdown(final_report)
 